@@ -1,23 +1,31 @@
 """Programmatic entrypoint for CLI application.
 """
 import sys
-from rich.console import Console
 
 
 from aerie_cli.app import app
-from aerie_cli.persistent import NoActiveSessionError
 from aerie_cli.__version__ import __version__
 
 
 def main():
     try:
         app()
-    except NoActiveSessionError:
-        Console().print(
-            "There is no active session. Please start a session with aerie-cli activate"
-        )
-        sys.exit(-1)
-    except Exception:
+    except Exception as e:
+        # Imported on failure only, to keep CLI startup fast. These errors mean their modules are already loaded.
+        from rich.console import Console
+        from aerie_cli.aerie_host import AerieAuthenticationError
+        from aerie_cli.persistent import NoActiveSessionError
+
+        if isinstance(e, NoActiveSessionError):
+            Console().print(
+                "There is no active session. Please start a session with aerie-cli activate"
+            )
+            sys.exit(-1)
+        if isinstance(e, AerieAuthenticationError):
+            Console().print(
+                "The Aerie session is no longer authenticated. Please start a session with aerie-cli activate"
+            )
+            sys.exit(-1)
         Console().print_exception()
 
 
@@ -1,10 +1,18 @@
-import sys
+import json
 import time
 from pathlib import Path
+from typing import Any
+from typing import Callable
 from typing import Dict
+from typing import Iterable
+from typing import Iterator
 from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import TYPE_CHECKING
 from typing import Union
 from copy import deepcopy
+from datetime import timedelta
 
 import arrow
 
@@ -25,9 +33,95 @@ from .schemas.client import ExpansionRun
 from .schemas.client import ExpansionRule
 from .schemas.client import ExpansionSet
 from .schemas.client import ResourceType
-from .utils.serialization import postgres_interval_to_microseconds
+from .schemas.client import SimulationDatasetMetadata
+from .schemas.client import SimulationRun
+from .utils.anchors import resolve_anchor_layers
+from .utils.concurrency import DEFAULT_MAX_WORKERS
+from .utils.concurrency import map_concurrently
+from .utils.resource_samples import ResourceTimeline
+from .utils.resource_samples import build_resource_timelines
+from .utils.resource_samples import build_resource_timelines_from_pages
+from .utils.query_cache import QueryCachePolicy
+from .utils.subscriptions import SubscriptionUnavailableError
 from .aerie_host import AerieHost
 
+if TYPE_CHECKING:
+    from .persistent import EffectiveArgumentsCache
+
+# Maximum number of activities per request for effective arguments
+EFFECTIVE_ARGUMENTS_BATCH_SIZE = 100
+
+# Maximum number of simulated activities linked to a sequence per request
+SEQUENCE_LINK_CHUNK_SIZE = 1000
+
+# Default number of simulated activities per request when paginating simulation results
+SIMULATION_RESULTS_PAGE_SIZE = 5000
+
+# Adaptive polling for simulation completion: the first poll interval (seconds) and its growth factor per poll
+SIMULATION_POLL_INITIAL_DELAY = 0.25
+SIMULATION_POLL_BACKOFF = 1.5
+
+SIMULATION_NONTERMINAL_STATUSES = ["incomplete", "pending"]
+
+# Default maximum number of simulations in progress at once when simulating many plans
+SIMULATION_BATCH_CONCURRENCY = 4
+
+# Caching of rarely-changing metadata, for hosts with a query cache. Types are fixed once a model is uploaded, but
+# Aerie extracts them after the upload completes, so empty results aren't cached.
+MISSION_MODELS_CACHE_POLICY = QueryCachePolicy("mission_models", timedelta(minutes=10), ["mission_model"])
+ACTIVITY_TYPES_CACHE_POLICY = QueryCachePolicy(
+    "activity_types", timedelta(days=1), ["activity_type", "mission_model"], cache_empty=False
+)
+RESOURCE_TYPES_CACHE_POLICY = QueryCachePolicy(
+    "resource_types", timedelta(days=1), ["resource_type", "mission_model"], cache_empty=False
+)
+EXPANSION_RULES_CACHE_POLICY = QueryCachePolicy("expansion_rules", timedelta(minutes=5), ["expansion_rule"])
+PARCELS_CACHE_POLICY = QueryCachePolicy(
+    "parcels", timedelta(minutes=10), ["parcel", "dictionary", "sequence_adaptation"]
+)
+DICTIONARIES_CACHE_POLICY = QueryCachePolicy("dictionaries", timedelta(minutes=10), ["dictionary"])
+
+SIMULATED_ACTIVITY_FIELDS = [
+    "activity_type_name",
+    "attributes",
+    "directive_id",
+    "duration",
+    "end_time",
+    "id",
+    "start_offset",
+    "start_time",
+    "simulation_dataset_id",
+    "parent_id",
+]
+
+
+class SimulationFailedError(RuntimeError):
+    """A simulation completed with status "failed"
+
+    plan_id (int): ID of the simulated plan
+    response (Dict): Final simulation status, including the failure reason
+    """
+
+    def __init__(self, plan_id: int, response: Dict) -> None:
+        super().__init__(f"Simulation of plan {plan_id} failed. Response:\n{response}")
+        self.plan_id = plan_id
+        self.response = response
+
+
+class SimulationTimeoutError(RuntimeError):
+    """A simulation did not complete within the allowed time
+
+    plan_id (int): ID of the simulated plan
+    sim_dataset_id (int): ID of the incomplete simulation dataset
+    """
+
+    def __init__(self, plan_id: int, sim_dataset_id: int, timeout: float) -> None:
+        super().__init__(
+            f"Simulation of plan {plan_id} (dataset {sim_dataset_id}) did not complete within {timeout} seconds"
+        )
+        self.plan_id = plan_id
+        self.sim_dataset_id = sim_dataset_id
+
 
 class AerieClient:
     """Client-side behavior for aerie-cli
@@ -35,13 +129,45 @@ class AerieClient:
     Class encapsulates logic to query and send files to a given Aerie host.
     """
 
-    def __init__(self, aerie_host: AerieHost):
+    def __init__(
+        self,
+        aerie_host: AerieHost,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        effective_arguments_batch_size: int = EFFECTIVE_ARGUMENTS_BATCH_SIZE,
+        effective_arguments_cache: "EffectiveArgumentsCache" = None,
+    ):
         """Instantiate a client with an authenticated host session
 
         Args:
             aerie_host (AerieHost): Aerie host information, including authentication if necessary
+            max_workers (int, optional): Maximum number of concurrent requests for bulk operations. Defaults to
+                DEFAULT_MAX_WORKERS.
+            effective_arguments_batch_size (int, optional): Maximum number of activities per request when getting
+                full activity arguments. Defaults to EFFECTIVE_ARGUMENTS_BATCH_SIZE.
+            effective_arguments_cache (EffectiveArgumentsCache, optional): Persistent cache of full activity
+                arguments. Defaults to None (no caching).
         """
         self.aerie_host = aerie_host
+        self.max_workers = max_workers
+        self.effective_arguments_batch_size = effective_arguments_batch_size
+        self.effective_arguments_cache = effective_arguments_cache
+
+    def map_concurrently(self, fn: Callable, items: Iterable, fail_fast: bool = True) -> List:
+        """Apply a function that makes requests to Aerie to many items, with up to `max_workers` at a time
+
+        Args:
+            fn (Callable): Function to apply, typically a bound method of this client
+            items (Iterable): Items to apply the function to
+            fail_fast (bool, optional): If True, stop at and re-raise the first failure. If False, attempt every item
+                and raise a ConcurrentTaskError listing all failures. Defaults to True.
+
+        Raises:
+            ConcurrentTaskError: If any call failed and `fail_fast` is False
+
+        Returns:
+            List: Result for each item, in input order
+        """
+        return map_concurrently(fn, items, self.max_workers, fail_fast)
 
     def get_activity_plan_by_id(self, plan_id: int, full_args: str = None) -> ActivityPlanRead:
         """Download activity plan from Aerie
@@ -89,7 +215,7 @@ class AerieClient:
         resp = self.aerie_host.post_to_graphql(query, plan_id=plan_id)
         api_plan = ApiActivityPlanRead.from_dict(resp)
         plan = ActivityPlanRead.from_api_read(api_plan)
-        return self.__expand_activity_arguments(plan, full_args)
+        return self.__expand_activity_arguments([plan], full_args)[0]
 
     def list_all_activity_plans(self) -> List[ActivityPlanRead]:
         list_all_plans_query = """
@@ -120,6 +246,66 @@ class AerieClient:
             activity_plans.append(plan)
         return activity_plans
 
+    def list_activity_plans(
+        self, limit: int = None, offset: int = None, name_filter: str = None
+    ) -> List[Tuple[ActivityPlanRead, Optional[int]]]:
+        """List activity plans with their latest simulation dataset IDs in a single request
+
+        Args:
+            limit (int, optional): Maximum number of plans to list. Defaults to None (no limit).
+            offset (int, optional): Number of plans to skip, in order of plan ID. Defaults to None.
+            name_filter (str, optional): Only list plans whose names contain this string, case-insensitive. Defaults
+                to None.
+
+        Returns:
+            List[Tuple[ActivityPlanRead, Optional[int]]]: Plans without activities, in order of plan ID, each with the
+            ID of the latest simulation dataset of its latest simulation or None if it hasn't been simulated
+        """
+        list_plans_query = """
+        query list_plans($where: plan_bool_exp!, $limit: Int, $offset: Int) {
+            plan(where: $where, order_by: { id: asc }, limit: $limit, offset: $offset) {
+                id
+                model_id
+                name
+                start_time
+                duration
+                simulations(order_by: { id: desc }, limit: 1) {
+                    id
+                    simulation_datasets_aggregate {
+                        aggregate {
+                            max {
+                                id
+                            }
+                        }
+                    }
+                }
+                tags {
+                    tag {
+                        id
+                        name
+                    }
+                }
+            }
+        }
+        """
+        where = {}
+        if name_filter:
+            # Match the filter literally, rather than as a LIKE pattern
+            escaped = name_filter.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            where["name"] = {"_ilike": f"%{escaped}%"}
+
+        resp = self.aerie_host.post_to_graphql(list_plans_query, where=where, limit=limit, offset=offset)
+        activity_plans = []
+        for plan in resp:
+            if len(plan["simulations"]):
+                latest_dataset_id = plan["simulations"][0]["simulation_datasets_aggregate"]["aggregate"]["max"]["id"]
+            else:
+                latest_dataset_id = None
+            plan = ApiActivityPlanRead.from_dict(plan)
+            plan = ActivityPlanRead.from_api_read(plan)
+            activity_plans.append((plan, latest_dataset_id))
+        return activity_plans
+
     def get_all_activity_plans(self, full_args: str = None) -> List[ActivityPlanRead]:
         """Get all activity plans
 
@@ -133,11 +319,12 @@ class AerieClient:
             List[ActivityPlanRead]
         """
 
-        # List all plans then loop to get activities from each
+        # List all plans then get activities from each. Arguments are expanded for all plans together, rather than
+        # within each concurrent plan request, so that requests share a single pool.
         plans_metadata = self.list_all_activity_plans()
-        plans = [self.get_activity_plan_by_id(p.id, full_args) for p in plans_metadata]
+        plans = self.map_concurrently(lambda p: self.get_activity_plan_by_id(p.id), plans_metadata)
 
-        return plans
+        return self.__expand_activity_arguments(plans, full_args)
 
     def get_plan_id_by_sim_id(self, simulation_dataset_id: int) -> int:
         """Get Plan ID by Simulation Dataset ID
@@ -223,6 +410,11 @@ class AerieClient:
         self, model_id: int, plan_to_create: ActivityPlanCreate
     ) -> int:
 
+        # Resolve anchors before creating anything so that bad anchors don't
+        # leave a partially-uploaded plan. Deep copy activities so anchor IDs
+        # can be updated in place.
+        anchor_layers = resolve_anchor_layers(deepcopy(plan_to_create.activities))
+
         api_plan_create = plan_to_create.to_api_create(model_id)
         create_plan_mutation = """
         mutation CreatePlan($plan: plan_insert_input!) {
@@ -243,35 +435,17 @@ class AerieClient:
         for tag in plan_to_create.tags:
             self.add_plan_tag(plan_id, tag["tag"]["name"])
                 
-        # This loop exists to make sure all anchor IDs are updated as necessary
-
-        # Deep copy activities so we can augment and pop from the list
-        activities_to_upload = deepcopy(plan_to_create.activities)
-
-        # Map of old to new directive IDs
+        # Upload directives one anchor layer at a time, updating anchor IDs to
+        # the new IDs of directives created in earlier layers
         directive_id_mapping = {}
+        for layer in anchor_layers:
+            for act in layer:
+                if act.anchor_id:
+                    act.anchor_id = directive_id_mapping[act.anchor_id]
 
-        # Boolean catches errors to avoid an infinite loop
-        running = True
-        while len(activities_to_upload):
-            running = False
-
-            for act in activities_to_upload:
-                # If activity is anchored and the anchor isn't known yet, pass
-                # If activity is anchored and the anchor is known, add it
-                if act.anchor_id and act.anchor_id not in directive_id_mapping.keys():
-                    continue
-                else:
-                    if act.anchor_id:
-                        act.anchor_id = directive_id_mapping[act.anchor_id]
-                    directive_id_mapping[act.id] = self.create_activity(act, plan_id)
-                    activities_to_upload.remove(act)
-                    running = True
-
-            if not running:
-                raise RuntimeError(
-                    f"Failed to anchor activities: {', '.join([act.name for act in activities_to_upload])}"
-                )
+            new_ids = self.create_activities(layer, plan_id)
+            for act, new_id in zip(layer, new_ids):
+                directive_id_mapping[act.id] = new_id
 
         simulation_start_time = plan_to_create.start_time.isoformat()
         simulation_end_time = plan_to_create.end_time.isoformat()
@@ -314,6 +488,42 @@ class AerieClient:
 
         return activity_id
 
+    def create_activities(self, activities_to_create: List[Activity], plan_id: int) -> List[int]:
+        """Create many activity directives in a plan with a single request
+
+        Directives are inserted in the order given, so anchor IDs must already refer to existing directives.
+
+        Args:
+            activities_to_create (List[Activity]): Activity directives to create
+            plan_id (int): ID of the plan in Aerie
+
+        Returns:
+            List[int]: IDs of the new directives, in the same order as `activities_to_create`
+        """
+        if not len(activities_to_create):
+            return []
+
+        insert_activities_mutation = """
+        mutation CreateActivities($activities: [activity_directive_insert_input!]!) {
+            createActivities: insert_activity_directive(objects: $activities) {
+                returning {
+                    id
+                }
+            }
+        }
+        """
+        resp = self.aerie_host.post_to_graphql(
+            insert_activities_mutation,
+            activities=[act.to_api_create(plan_id).to_dict() for act in activities_to_create]
+        )
+
+        if len(resp["returning"]) != len(activities_to_create):
+            raise RuntimeError(
+                f"Expected {len(activities_to_create)} directives to be created, got {len(resp['returning'])}"
+            )
+
+        return [a["id"] for a in resp["returning"]]
+
     def update_activity(
         self,
         activity_id: int,
@@ -381,7 +591,28 @@ class AerieClient:
 
         return resp["returning"]
 
-    def simulate_plan(self, plan_id: int, poll_period: int = 5) -> int:
+    def simulate_plan(
+        self, plan_id: int, poll_period: float = 5, timeout: float = None, use_subscription: bool = True
+    ) -> int:
+        """Simulate a plan and wait for the simulation to complete
+
+        Completion is pushed over a GraphQL subscription when available (requires the optional websocket-client
+        package). Otherwise, the simulation is polled with an interval starting at SIMULATION_POLL_INITIAL_DELAY
+        seconds and growing to `poll_period`.
+
+        Args:
+            plan_id (int): ID of plan to simulate
+            poll_period (float, optional): Maximum seconds between polls. Defaults to 5.
+            timeout (float, optional): Maximum seconds to wait for completion. Defaults to None (no limit).
+            use_subscription (bool, optional): Wait on a subscription when available. Defaults to True.
+
+        Raises:
+            SimulationFailedError: If the simulation fails
+            SimulationTimeoutError: If the simulation doesn't complete within the timeout
+
+        Returns:
+            int: Simulation dataset ID
+        """
 
         simulate_query = """
         query Simulate($plan_id: Int!) {
@@ -396,19 +627,170 @@ class AerieClient:
         def exec_sim_query():
             return self.aerie_host.post_to_graphql(simulate_query, plan_id=plan_id)
 
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        def remaining() -> Optional[float]:
+            return None if deadline is None else max(0.0, deadline - time.monotonic())
+
         resp = exec_sim_query()
 
-        nonterminal_status = ["incomplete", "pending"]
-        while resp["status"] in nonterminal_status:
-            time.sleep(poll_period)
+        if resp["status"] in SIMULATION_NONTERMINAL_STATUSES and use_subscription:
+            try:
+                resp = self.__wait_for_simulation_dataset(resp["simulationDatasetId"], remaining())
+            except SubscriptionUnavailableError:
+                pass
+            except TimeoutError:
+                raise SimulationTimeoutError(plan_id, resp["simulationDatasetId"], timeout)
+
+        delay = SIMULATION_POLL_INITIAL_DELAY
+        while resp["status"] in SIMULATION_NONTERMINAL_STATUSES:
+            if deadline is not None and remaining() <= 0:
+                raise SimulationTimeoutError(plan_id, resp["simulationDatasetId"], timeout)
+            time.sleep(min(delay, poll_period) if deadline is None else min(delay, poll_period, remaining()))
+            delay *= SIMULATION_POLL_BACKOFF
             resp = exec_sim_query()
 
         if resp["status"] == "failed":
-            sys.exit(f"Simulation failed. Response:\n{resp}")
+            raise SimulationFailedError(plan_id, resp)
 
         sim_dataset_id = resp["simulationDatasetId"]
         return sim_dataset_id
 
+    def __wait_for_simulation_dataset(self, sim_dataset_id: int, timeout: Optional[float]) -> Dict:
+        subscription = """
+        subscription SimulationDatasetStatus($sim_dataset_id: Int!) {
+            simulation_dataset_by_pk(id: $sim_dataset_id) {
+                status
+                reason
+            }
+        }
+        """
+
+        dataset = self.aerie_host.wait_for_subscription(
+            subscription,
+            lambda d: d is not None and d["status"] not in SIMULATION_NONTERMINAL_STATUSES,
+            timeout=timeout,
+            sim_dataset_id=sim_dataset_id,
+        )
+        return {"status": dataset["status"], "reason": dataset["reason"], "simulationDatasetId": sim_dataset_id}
+
+    def simulate_plans(
+        self,
+        plan_ids: List[int],
+        max_concurrent: int = SIMULATION_BATCH_CONCURRENCY,
+        poll_period: float = 5,
+        timeout: float = None,
+        on_update: Callable[[List[SimulationRun]], None] = None,
+        on_complete: Callable[[SimulationRun], None] = None,
+    ) -> List[SimulationRun]:
+        """Simulate many plans concurrently
+
+        At most `max_concurrent` simulations are in progress at once, so that a batch doesn't occupy every
+        simulation worker. The status of all in-progress simulations is fetched with one request per poll, at
+        intervals which grow from SIMULATION_POLL_INITIAL_DELAY seconds to `poll_period`. A failed simulation doesn't
+        stop the batch.
+
+        Args:
+            plan_ids (List[int]): IDs of plans to simulate. Duplicates are simulated once.
+            max_concurrent (int, optional): Maximum number of simulations in progress at once. Defaults to
+                SIMULATION_BATCH_CONCURRENCY.
+            poll_period (float, optional): Maximum seconds between polls. Defaults to 5.
+            timeout (float, optional): Maximum seconds to wait for the whole batch. Simulations not complete in time
+                are marked "timed out". Defaults to None (no limit).
+            on_update (Callable[[List[SimulationRun]], None], optional): Called with every run after each poll, e.g.
+                to display progress
+            on_complete (Callable[[SimulationRun], None], optional): Called with each run as soon as it finishes,
+                e.g. to download its results. Polling waits for it to return.
+
+        Raises:
+            ValueError: If `max_concurrent` isn't positive
+
+        Returns:
+            List[SimulationRun]: Final state of each plan's simulation, in input order
+        """
+        if max_concurrent < 1:
+            raise ValueError(f"max_concurrent must be positive: {max_concurrent}")
+
+        simulate_query = """
+        query Simulate($plan_id: Int!) {
+            simulate(planId: $plan_id) {
+                status
+                reason
+                simulationDatasetId
+            }
+        }
+        """
+
+        status_query = """
+        query SimulationDatasetStatuses($sim_dataset_ids: [Int!]!) {
+            simulation_dataset(where: { id: { _in: $sim_dataset_ids } }) {
+                id
+                status
+                reason
+            }
+        }
+        """
+
+        runs = [SimulationRun(plan_id) for plan_id in dict.fromkeys(plan_ids)]
+        queued = list(runs)
+        active: Dict[int, SimulationRun] = {}
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        def set_status(run: SimulationRun, status: str, reason: Any) -> None:
+            # The simulate action reports success as "complete", whereas simulation datasets report "success"
+            status = "success" if status == "complete" else status
+            run.status = status
+            run.reason = reason
+            if status in SIMULATION_NONTERMINAL_STATUSES:
+                active[run.sim_dataset_id] = run
+                return
+            active.pop(run.sim_dataset_id, None)
+            run.end_time = arrow.utcnow()
+            if on_complete is not None:
+                on_complete(run)
+
+        delay = SIMULATION_POLL_INITIAL_DELAY
+        while queued or active:
+            while queued and len(active) < max_concurrent:
+                run = queued.pop(0)
+                run.start_time = arrow.utcnow()
+                try:
+                    resp = self.aerie_host.post_to_graphql(simulate_query, plan_id=run.plan_id)
+                except RuntimeError as e:
+                    set_status(run, "failed", str(e))
+                    continue
+                run.sim_dataset_id = resp["simulationDatasetId"]
+                set_status(run, resp["status"], resp["reason"])
+
+                # Poll newly started simulations quickly
+                delay = SIMULATION_POLL_INITIAL_DELAY
+
+            if on_update is not None:
+                on_update(runs)
+            if not active:
+                continue
+
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                for run in list(active.values()) + queued:
+                    run.status = "timed out"
+                    run.end_time = arrow.utcnow()
+                break
+
+            time.sleep(min(delay, poll_period) if remaining is None else min(delay, poll_period, remaining))
+            delay *= SIMULATION_POLL_BACKOFF
+
+            polled = dict(active)
+            statuses = self.aerie_host.post_to_graphql(status_query, sim_dataset_ids=list(polled.keys()))
+            for status in statuses:
+                set_status(polled.pop(status["id"]), status["status"], status["reason"])
+            for run in polled.values():
+                set_status(run, "failed", "Simulation dataset no longer exists")
+
+        if on_update is not None:
+            on_update(runs)
+        return runs
+
     def get_resource_timelines(self, plan_id: int):
         samples = self.get_resource_samples(self.get_simulation_dataset_ids_by_plan_id(plan_id)[0])
         api_resource_timeline = ApiResourceSampleResults.from_dict(samples)
@@ -425,177 +807,289 @@ class AerieClient:
         that a linear interpolation between samples will always return a correct value. Two points at the same 
         timestamp indicate a discontinuity.
 
+        See `get_resource_sample_arrays` for the same samples as NumPy arrays, which is much more efficient for large
+        simulation datasets.
+
         Args:
             simulation_dataset_id (int)
             state_names (List, optional): List of state/resource names to pull. Defaults to None (all).
 
         Returns:
             Dict: Object with key "resourceSamples," the value of which is a dictionary of resource sample series keyed by resource name.
-        """        
+        """
+        timelines = self.get_resource_sample_arrays(simulation_dataset_id, state_names)
+        return {
+            "resourceSamples": {name: timeline.to_points() for name, timeline in timelines.items()}
+        }
 
-        # checks to see if user inputted specific states. If so, use this query.
-        if state_names:
-            resource_profile_query = """
-            query GetSimulationDataset($simulation_dataset_id: Int!, $state_names: [String!]) {
-                simulation_dataset_by_pk(id: $simulation_dataset_id) {
-                    dataset {
-                        profiles(where: { name: { _in: $state_names } }) {
+    def get_resource_sample_arrays(
+        self, simulation_dataset_id: int, state_names: List = None
+    ) -> Dict[str, ResourceTimeline]:
+        """Pull resource samples from a simulation dataset as columnar arrays, optionally filtering for specific states
+
+        Samples are the same as those from `get_resource_samples`, but each resource's times and values are returned
+        as NumPy arrays.
+
+        Args:
+            simulation_dataset_id (int)
+            state_names (List, optional): List of state/resource names to pull. Defaults to None (all).
+
+        Returns:
+            Dict[str, ResourceTimeline]: Resource timelines keyed by resource name
+        """
+        _, timelines = self.get_simulation_dataset_resources(simulation_dataset_id, state_names)
+        return timelines
+
+    def get_simulation_dataset_resources(
+        self, simulation_dataset_id: int, state_names: List = None, page_size: int = None
+    ) -> Tuple[SimulationDatasetMetadata, Dict[str, ResourceTimeline]]:
+        """Pull resource samples and parent plan metadata from a simulation dataset
+
+        By default, all profile segments are pulled in a single request. For very large datasets, pass `page_size` to
+        instead pull segments in pages, which are processed as they're received so the full response is never held in
+        memory at once.
+
+        Args:
+            simulation_dataset_id (int)
+            state_names (List, optional): List of state/resource names to pull. Defaults to None (all).
+            page_size (int, optional): Number of profile segments to pull per request. Defaults to None (all in one
+                request).
+
+        Raises:
+            ValueError: If the page size isn't positive
+
+        Returns:
+            Tuple[SimulationDatasetMetadata, Dict[str, ResourceTimeline]]: Simulation dataset metadata and resource
+            timelines keyed by resource name
+        """
+
+        if page_size is not None and page_size < 1:
+            raise ValueError(f"Page size must be positive: {page_size}")
+
+        # Segments are only selected with the profiles if they aren't paginated
+        profile_fields = """
+                            id
                             name
+                            type
+        """
+        if page_size is None:
+            profile_fields += """
                             profile_segments(order_by: { start_offset: asc }) {
                                 dynamics
                                 start_offset
                             }
-                            type
-                        }
-                    }
-                }
-            }
+            """
+
+        # checks to see if user inputted specific states. If so, use this query.
+        if state_names:
+            resource_profile_query = f"""
+            query GetSimulationDataset($simulation_dataset_id: Int!, $state_names: [String!]) {{
+                simulation_dataset_by_pk(id: $simulation_dataset_id) {{
+                    dataset_id
+                    simulation {{
+                        plan {{
+                            id
+                            start_time
+                            duration
+                        }}
+                    }}
+                    dataset {{
+                        profiles(where: {{ name: {{ _in: $state_names }} }}) {{
+                            {profile_fields}
+                        }}
+                    }}
+                }}
+            }}
             """
 
             resp = self.aerie_host.post_to_graphql(resource_profile_query, simulation_dataset_id=simulation_dataset_id, state_names=state_names)
 
         else:
-            resource_profile_query = """
-            query GetSimulationDataset($simulation_dataset_id: Int!) {
-                simulation_dataset_by_pk(id: $simulation_dataset_id) {
-                    dataset {
-                        profiles {
-                            name
-                            profile_segments(order_by: { start_offset: asc }) {
-                                dynamics
-                                start_offset
-                            }
-                            type
-                        }
-                    }
-                }
-            }
+            resource_profile_query = f"""
+            query GetSimulationDataset($simulation_dataset_id: Int!) {{
+                simulation_dataset_by_pk(id: $simulation_dataset_id) {{
+                    dataset_id
+                    simulation {{
+                        plan {{
+                            id
+                            start_time
+                            duration
+                        }}
+                    }}
+                    dataset {{
+                        profiles {{
+                            {profile_fields}
+                        }}
+                    }}
+                }}
+            }}
             """
             resp = self.aerie_host.post_to_graphql(resource_profile_query, simulation_dataset_id=simulation_dataset_id)
-        
-        
-        profiles = resp["dataset"]["profiles"]
 
-        plan_duration_query = """
-        query GetPlanDuration($plan_id: Int!) {
-          plan_by_pk(id: $plan_id) {
-            duration
-          }
-        }
-        """
-        resp = self.aerie_host.post_to_graphql(
-            plan_duration_query,
-            plan_id=self.get_plan_id_by_sim_id(simulation_dataset_id),
+        plan = resp["simulation"]["plan"]
+        metadata = SimulationDatasetMetadata(
+            id=simulation_dataset_id,
+            plan_id=plan["id"],
+            plan_start_time=plan["start_time"],
+            plan_duration=plan["duration"],
         )
-        duration = postgres_interval_to_microseconds(resp["duration"])
-
-        # Parse profile segments into resource timelines
-        resources = {}
-        for profile in sorted(profiles, key=lambda _: _["name"]):
-            name = profile["name"]
-            profile_segments = profile["profile_segments"]
-            profile_type = profile["type"]["type"]
-            values = []
-
-            for i in range(len(profile_segments)):
-                segment = profile_segments[i]
-
-                # The segment offset is the offset from plan start to the beginning of this segment
-                segment_start_time = postgres_interval_to_microseconds(
-                    segment["start_offset"]
-                )
+        duration = metadata.plan_duration // timedelta(microseconds=1)
 
-                # If this is *not* the last segment, then this segment ends where the next segment starts
-                if i + 1 < len(profile_segments):
-                    segment_end_time = postgres_interval_to_microseconds(
-                        profile_segments[i + 1]["start_offset"]
-                    )
+        profiles = resp["dataset"]["profiles"]
+        if page_size is None:
+            timelines = build_resource_timelines(profiles, duration)
+        else:
+            pages = self.iter_profile_segment_pages(resp["dataset_id"], [p["id"] for p in profiles], page_size)
+            timelines = build_resource_timelines_from_pages(profiles, pages, duration)
 
-                # If this is the last segment, then this segment ends at the end of the plan
-                else:
-                    segment_end_time = duration
+        return metadata, timelines
 
-                dynamics = segment["dynamics"]
+    def iter_profile_segment_pages(
+        self, dataset_id: int, profile_ids: List[int], page_size: int
+    ) -> Iterator[List[Dict]]:
+        """Pull profile segments from a dataset one page at a time
 
-                # Discrete profiles don't have rates
-                if profile_type == 'discrete':
+        Pages use keyset pagination on (profile ID, start offset), which is the segment table's key, so each page is
+        an indexed range scan regardless of how deep into the dataset it is.
 
-                    # Define points at the start and end of this profile segment
-                    start_value = {
-                        "x": segment_start_time,
-                        "y": dynamics,
-                    }
-                    end_value = {
-                        "x": segment_end_time,
-                        "y": dynamics,
-                    }
+        Args:
+            dataset_id (int): Dataset ID (not the simulation dataset ID)
+            profile_ids (List[int]): IDs of profiles to pull segments for
+            page_size (int): Maximum number of segments per page
 
-                    # Check if the previous point is identical to this one
-                    if len(values) and (values[-1] == start_value):
+        Yields:
+            List[Dict]: Segments with `profile_id`, `start_offset` and `dynamics`, ordered by profile ID then start
+            offset
+        """
+        if not len(profile_ids):
+            return
 
-                        # If the resource value hasn't changed, remove the previous point and extend out to the end of this profile segment
-                        values.pop()
-                        values.append(end_value)
+        query = """
+        query GetProfileSegments(
+            $dataset_id: Int!
+            $profile_ids: [Int!]!
+            $last_profile_id: Int!
+            $last_start_offset: interval!
+            $page_size: Int!
+        ) {
+            profile_segment(
+                where: {
+                    dataset_id: { _eq: $dataset_id }
+                    profile_id: { _in: $profile_ids }
+                    _or: [
+                        { profile_id: { _gt: $last_profile_id } }
+                        { profile_id: { _eq: $last_profile_id }, start_offset: { _gt: $last_start_offset } }
+                    ]
+                }
+                order_by: [{ profile_id: asc }, { start_offset: asc }]
+                limit: $page_size
+            ) {
+                profile_id
+                start_offset
+                dynamics
+            }
+        }
+        """
 
-                    else:
+        # Start before the first segment of the first profile
+        last_profile_id = min(profile_ids) - 1
+        last_start_offset = "0"
+        while True:
+            page = self.aerie_host.post_to_graphql(
+                query,
+                dataset_id=dataset_id,
+                profile_ids=profile_ids,
+                last_profile_id=last_profile_id,
+                last_start_offset=last_start_offset,
+                page_size=page_size,
+            )
+            if len(page):
+                yield page
+            if len(page) < page_size:
+                return
+            last_profile_id = page[-1]["profile_id"]
+            last_start_offset = page[-1]["start_offset"]
 
-                        # If the value has changed, add points at the boundaries of this segment
-                        values.append(start_value)
-                        values.append(end_value)
+    def get_simulation_results(self, sim_dataset_id: int, fields: List[str] = None) -> List[Dict]:
+        """Get all simulated activities from a simulation dataset in a single request
 
-                # Real profiles can have rates over time
-                elif profile_type == 'real':
+        Args:
+            sim_dataset_id (int): Simulation dataset ID
+            fields (List[str], optional): Simulated activity fields to get, from SIMULATED_ACTIVITY_FIELDS. Defaults
+                to None (all).
 
-                    start_value = {
-                        "x": segment_start_time,
-                        "y": dynamics["initial"],
-                    }
+        Raises:
+            ValueError: If an unknown field is requested
 
-                    # If the last value is not identical to this segment's start, then add the start
-                    if (len(values) and values[-1] != start_value) or (
-                        len(values) == 0
-                    ):
-                        values.append(start_value)
+        Returns:
+            List[Dict]: Simulated activities, in order of start offset
+        """
 
-                    # Add a value at the end of this segment
-                    values.append(
-                        {
-                            "x": segment_end_time,
-                            "y": dynamics["initial"]
-                            + dynamics["rate"]
-                            * ((segment_end_time - segment_start_time) / 1e6),
-                        }
-                    )
+        sim_result_query = f"""
+        query Simulation($sim_dataset_id: Int!) {{
+            simulated_activity(where: {{ simulation_dataset_id: {{ _eq: $sim_dataset_id }} }}, order_by: {{ start_offset: asc }}) {{
+                {self.__simulated_activity_selection(fields)}
+            }}
+        }}
+        """
+        resp = self.aerie_host.post_to_graphql(
+            sim_result_query, sim_dataset_id=sim_dataset_id)
+        return resp
 
-                else:
-                    raise ValueError(f"Unknown resource profile type: {profile_type}")
+    def iter_simulation_results(
+        self, sim_dataset_id: int, page_size: int = SIMULATION_RESULTS_PAGE_SIZE, fields: List[str] = None
+    ) -> Iterator[Dict]:
+        """Iterate over the simulated activities of a simulation dataset, requesting them a page at a time
 
-            resources[name] = values
-        return {
-            "resourceSamples": resources
-        }
+        Pages use keyset pagination on activity ID, so only one page is held in memory at a time and every request
+        is a bounded index scan.
 
-    def get_simulation_results(self, sim_dataset_id: int) -> str:
+        Args:
+            sim_dataset_id (int): Simulation dataset ID
+            page_size (int, optional): Number of activities per request. Defaults to SIMULATION_RESULTS_PAGE_SIZE.
+            fields (List[str], optional): Simulated activity fields to get, from SIMULATED_ACTIVITY_FIELDS. `id` is
+                always included. Defaults to None (all).
 
-        sim_result_query = """
-        query Simulation($sim_dataset_id: Int!) {
-            simulated_activity(where: { simulation_dataset_id: { _eq: $sim_dataset_id } }, order_by: { start_offset: asc }) {
-                activity_type_name
-                attributes
-                directive_id
-                duration
-                end_time
-                id
-                start_offset
-                start_time
-                simulation_dataset_id
-                parent_id
-            }
-        }
+        Raises:
+            ValueError: If an unknown field is requested or the page size isn't positive
+
+        Yields:
+            Dict: Simulated activities, in order of ID
         """
-        resp = self.aerie_host.post_to_graphql(
-            sim_result_query, sim_dataset_id=sim_dataset_id)
-        return resp
+        if page_size < 1:
+            raise ValueError(f"Page size must be positive: {page_size}")
+        if fields is not None and "id" not in fields:
+            fields = ["id"] + list(fields)
+
+        sim_result_query = f"""
+        query SimulationPage($sim_dataset_id: Int!, $last_id: Int!, $page_size: Int!) {{
+            simulated_activity(
+                where: {{ simulation_dataset_id: {{ _eq: $sim_dataset_id }}, id: {{ _gt: $last_id }} }}
+                order_by: {{ id: asc }}
+                limit: $page_size
+            ) {{
+                {self.__simulated_activity_selection(fields)}
+            }}
+        }}
+        """
+
+        last_id = -1
+        while True:
+            page = self.aerie_host.post_to_graphql(
+                sim_result_query, sim_dataset_id=sim_dataset_id, last_id=last_id, page_size=page_size
+            )
+            yield from page
+            if len(page) < page_size:
+                return
+            last_id = page[-1]["id"]
+
+    def __simulated_activity_selection(self, fields: List[str] = None) -> str:
+        if fields is None:
+            return "\n".join(SIMULATED_ACTIVITY_FIELDS)
+        unknown = [f for f in fields if f not in SIMULATED_ACTIVITY_FIELDS]
+        if len(unknown):
+            raise ValueError(f"Unknown simulated activity fields: {', '.join(unknown)}")
+        return "\n".join(fields)
 
     def delete_plan(self, plan_id: int) -> str:
 
@@ -701,7 +1195,7 @@ class AerieClient:
         }
         """
 
-        resp = self.aerie_host.post_to_graphql(get_mission_model_query)
+        resp = self.aerie_host.post_to_graphql(get_mission_model_query, cache_policy=MISSION_MODELS_CACHE_POLICY)
         api_mission_models = [
             ApiMissionModelRead.from_dict(model) for model in resp]
 
@@ -1023,7 +1517,7 @@ class AerieClient:
             }
         }
         """
-        resp = self.aerie_host.post_to_graphql(list_rules_query)
+        resp = self.aerie_host.post_to_graphql(list_rules_query, cache_policy=EXPANSION_RULES_CACHE_POLICY)
         return [ExpansionRule.from_dict(r) for r in resp]
 
     def get_rules_by_type(self) -> Dict[str, List[ExpansionRule]]:
@@ -1151,7 +1645,12 @@ class AerieClient:
         return ExpansionRun.from_dict(resp[0])
 
     def link_activities_to_sequence(
-        self, seq_id: str, simulation_dataset_id: int, simulated_activity_ids: List[int]
+        self,
+        seq_id: str,
+        simulation_dataset_id: int,
+        simulated_activity_ids: List[int],
+        chunk_size: int = SEQUENCE_LINK_CHUNK_SIZE,
+        progress: Callable[[int], None] = None,
     ) -> None:
         """Link a set of simulated activities to a sequence for expansion
 
@@ -1160,37 +1659,77 @@ class AerieClient:
         expansion outputs from the given activities are included in the
         sequence.
 
+        Activities are linked in bulk, `chunk_size` per request. Linking is idempotent: activities which are already
+        linked to this sequence are left as they are.
+
         Args:
             seq_id (str): ID of the sequence to which activities will be linked
             simulation_dataset_id (int): Dataset which contains the activities being linked
             simulated_activity_ids (List[int]): IDs of simulated activities to be linked
-        """
+            chunk_size (int, optional): Maximum number of activities linked per request. Defaults to
+                SEQUENCE_LINK_CHUNK_SIZE.
+            progress (Callable[[int], None], optional): Called with the number of activities linked after each
+                request. Defaults to None.
 
-        for simulated_activity_id in simulated_activity_ids:
+        Raises:
+            RuntimeError: If any activity is already linked to a different sequence
+        """
 
-            link_activity_to_sequence_query = """
-            mutation LinkSimulatedActivityToSequence(
-                $seq_id: String!
-                $simulation_dataset_id: Int!
-                $simulated_activity_id: Int!
+        get_links_query = """
+        query GetSequenceLinks($simulation_dataset_id: Int!, $simulated_activity_ids: [Int!]!) {
+            sequence_to_simulated_activity(
+                where: {
+                    simulation_dataset_id: { _eq: $simulation_dataset_id }
+                    simulated_activity_id: { _in: $simulated_activity_ids }
+                }
             ) {
-                insert_sequence_to_simulated_activity_one(
-                    object: {
-                        seq_id: $seq_id
-                        simulated_activity_id: $simulated_activity_id
-                        simulation_dataset_id: $simulation_dataset_id
-                    }
-                ) {
-                    seq_id
+                seq_id
+                simulated_activity_id
+            }
+        }
+        """
+
+        link_activities_to_sequence_query = """
+        mutation LinkSimulatedActivitiesToSequence($objects: [sequence_to_simulated_activity_insert_input!]!) {
+            insert_sequence_to_simulated_activity(
+                objects: $objects
+                on_conflict: {
+                    constraint: sequence_to_simulated_activity_primary_key
+                    update_columns: []
                 }
+            ) {
+                affected_rows
             }
-            """
-            self.aerie_host.post_to_graphql(
-                link_activity_to_sequence_query,
-                seq_id=seq_id,
-                simulated_activity_id=simulated_activity_id,
-                simulation_dataset_id=simulation_dataset_id,
+        }
+        """
+
+        for i in range(0, len(simulated_activity_ids), chunk_size):
+            chunk = simulated_activity_ids[i:i + chunk_size]
+
+            # Activities may only be linked to one sequence, so report any linked elsewhere rather than moving them
+            links = self.aerie_host.post_to_graphql(
+                get_links_query, simulation_dataset_id=simulation_dataset_id, simulated_activity_ids=chunk
             )
+            conflicts = sorted(link["simulated_activity_id"] for link in links if link["seq_id"] != seq_id)
+            if len(conflicts):
+                raise RuntimeError(f"Simulated activities already linked to other sequences: {conflicts}")
+            linked = set(link["simulated_activity_id"] for link in links)
+
+            unlinked = [simulated_activity_id for simulated_activity_id in chunk if simulated_activity_id not in linked]
+            if len(unlinked):
+                self.aerie_host.post_to_graphql(
+                    link_activities_to_sequence_query,
+                    objects=[
+                        {
+                            "seq_id": seq_id,
+                            "simulated_activity_id": simulated_activity_id,
+                            "simulation_dataset_id": simulation_dataset_id,
+                        }
+                        for simulated_activity_id in unlinked
+                    ],
+                )
+            if progress is not None:
+                progress(len(chunk))
 
     def get_simulated_activity_ids(self, simulation_dataset_id: int) -> List[int]:
         """Get the IDs of all simulated activities in a simulation dataset
@@ -1356,7 +1895,7 @@ class AerieClient:
         }
         """
         data = self.aerie_host.post_to_graphql(
-            get_types_query, model_id=model_id)
+            get_types_query, cache_policy=ACTIVITY_TYPES_CACHE_POLICY, model_id=model_id)
         activity_types = [o["name"] for o in data]
         return activity_types
 
@@ -1496,7 +2035,7 @@ class AerieClient:
                 mission
             }
         }
-        """)
+        """, cache_policy=DICTIONARIES_CACHE_POLICY)
         channel_dictionaries = self.aerie_host.post_to_graphql("""query ListDictionaries {
             channel_dictionary {
                 id
@@ -1506,7 +2045,7 @@ class AerieClient:
                 mission
             }
         }
-        """)
+        """, cache_policy=DICTIONARIES_CACHE_POLICY)
         parameter_dictionaries = self.aerie_host.post_to_graphql("""query ListDictionaries {
             parameter_dictionary {
                 id
@@ -1516,7 +2055,7 @@ class AerieClient:
                 mission
             }
         }
-        """)
+        """, cache_policy=DICTIONARIES_CACHE_POLICY)
         return {
             DictionaryType.COMMAND: [DictionaryMetadata.from_dict(i) for i in command_dictionaries],
             DictionaryType.CHANNEL: [DictionaryMetadata.from_dict(i) for i in channel_dictionaries],
@@ -1698,7 +2237,8 @@ class AerieClient:
                     }
                 }
             }
-            """
+            """,
+            cache_policy=PARCELS_CACHE_POLICY,
         )
         return [Parcel.from_api_read(ApiParcelRead.from_dict(p)) for p in resp]
 
@@ -1875,35 +2415,110 @@ class AerieClient:
 
         return resp[0]["revision"]
 
-    def __expand_activity_arguments(self, plan: ActivityPlanRead, full_args: str = None) -> ActivityPlanRead:
+    def __expand_activity_arguments(
+        self, plans: List[ActivityPlanRead], full_args: str = None
+    ) -> List[ActivityPlanRead]:
         if full_args is None or full_args == "" or full_args.lower() == "false":
-            return plan
+            return plans
         expand_all = full_args.lower() == "true"
         expand_types = {} if expand_all else set(full_args.split(","))
-        for activity in plan.activities:
-            if expand_all or activity.type in expand_types:
-                query = """
-                query ($args: ActivityArguments!, $act_type: String!, $model_id: Int!) {
-                    getActivityEffectiveArguments(
-                        activityArguments: $args,
-                        activityTypeName: $act_type,
-                        missionModelId: $model_id
-                    )
-                    {
-                        arguments
-                        success
-                    }
-                }
-                """
-                resp = self.aerie_host.post_to_graphql(
-                    query,
-                    args=activity.arguments,
-                    act_type=activity.type,
-                    model_id=plan.model_id,
+
+        def expanded_keys(plan: ActivityPlanRead) -> Iterator[Tuple[Activity, Tuple[int, str, str]]]:
+            for activity in plan.activities:
+                if expand_all or activity.type in expand_types:
+                    yield activity, (plan.model_id, activity.type, json.dumps(activity.arguments, sort_keys=True))
+
+        # Many directives share the same model, type, and arguments, so only request each distinct triple once
+        unique_arguments: Dict[Tuple[int, str, str], Tuple[str, Dict]] = {}
+        for plan in plans:
+            for activity, key in expanded_keys(plan):
+                unique_arguments.setdefault(key, (activity.type, activity.arguments))
+        model_ids = sorted(set(key[0] for key in unique_arguments.keys()))
+
+        # Check the cache first, then request the rest
+        effective_arguments = {}
+        cache = self.effective_arguments_cache
+        jar_ids = {}
+        if cache is not None:
+            for model_id in model_ids:
+                jar_ids[model_id] = self.__get_mission_model_jar_id(model_id)
+                model_keys = [k for k in unique_arguments.keys() if k[0] == model_id]
+                cached = cache.get_many(
+                    self.aerie_host.graphql_url, model_id, jar_ids[model_id], [unique_arguments[k] for k in model_keys]
                 )
-                activity.arguments = ApiEffectiveActivityArguments.from_dict(
-                    resp).arguments
-        return plan
+                effective_arguments.update(
+                    {key: arguments for key, arguments in zip(model_keys, cached) if arguments is not None}
+                )
+
+        # Each batch is for a single model
+        batches = []
+        for model_id in model_ids:
+            model_keys = [k for k in unique_arguments.keys() if k[0] == model_id and k not in effective_arguments]
+            batches += [
+                model_keys[i:i + self.effective_arguments_batch_size]
+                for i in range(0, len(model_keys), self.effective_arguments_batch_size)
+            ]
+        batch_results = self.map_concurrently(
+            lambda batch: self.__get_effective_arguments_batch(batch[0][0], [unique_arguments[k] for k in batch]),
+            batches,
+        )
+        requested = {
+            key: arguments for batch, results in zip(batches, batch_results) for key, arguments in zip(batch, results)
+        }
+        effective_arguments.update(requested)
+
+        if cache is not None:
+            for model_id in model_ids:
+                model_requested = [unique_arguments[k] + (a,) for k, a in requested.items() if k[0] == model_id]
+                if len(model_requested):
+                    cache.put_many(self.aerie_host.graphql_url, model_id, jar_ids[model_id], model_requested)
+
+        for plan in plans:
+            for activity, key in expanded_keys(plan):
+                activity.arguments = deepcopy(effective_arguments[key])
+        return plans
+
+    def __get_mission_model_jar_id(self, model_id: int) -> int:
+        query = """
+        query GetMissionModelJarId($model_id: Int!) {
+            mission_model_by_pk(id: $model_id) {
+                jar_id
+            }
+        }
+        """
+        resp = self.aerie_host.post_to_graphql(query, model_id=model_id)
+        return resp["jar_id"]
+
+    def __get_effective_arguments_batch(self, model_id: int, activities: List[Tuple[str, Dict]]) -> List[Dict]:
+        # Request effective arguments for many activities at once, aliasing each request as a0, a1, ...
+        variable_definitions = ["$model_id: Int!"]
+        fields = []
+        variables = {"model_id": model_id}
+        for i, (act_type, args) in enumerate(activities):
+            variable_definitions += [f"$args_{i}: ActivityArguments!", f"$act_type_{i}: String!"]
+            fields.append(f"""
+                a{i}: getActivityEffectiveArguments(
+                    activityArguments: $args_{i},
+                    activityTypeName: $act_type_{i},
+                    missionModelId: $model_id
+                )
+                {{
+                    arguments
+                    success
+                }}
+            """)
+            variables[f"args_{i}"] = args
+            variables[f"act_type_{i}"] = act_type
+
+        query = f"""
+        query GetActivityEffectiveArguments({", ".join(variable_definitions)}) {{
+            {"".join(fields)}
+        }}
+        """
+        resp = self.aerie_host.post_to_graphql_multiple(query, **variables)
+        if any(resp[f"a{i}"] is None for i in range(len(activities))):
+            raise RuntimeError(f"Failed to get effective arguments for mission model {model_id}")
+        return [ApiEffectiveActivityArguments.from_dict(resp[f"a{i}"]).arguments for i in range(len(activities))]
 
     def upload_constraint(self, constraint):
         upload_constraint_query = """
@@ -2099,7 +2714,7 @@ class AerieClient:
         """
 
         resp = self.aerie_host.post_to_graphql(
-            get_resource_types_query, missionModelId=model_id
+            get_resource_types_query, cache_policy=RESOURCE_TYPES_CACHE_POLICY, missionModelId=model_id
         )
         return [ResourceType.from_dict(r) for r in resp]
 
@@ -1,11 +1,29 @@
+import gzip
 import json
 import requests
 from copy import deepcopy
+from datetime import datetime, timedelta, timezone
+from typing import BinaryIO
+from typing import Callable
 from typing import Dict
 from typing import Optional
+from typing import TYPE_CHECKING
+from typing import Union
 from base64 import b64decode
 
 from attrs import define, field
+from requests.adapters import DEFAULT_POOLSIZE, HTTPAdapter
+from requests.utils import DEFAULT_ACCEPT_ENCODING
+
+from aerie_cli.utils.retry import RetryPolicy
+from aerie_cli.utils.query_cache import QueryCachePolicy
+from aerie_cli.utils.query_cache import query_cache_key
+from aerie_cli.utils.retry import is_graphql_mutation
+from aerie_cli.utils.subscriptions import wait_for_subscription
+from aerie_cli.utils.subscriptions import websocket_url
+
+if TYPE_CHECKING:
+    from aerie_cli.persistent import QueryCache
 
 COMPATIBLE_AERIE_VERSIONS = [
     "3.5.0",
@@ -13,10 +31,22 @@ COMPATIBLE_AERIE_VERSIONS = [
     "3.5.2",
 ]
 
+# Smallest GraphQL request body to compress, if enabled
+COMPRESS_MIN_BYTES = 64 * 1024
+
+
+# Hasura error codes for rejected credentials, e.g. an expired JWT
+HASURA_AUTH_ERROR_CODES = ["invalid-jwt", "invalid-headers"]
+
+
 class AerieHostVersionError(RuntimeError):
     pass
 
 
+class AerieAuthenticationError(RuntimeError):
+    """The Aerie host rejected a session's credentials, which failed re-verification"""
+
+
 def process_gateway_response(resp: requests.Response) -> dict:
     """Throw a RuntimeError if the Gateway response is malformed or contains errors
 
@@ -40,7 +70,32 @@ def process_gateway_response(resp: requests.Response) -> dict:
     return resp_json
 
 
+def is_unauthorized_response(resp: requests.Response) -> bool:
+    """Check whether a response rejected the request's credentials
+
+    Args:
+        resp (requests.Response): Response from the Aerie Gateway or Hasura
+
+    Returns:
+        bool: True for a 401 response or a Hasura JWT error
+    """
+    if resp.status_code == 401:
+        return True
+    try:
+        resp_json = resp.json()
+    except (ValueError, requests.exceptions.JSONDecodeError):
+        return False
+    if not isinstance(resp_json, dict):
+        return False
+    return any(
+        isinstance(e, dict) and e.get("extensions", {}).get("code") in HASURA_AUTH_ERROR_CODES
+        for e in resp_json.get("errors", [])
+    )
+
+
 class AerieJWT:
+    expiration: Optional[datetime] = None
+
     def __init__(self, encoded_jwt: str) -> None:
         jwt_components = encoded_jwt.split(".")
         if not len(jwt_components) == 3:
@@ -54,6 +109,9 @@ class AerieJWT:
             ]
             self.default_role = payload["https://hasura.io/jwt/claims"]["x-hasura-default-role"]
             self.username = payload["username"]
+            self.expiration = (
+                datetime.fromtimestamp(payload["exp"], timezone.utc) if "exp" in payload.keys() else None
+            )
 
         except KeyError:
             raise ValueError(f"Missing fields in JWT: {encoded_jwt}")
@@ -63,6 +121,19 @@ class AerieJWT:
 
         self.encoded_jwt = encoded_jwt
 
+    def expires_within(self, duration: timedelta) -> bool:
+        """Check whether this token expires within a duration from now
+
+        Args:
+            duration (timedelta): Duration from now
+
+        Returns:
+            bool: True if the token expires within the duration, False if it doesn't or has no expiration
+        """
+        if self.expiration is None:
+            return False
+        return self.expiration <= datetime.now(timezone.utc) + duration
+
 
 class AerieHost:
     """
@@ -72,12 +143,22 @@ class AerieHost:
     cookie information stored in the `requests.Session` object, if necessary.
     """
 
+    # Class-level defaults for instances persisted before these settings existed
+    transport: "TransportConfiguration" = None
+    retry_policy: RetryPolicy = None
+    last_verified: Optional[datetime] = None
+
+    # Cache for results of queries made with a `QueryCachePolicy`. Not persisted with sessions.
+    query_cache: "QueryCache" = None
+
     def __init__(
         self,
         graphql_url: str,
         gateway_url: str,
         session: requests.Session = None,
         configuration_name: str = None,
+        transport: "TransportConfiguration" = None,
+        retry_policy: RetryPolicy = None,
     ) -> None:
         """
 
@@ -86,6 +167,10 @@ class AerieHost:
             gateway_url (str): Route to Aerie Gateway
             session (requests.Session, optional): Session with headers/cookies for external authentication
             configuration_name (str, optional): Name of configuration for this session
+            transport (TransportConfiguration, optional): HTTP transport settings. Defaults to None (`requests`
+                defaults).
+            retry_policy (RetryPolicy, optional): Retries for transient failures. Defaults to retrying GraphQL
+                queries, but not mutations.
         """
         self.session = session if session else requests.Session()
         self.graphql_url = graphql_url
@@ -93,28 +178,125 @@ class AerieHost:
         self.configuration_name = configuration_name
         self.aerie_jwt = None
         self.active_role = None
+        self.last_verified = None
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        if transport is not None:
+            self.configure_transport(transport)
+
+    def configure_transport(self, transport: "TransportConfiguration") -> None:
+        """Apply HTTP transport settings to this host's session
+
+        Args:
+            transport (TransportConfiguration): Connection pool and compression settings
+        """
+        adapter = HTTPAdapter(pool_connections=transport.pool_connections, pool_maxsize=transport.pool_maxsize)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.transport = transport
 
-    def post_to_graphql(self, query: str, **kwargs) -> Dict:
+    def post_to_graphql(self, query: str, cache_policy: QueryCachePolicy = None, **kwargs) -> Dict:
         """Issue a post request to the Aerie instance GraphQL API
 
         Args:
             query (str): GraphQL query text
+            cache_policy (QueryCachePolicy, optional): Rules for caching the results of a read-only query, used if
+                this host has a `query_cache`. Defaults to None (not cached).
             kwargs: keyword arguments for named variables for the query
 
         Raises:
-            RuntimeError
+            RuntimeError: Including if the query's (first) root field is null
 
         Returns:
             Dict: Query response data
         """
+        data = self.post_to_graphql_multiple(query, cache_policy, **kwargs)
+        field_name, value = next(iter(data.items()))
+        if value is None:
+            raise RuntimeError(f"Failed to process response: {field_name} is null")
+        return value
+
+    def post_to_graphql_multiple(
+        self, query: str, cache_policy: QueryCachePolicy = None, **kwargs
+    ) -> Dict[str, Dict]:
+        """Issue a post request to the Aerie instance GraphQL API and return data for every root field
+
+        Use for queries with multiple root fields, e.g. the same field requested many times under different aliases.
+
+        Args:
+            query (str): GraphQL query text
+            cache_policy (QueryCachePolicy, optional): Rules for caching the results of a read-only query, used if
+                this host has a `query_cache`. Defaults to None (not cached).
+            kwargs: keyword arguments for named variables for the query
+
+        Raises:
+            RuntimeError
+
+        Returns:
+            Dict[str, Dict]: Query response data keyed by root field name or alias. Nullable fields, e.g. lookups by
+            primary key, may be None.
+        """
+        if self.query_cache is None:
+            return self._post_to_graphql_multiple(query, **kwargs)
+
+        if is_graphql_mutation(query):
+            # Invalidate even if the request fails, since the mutation may still have been applied
+            try:
+                return self._post_to_graphql_multiple(query, **kwargs)
+            finally:
+                self.query_cache.invalidate(self.graphql_url, query)
+
+        if cache_policy is None:
+            return self._post_to_graphql_multiple(query, **kwargs)
+
+        key = query_cache_key(
+            self.graphql_url,
+            self.aerie_jwt.username if self.aerie_jwt is not None else None,
+            self.active_role,
+            query,
+            kwargs,
+        )
+        data = self.query_cache.get(key)
+        if data is None:
+            data = self._post_to_graphql_multiple(query, **kwargs)
+            if cache_policy.should_cache(data):
+                self.query_cache.put(self.graphql_url, key, cache_policy, data)
+        return data
+
+    def _post_to_graphql_multiple(self, query: str, **kwargs) -> Dict[str, Dict]:
 
         try:
 
-            resp = self.session.post(
-                self.graphql_url,
-                json={"query": query, "variables": kwargs},
-                headers=self.get_auth_headers(),
-            )
+            if self.transport is None:
+                request_kwargs = {
+                    "json": {"query": query, "variables": kwargs},
+                    "headers": self.get_auth_headers(),
+                }
+            else:
+                headers = {
+                    **self.get_auth_headers(),
+                    "Accept-Encoding": self.transport.accept_encoding,
+                    "Content-Type": "application/json",
+                }
+                body = json.dumps({"query": query, "variables": kwargs}).encode("utf-8")
+                if self.transport.compress_requests and len(body) >= self.transport.compress_min_bytes:
+                    body = gzip.compress(body)
+                    headers["Content-Encoding"] = "gzip"
+                request_kwargs = {"data": body, "headers": headers}
+
+            def send() -> requests.Response:
+                return self._send(
+                    lambda: self.session.post(self.graphql_url, **request_kwargs),
+                    self.graphql_url,
+                    idempotent=not is_graphql_mutation(query),
+                )
+
+            resp = send()
+
+            # The host rejected the request but the session checks out, so try once more with fresh headers
+            if is_unauthorized_response(resp):
+                self.verify_after_unauthorized()
+                request_kwargs["headers"] = {**request_kwargs["headers"], **self.get_auth_headers()}
+                resp = send()
 
             resp.raise_for_status()
             try:
@@ -129,13 +311,16 @@ class AerieHost:
                     f"GraphQL Error: {json.dumps(resp_json['errors'])}"
                 )
             else:
-                data = next(iter(resp.json()["data"].values()))
+                data = resp_json["data"]
 
             if data is None:
                 raise RuntimeError(f"Failed to process response: {resp}")
 
             return data
 
+        except AerieAuthenticationError:
+            raise
+
         except RuntimeError as e:
             # Re-raise with additional information
             e = str(e)
@@ -174,12 +359,53 @@ class AerieHost:
                     )
                 )
 
-    def post_to_gateway_files(self, file_name: str, file_contents: bytes) -> Dict:
+    def wait_for_subscription(
+        self, query: str, predicate: Callable[[Dict], bool], timeout: float = None, **kwargs
+    ) -> Dict:
+        """Subscribe to the Aerie instance GraphQL API and wait for data satisfying a predicate
+
+        Requires the optional websocket-client package.
+
+        Args:
+            query (str): GraphQL subscription text
+            predicate (Callable[[Dict], bool]): Called with each response's data for the first root field; return
+                True to stop waiting
+            timeout (float, optional): Maximum seconds to wait. Defaults to None, which waits indefinitely.
+            kwargs: keyword arguments for named variables for the subscription
+
+        Raises:
+            TimeoutError: If no response satisfies the predicate before the timeout
+            SubscriptionUnavailableError: If a subscription can't be established, e.g. websocket-client isn't installed
+
+        Returns:
+            Dict: Subscription response data
+        """
+        headers = dict(self.get_auth_headers())
+        cookies = self.session.cookies.get_dict()
+        if cookies:
+            headers["Cookie"] = "; ".join(f"{k}={v}" for k, v in cookies.items())
+
+        data = wait_for_subscription(
+            websocket_url(self.graphql_url),
+            query,
+            kwargs,
+            lambda d: predicate(next(iter(d.values()))),
+            headers=headers,
+            timeout=timeout,
+        )
+        return next(iter(data.values()))
+
+    def _send(self, request, url: str, idempotent: bool) -> requests.Response:
+        if self.retry_policy is None:
+            return request()
+        return self.retry_policy.send(request, url, idempotent)
+
+    def post_to_gateway_files(self, file_name: str, file_contents: Union[bytes, BinaryIO]) -> Dict:
         """Issue a post request to upload a file via the Aerie gateway
 
         Args:
             file_name (str): Name of the file being uploaded
-            file_contents (bytes): File contents
+            file_contents (Union[bytes, BinaryIO]): File contents, or a binary file object to read them from
 
         Raises:
             RuntimeError: Raised if the request receives an error response
@@ -187,12 +413,27 @@ class AerieHost:
         Returns:
             Dist: JSON response
         """
+        # A file object can only be read once, so buffer its contents for any retried attempts
+        if hasattr(file_contents, "read"):
+            file_contents = file_contents.read()
+
+        def send() -> requests.Response:
+            return self._send(
+                lambda: self.session.post(
+                    self.gateway_url + "/file",
+                    files={"file": (file_name, file_contents)},
+                    headers=self.get_auth_headers(),
+                ),
+                self.gateway_url + "/file",
+                idempotent=False,
+            )
 
-        resp = self.session.post(
-            self.gateway_url + "/file",
-            files={"file": (file_name, file_contents)},
-            headers=self.get_auth_headers(),
-        )
+        resp = send()
+
+        # The host rejected the request but the session checks out, so try once more
+        if is_unauthorized_response(resp):
+            self.verify_after_unauthorized()
+            resp = send()
 
         if resp.ok:
             return resp.json()
@@ -232,10 +473,41 @@ class AerieHost:
         except requests.exceptions.ConnectionError:
             return False
         try:
-            return resp.json()["success"]
+            success = resp.json()["success"]
         except Exception:
             return False
 
+        if success:
+            self.last_verified = datetime.now(timezone.utc)
+        return success
+
+    def is_recently_verified(self, window: timedelta) -> bool:
+        """Check whether this session was verified recently enough to be trusted without re-checking
+
+        A session is trusted if `check_auth` succeeded within the window and its JWT doesn't expire within the window.
+
+        Args:
+            window (timedelta): Trust window
+
+        Returns:
+            bool: True if the session can be used without calling `check_auth`
+        """
+        if self.last_verified is None or self.aerie_jwt is None:
+            return False
+        if self.aerie_jwt.expires_within(window):
+            return False
+        return datetime.now(timezone.utc) - self.last_verified < window
+
+    def verify_after_unauthorized(self) -> None:
+        """Re-verify authentication after the host rejected a request
+
+        Raises:
+            AerieAuthenticationError: If the session is no longer authenticated
+        """
+        self.last_verified = None
+        if not self.check_auth():
+            raise AerieAuthenticationError(f"Session is no longer authenticated with {self.gateway_url}")
+
     def get_auth_headers(self):
         if self.aerie_jwt is None:
             return {}
@@ -317,6 +589,66 @@ class AerieHost:
         if host_version not in COMPATIBLE_AERIE_VERSIONS:
             raise AerieHostVersionError(f"Incompatible Aerie version: {host_version}")
 
+    def to_dict(self) -> Dict:
+        """Serialize the state needed to resume this session
+
+        Only URLs, credentials, role, and cookies are included; the `requests.Session` itself is not.
+
+        Returns:
+            Dict: JSON-serializable session state
+        """
+        return {
+            "configuration_name": self.configuration_name,
+            "graphql_url": self.graphql_url,
+            "gateway_url": self.gateway_url,
+            "jwt": None if self.aerie_jwt is None else self.aerie_jwt.encoded_jwt,
+            "active_role": self.active_role,
+            "last_verified": None if self.last_verified is None else self.last_verified.timestamp(),
+            "cookies": [
+                {
+                    "name": c.name,
+                    "value": c.value,
+                    "domain": c.domain,
+                    "path": c.path,
+                    "secure": c.secure,
+                    "expires": c.expires,
+                }
+                for c in self.session.cookies
+            ],
+            "transport": None if self.transport is None else self.transport.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, state: Dict) -> "AerieHost":
+        """Resume a session serialized with `to_dict`
+
+        Args:
+            state (Dict): Session state
+
+        Raises:
+            ValueError: If the state is missing fields or has an invalid JWT
+
+        Returns:
+            AerieHost
+        """
+        try:
+            session = requests.Session()
+            for c in state["cookies"]:
+                session.cookies.set_cookie(requests.cookies.create_cookie(**c))
+
+            transport = None if state["transport"] is None else TransportConfiguration.from_dict(state["transport"])
+            aerie_host = cls(
+                state["graphql_url"], state["gateway_url"], session, state["configuration_name"], transport
+            )
+            aerie_host.aerie_jwt = None if state["jwt"] is None else AerieJWT(state["jwt"])
+            aerie_host.active_role = state["active_role"]
+            if state["last_verified"] is not None:
+                aerie_host.last_verified = datetime.fromtimestamp(state["last_verified"], timezone.utc)
+        except KeyError as e:
+            raise ValueError(f"Session missing required field: {e.args[0]}")
+
+        return aerie_host
+
 
 @define
 class ExternalAuthConfiguration:
@@ -365,6 +697,59 @@ class ExternalAuthConfiguration:
         }
 
 
+TRANSPORT_CONFIGURATION_FIELDS = [
+    "pool_connections",
+    "pool_maxsize",
+    "accept_encoding",
+    "compress_requests",
+    "compress_min_bytes",
+]
+
+
+@define
+class TransportConfiguration:
+    """Configure the HTTP transport used to connect to an Aerie host.
+
+    pool_connections (int): Number of per-host connection pools to keep
+    pool_maxsize (int): Maximum number of kept-alive connections per host
+    accept_encoding (str): Accept-Encoding header for responses. Defaults to every encoding the installed `urllib3` can
+        decode (gzip and deflate, plus brotli if installed).
+    compress_requests (bool): gzip-compress GraphQL request bodies. Only enable if the host accepts
+        `Content-Encoding: gzip` requests.
+    compress_min_bytes (int): Smallest request body to compress
+    """
+
+    pool_connections: int = field(default=DEFAULT_POOLSIZE)
+    pool_maxsize: int = field(default=DEFAULT_POOLSIZE)
+    accept_encoding: str = field(default=DEFAULT_ACCEPT_ENCODING)
+    compress_requests: bool = field(default=False)
+    compress_min_bytes: int = field(default=COMPRESS_MIN_BYTES)
+
+    @classmethod
+    def from_dict(cls, config: Dict) -> "TransportConfiguration":
+        unknown = [k for k in config.keys() if k not in TRANSPORT_CONFIGURATION_FIELDS]
+        if len(unknown):
+            raise ValueError(f"Unknown fields in transport configuration: {', '.join(unknown)}")
+
+        transport = cls(**config)
+
+        for name in ["pool_connections", "pool_maxsize", "compress_min_bytes"]:
+            value = getattr(transport, name)
+            if not isinstance(value, int) or isinstance(value, bool) or value < 0 or (value == 0 and name != "compress_min_bytes"):
+                raise ValueError(f"Invalid value for '{name}' in transport configuration")
+
+        if not isinstance(transport.accept_encoding, str):
+            raise ValueError("Invalid value for 'accept_encoding' in transport configuration")
+
+        if not isinstance(transport.compress_requests, bool):
+            raise ValueError("Invalid value for 'compress_requests' in transport configuration")
+
+        return transport
+
+    def to_dict(self) -> Dict:
+        return {name: getattr(self, name) for name in TRANSPORT_CONFIGURATION_FIELDS}
+
+
 @define
 class AerieHostConfiguration:
     name: str
@@ -372,6 +757,7 @@ class AerieHostConfiguration:
     gateway_url: str
     username: Optional[str] = field(default=None)
     external_auth: Optional[ExternalAuthConfiguration] = field(default=None)
+    transport: Optional[TransportConfiguration] = field(default=None)
 
     @classmethod
     def from_dict(cls, config: Dict) -> "AerieHostConfiguration":
@@ -381,11 +767,12 @@ class AerieHostConfiguration:
             gateway_url = config["gateway_url"]
             username = config["username"] if "username" in config.keys() else None
             external_auth = ExternalAuthConfiguration.from_dict(config["external_auth"]) if "external_auth" in config.keys() else None
+            transport = TransportConfiguration.from_dict(config["transport"]) if "transport" in config.keys() else None
 
         except KeyError as e:
             raise ValueError(f"Configuration missing required field: {e.args[0]}")
 
-        return cls(name, graphql_url, gateway_url, username, external_auth)
+        return cls(name, graphql_url, gateway_url, username, external_auth, transport)
 
     def to_dict(self) -> Dict:
         retval = {
@@ -400,4 +787,7 @@ class AerieHostConfiguration:
         if self.external_auth is not None:
             retval["external_auth"] = self.external_auth.to_dict()
 
+        if self.transport is not None:
+            retval["transport"] = self.transport.to_dict()
+
         return retval
@@ -5,35 +5,26 @@
 import typer
 from typing import Optional
 
-from aerie_cli.commands import models
-from aerie_cli.commands import plans
-from aerie_cli.commands import configurations
-from aerie_cli.commands import expansion
-from aerie_cli.commands import constraints
-from aerie_cli.commands import scheduling
-from aerie_cli.commands import metadata
-
 from aerie_cli.commands.command_context import CommandContext
 from aerie_cli.__version__ import __version__
-from aerie_cli.persistent import (
-    PersistentConfigurationManager,
-    PersistentSessionManager,
-)
-from aerie_cli.utils.prompts import select_from_list
-from aerie_cli.utils.sessions import (
-    start_session_from_configuration,
-    get_active_session_client,
-)
-from aerie_cli.utils.configurations import find_configuration
-
-app = typer.Typer()
-app.add_typer(plans.plans_app, name="plans")
-app.add_typer(models.app, name="models")
-app.add_typer(configurations.app, name="configurations")
-app.add_typer(expansion.app, name="expansion")
-app.add_typer(constraints.app, name="constraints")
-app.add_typer(scheduling.app, name="scheduling")
-app.add_typer(metadata.app, name="metadata")
+from aerie_cli.utils.lazy_commands import LazyTyperGroup
+
+
+class AerieCliGroup(LazyTyperGroup):
+    # Sub-command modules are only imported when invoked, to keep CLI startup fast
+    lazy_subcommands = {
+        "plans": "aerie_cli.commands.plans:plans_app",
+        "models": "aerie_cli.commands.models:app",
+        "configurations": "aerie_cli.commands.configurations:app",
+        "expansion": "aerie_cli.commands.expansion:app",
+        "constraints": "aerie_cli.commands.constraints:app",
+        "scheduling": "aerie_cli.commands.scheduling:app",
+        "metadata": "aerie_cli.commands.metadata:app",
+        "daemon": "aerie_cli.commands.daemon:app",
+    }
+
+
+app = typer.Typer(cls=AerieCliGroup)
 
 
 def print_version(print_version: bool):
@@ -45,13 +36,33 @@ def print_version(print_version: bool):
 def set_alternate_configuration(configuration_identifier: str):
     if configuration_identifier == None:
         return
+
+    from aerie_cli.utils.configurations import find_configuration
+
     found_configuration = find_configuration(configuration_identifier)
 
     CommandContext.alternate_configuration = found_configuration
 
 
-def setup_global_command_context(hasura_admin_secret: str):
+def set_session_name(session_name: str):
+    if session_name is None:
+        return
+
+    from aerie_cli.persistent import PersistentSessionManager
+
+    try:
+        PersistentSessionManager.set_session_name(session_name)
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
+
+
+def setup_global_command_context(
+    hasura_admin_secret: str, max_workers: int = None, no_daemon: bool = False, no_cache: bool = False
+):
     CommandContext.hasura_admin_secret = hasura_admin_secret
+    CommandContext.max_workers = max_workers
+    CommandContext.use_daemon = not no_daemon
+    CommandContext.use_cache = not no_cache
 
 
 @app.callback()
@@ -76,8 +87,31 @@ def app_callback(
             Accepts either a configuration name or the path to a configuration json.\n\
             Configuration names are prioritized over paths.",
     ),
+    max_workers: int = typer.Option(
+        None,
+        "--max-workers",
+        min=1,
+        help="Maximum number of concurrent requests for bulk operations.",
+    ),
+    session_name: str = typer.Option(
+        None,
+        "--session",
+        callback=set_session_name,
+        help="Use a named session, so that concurrent jobs can use separate sessions.\n\
+            Defaults to the AERIE_CLI_SESSION environment variable, or \"default\".",
+    ),
+    no_daemon: bool = typer.Option(
+        False,
+        "--no-daemon",
+        help="Make requests from this process even if an aerie-cli daemon is running.",
+    ),
+    no_cache: bool = typer.Option(
+        False,
+        "--no-cache",
+        help="Fetch mission models, types, dictionaries, etc. from Aerie rather than reusing cached results.",
+    ),
 ):
-    setup_global_command_context(hasura_admin_secret)
+    setup_global_command_context(hasura_admin_secret, max_workers, no_daemon, no_cache)
 
 
 @app.command("activate")
@@ -96,6 +130,10 @@ def activate_session(
     """
     Activate a session with an Aerie host using a given configuration
     """
+    from aerie_cli.persistent import PersistentConfigurationManager, PersistentSessionManager
+    from aerie_cli.utils.prompts import select_from_list
+    from aerie_cli.utils.sessions import start_session_from_configuration
+
     if name is None:
         name = select_from_list(
             [c.name for c in PersistentConfigurationManager.get_configurations()]
@@ -119,6 +157,8 @@ def deactivate_session():
     """
     Deactivate any active session
     """
+    from aerie_cli.persistent import PersistentSessionManager
+
     name = PersistentSessionManager.unset_active_session()
     if name is None:
         typer.echo("No active session")
@@ -135,6 +175,10 @@ def change_role(
     """
     Change Aerie permissions role for the active session
     """
+    from aerie_cli.persistent import PersistentSessionManager
+    from aerie_cli.utils.prompts import select_from_list
+    from aerie_cli.utils.sessions import get_active_session_client
+
     client = get_active_session_client()
 
     if role is None:
@@ -159,4 +203,9 @@ def print_status():
     if client.aerie_host.configuration_name:
         typer.echo(f"Active configuration: {client.aerie_host.configuration_name}")
 
+    if CommandContext.alternate_configuration is None:
+        from aerie_cli.persistent import PersistentSessionManager
+
+        typer.echo(f"Session: {PersistentSessionManager.session_name}")
+
     typer.echo(f"Active role: {client.aerie_host.active_role}")
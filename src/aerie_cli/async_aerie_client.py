@@ -0,0 +1,219 @@
+"""Asyncio interface to Aerie
+
+`AsyncAerieHost` and `AsyncAerieClient` let scripts issue many Aerie requests from one event loop. Calls are made by a
+wrapped `AerieHost` (sharing its authentication, role, and `requests.Session`) on worker threads, so network waits
+overlap without blocking the event loop.
+
+Concurrency is bounded per request rather than per call: at most `max_connections` requests are in flight at once,
+including those made by client methods which issue requests concurrently themselves. Up to `max_calls` calls may be in
+progress at once, so long-running calls like `simulate_plan` (which mostly waits between polls) don't hold up others.
+
+Example:
+
+    async with AsyncAerieClient(aerie_host, max_connections=16) as client:
+        sim_ids = await asyncio.gather(*[client.simulate_plan(plan_id) for plan_id in plan_ids])
+"""
+
+import asyncio
+import functools
+import inspect
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+from typing import Callable
+from typing import Dict
+
+from requests.adapters import DEFAULT_POOLSIZE
+from requests.adapters import HTTPAdapter
+
+from aerie_cli.aerie_client import AerieClient
+from aerie_cli.aerie_host import AerieHost
+from aerie_cli.utils.concurrency import DEFAULT_MAX_WORKERS
+
+# Default maximum number of calls in progress at once, each on its own worker thread
+DEFAULT_MAX_CALLS = 64
+
+
+class _ConnectionLimitedHost:
+    """Proxy for an `AerieHost` which makes at most a fixed number of requests at once, from any number of threads"""
+
+    def __init__(self, aerie_host: AerieHost, max_connections: int) -> None:
+        self._aerie_host = aerie_host
+        self._semaphore = threading.BoundedSemaphore(max_connections)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._aerie_host, name)
+
+    def post_to_graphql(self, *args, **kwargs) -> Dict:
+        with self._semaphore:
+            return self._aerie_host.post_to_graphql(*args, **kwargs)
+
+    def post_to_graphql_multiple(self, *args, **kwargs) -> Dict[str, Dict]:
+        with self._semaphore:
+            return self._aerie_host.post_to_graphql_multiple(*args, **kwargs)
+
+    def post_to_gateway_files(self, file_name: str, file_contents: bytes) -> Dict:
+        with self._semaphore:
+            return self._aerie_host.post_to_gateway_files(file_name, file_contents)
+
+    def check_auth(self) -> bool:
+        with self._semaphore:
+            return self._aerie_host.check_auth()
+
+
+class AsyncAerieHost:
+    """Asynchronous interface to an Aerie host
+
+    Wraps an `AerieHost`, which remains responsible for authentication and roles. At most `max_connections` requests
+    are in flight at once.
+    """
+
+    def __init__(
+        self, aerie_host: AerieHost, max_connections: int = DEFAULT_MAX_WORKERS, max_calls: int = DEFAULT_MAX_CALLS
+    ) -> None:
+        """
+
+        Args:
+            aerie_host (AerieHost): Aerie host, authenticated if necessary
+            max_connections (int, optional): Maximum number of concurrent requests. Defaults to DEFAULT_MAX_WORKERS.
+            max_calls (int, optional): Maximum number of calls in progress at once, whether making requests or
+                waiting. Defaults to DEFAULT_MAX_CALLS.
+        """
+        if max_connections < 1:
+            raise ValueError(f"max_connections must be positive: {max_connections}")
+        if max_calls < 1:
+            raise ValueError(f"max_calls must be positive: {max_calls}")
+
+        self.aerie_host = aerie_host
+        self.max_connections = max_connections
+        self.limited_host = _ConnectionLimitedHost(aerie_host, max_connections)
+        self._executor = ThreadPoolExecutor(max_workers=max_calls, thread_name_prefix="aerie-cli")
+
+        # Keep a pooled connection for each worker, preserving any configured transport's pool settings
+        transport = getattr(aerie_host, "transport", None)
+        if transport is None:
+            if max_connections > DEFAULT_POOLSIZE:
+                adapter = HTTPAdapter(pool_maxsize=max_connections)
+                self.aerie_host.session.mount("http://", adapter)
+                self.aerie_host.session.mount("https://", adapter)
+        elif max_connections > transport.pool_maxsize:
+            adapter = HTTPAdapter(pool_connections=transport.pool_connections, pool_maxsize=max_connections)
+            self.aerie_host.session.mount("http://", adapter)
+            self.aerie_host.session.mount("https://", adapter)
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run a blocking function which makes requests to this host on a worker thread
+
+        Args:
+            fn (Callable): Function to run
+            args, kwargs: Arguments to the function
+
+        Returns:
+            Any: Function return value
+        """
+        # get_event_loop returns the running loop within a coroutine, and unlike get_running_loop exists in Python 3.6
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+    async def post_to_graphql(self, query: str, **kwargs) -> Dict:
+        """Issue a post request to the Aerie instance GraphQL API
+
+        See `AerieHost.post_to_graphql`.
+        """
+        return await self.run(self.limited_host.post_to_graphql, query, **kwargs)
+
+    async def post_to_graphql_multiple(self, query: str, **kwargs) -> Dict[str, Dict]:
+        """Issue a post request to the Aerie instance GraphQL API and return data for every root field
+
+        See `AerieHost.post_to_graphql_multiple`.
+        """
+        return await self.run(self.limited_host.post_to_graphql_multiple, query, **kwargs)
+
+    async def post_to_gateway_files(self, file_name: str, file_contents: bytes) -> Dict:
+        """Upload a file to the Aerie Gateway
+
+        See `AerieHost.post_to_gateway_files`.
+        """
+        return await self.run(self.limited_host.post_to_gateway_files, file_name, file_contents)
+
+    async def check_auth(self) -> bool:
+        """Check if the wrapped host's session is authenticated
+
+        See `AerieHost.check_auth`.
+        """
+        return await self.run(self.limited_host.check_auth)
+
+    async def authenticate(self, username: str, password: str = None, force: bool = False) -> None:
+        """Authenticate the wrapped host
+
+        See `AerieHost.authenticate`.
+        """
+        await self.run(self.aerie_host.authenticate, username, password, force)
+
+    def change_role(self, new_role: str) -> None:
+        """Change the role of the wrapped host
+
+        See `AerieHost.change_role`.
+        """
+        self.aerie_host.change_role(new_role)
+
+    @property
+    def active_role(self) -> str:
+        return self.aerie_host.active_role
+
+    def close(self) -> None:
+        """Shut down worker threads once any in-flight requests complete"""
+        self._executor.shutdown(wait=True)
+
+    async def __aenter__(self) -> "AsyncAerieHost":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.close()
+
+
+class AsyncAerieClient:
+    """Asynchronous client-side behavior for aerie-cli
+
+    Provides every public method of `AerieClient` as a coroutine with the same arguments and return value.
+    """
+
+    def __init__(
+        self, aerie_host: AerieHost, max_connections: int = DEFAULT_MAX_WORKERS, max_calls: int = DEFAULT_MAX_CALLS
+    ) -> None:
+        """Instantiate an async client with an authenticated host session
+
+        Args:
+            aerie_host (AerieHost): Aerie host information, including authentication if necessary
+            max_connections (int, optional): Maximum number of concurrent requests. Defaults to DEFAULT_MAX_WORKERS.
+            max_calls (int, optional): Maximum number of method calls in progress at once. Defaults to
+                DEFAULT_MAX_CALLS.
+        """
+        self.aerie_host = AsyncAerieHost(aerie_host, max_connections, max_calls)
+
+        # Requests made by client methods, including concurrent requests within a method, share the connection limit
+        self.client = AerieClient(self.aerie_host.limited_host, max_connections)
+
+    def close(self) -> None:
+        """Shut down worker threads once any in-flight requests complete"""
+        self.aerie_host.close()
+
+    async def __aenter__(self) -> "AsyncAerieClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.close()
+
+
+def _async_client_method(name: str) -> Callable:
+    @functools.wraps(getattr(AerieClient, name))
+    async def method(self: AsyncAerieClient, *args, **kwargs):
+        return await self.aerie_host.run(getattr(self.client, name), *args, **kwargs)
+
+    return method
+
+
+# Mirror the AerieClient API. map_concurrently is omitted since asyncio.gather serves the same purpose.
+for _name, _ in inspect.getmembers(AerieClient, inspect.isfunction):
+    if not _name.startswith("_") and _name != "map_concurrently":
+        setattr(AsyncAerieClient, _name, _async_client_method(_name))
@@ -1,24 +1,36 @@
+from typing import TYPE_CHECKING
+
 import typer
-from aerie_cli.aerie_client import AerieClient
-from aerie_cli.utils.sessions import get_active_session_client, start_session_from_configuration
-from aerie_cli.aerie_host import AerieHostConfiguration
+
+# Client dependencies are imported when a client is first needed, so that the CLI starts quickly
+if TYPE_CHECKING:
+    from aerie_cli.aerie_client import AerieClient
+    from aerie_cli.aerie_host import AerieHostConfiguration
 
 app = typer.Typer()
 
 class CommandContext:
     hasura_admin_secret: str = None
-    alternate_configuration: AerieHostConfiguration = None
+    alternate_configuration: "AerieHostConfiguration" = None
+    max_workers: int = None
+    use_daemon: bool = True
+    use_cache: bool = True
 
     def __init__(self) -> None:
         raise NotImplementedError
 
     @classmethod
-    def get_client(cls) -> AerieClient:
+    def get_client(cls) -> "AerieClient":
         """Get the AerieClient for any command's execution.
         If an alternate configuration has been specified, this method will attempt to find the persistent configuration or load a file with that name. If no alternate configuration is specified, then the active session is used.
         Returns:
             AerieClient
         """
+        from aerie_cli.aerie_client import AerieClient
+        from aerie_cli.persistent import EffectiveArgumentsCache, QueryCache
+        from aerie_cli.utils.sessions import get_active_session_client, get_daemon_session_client
+        from aerie_cli.utils.sessions import start_session_from_configuration
+
         # If the configuration was set in the CLI by the user,
         # then the returned client will be derived from that configuration.
         client = None
@@ -26,6 +38,10 @@ class CommandContext:
             session = start_session_from_configuration(cls.alternate_configuration)
             client = AerieClient(session)
 
+        if client is None and cls.use_daemon and not cls.hasura_admin_secret:
+            # forward requests through a running daemon, if any. Admin secret headers are only set locally.
+            client = get_daemon_session_client()
+
         if client == None:
             # no configuration specified in CLI, so the active session will be used instead
             client = get_active_session_client()
@@ -37,4 +53,13 @@ class CommandContext:
             client.aerie_host.session.headers["x-hasura-role"] = "aerie_admin"
             client.aerie_host.session.headers["x-hasura-user-id"] = client.aerie_host.aerie_jwt.username
 
+        if cls.max_workers is not None:
+            client.max_workers = cls.max_workers
+
+        # Reuse full activity arguments across CLI invocations
+        client.effective_arguments_cache = EffectiveArgumentsCache()
+
+        # Reuse rarely-changing metadata across CLI invocations, unless the user asked for fresh results
+        client.aerie_host.query_cache = QueryCache(refresh=not cls.use_cache)
+
         return client
@@ -0,0 +1,65 @@
+"""daemon.py
+
+Commands to manage the background daemon which keeps Aerie sessions and connections warm.
+"""
+
+import typer
+from rich.console import Console
+
+from aerie_cli.daemon import AerieDaemon
+from aerie_cli.daemon import DAEMON_IDLE_TIMEOUT
+from aerie_cli.daemon import DAEMON_SOCKET_PATH
+from aerie_cli.daemon import DaemonUnavailableError
+from aerie_cli.daemon import call_daemon
+from aerie_cli.daemon import is_daemon_running
+from aerie_cli.daemon import start_daemon_process
+
+app = typer.Typer()
+
+
+@app.command('start')
+def start_daemon(
+    foreground: bool = typer.Option(
+        False, '--foreground', help='Run in this process rather than in the background'),
+    idle_timeout: int = typer.Option(
+        DAEMON_IDLE_TIMEOUT, '--idle-timeout', min=1, help='Seconds without requests before the daemon exits')
+):
+    """
+    Start a daemon which CLI commands use to make requests with warm sessions and connections
+    """
+    if is_daemon_running():
+        Console().print(f"Daemon already running at {DAEMON_SOCKET_PATH}")
+        return
+
+    if foreground:
+        Console().print(f"Daemon listening at {DAEMON_SOCKET_PATH}", style='green')
+        AerieDaemon(idle_timeout=idle_timeout).serve_forever()
+    else:
+        start_daemon_process(idle_timeout=idle_timeout)
+        Console().print(f"Started daemon at {DAEMON_SOCKET_PATH}", style='green')
+
+
+@app.command('stop')
+def stop_daemon():
+    """
+    Stop a running daemon
+    """
+    try:
+        call_daemon({"method": "shutdown"})
+    except DaemonUnavailableError:
+        Console().print("No daemon running")
+        return
+    Console().print("Stopped daemon", style='green')
+
+
+@app.command('status')
+def daemon_status():
+    """
+    Check whether a daemon is running
+    """
+    try:
+        pid = call_daemon({"method": "ping"}, timeout=5.0)["pid"]
+    except DaemonUnavailableError:
+        Console().print("No daemon running")
+        raise typer.Exit(1)
+    Console().print(f"Daemon running at {DAEMON_SOCKET_PATH} (PID {pid})")
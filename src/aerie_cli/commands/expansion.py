@@ -1,3 +1,4 @@
+import gzip
 import json
 import typer
 from typing import List, Dict
@@ -7,9 +8,11 @@ import fnmatch
 import arrow
 
 from rich.console import Console
+from rich.progress import Progress
 from rich.table import Table
 
 from aerie_cli.commands.command_context import CommandContext
+from aerie_cli.utils.concurrency import ConcurrentTaskError
 from aerie_cli.utils.prompts import select_from_list
 from aerie_cli.schemas.client import ExpansionRun, ExpansionDeployConfiguration
 
@@ -299,7 +302,7 @@ def create_sequence(
 
     if selection_methods.index(selection_method) == 0:
         match_str = typer.prompt('Enter glob string')
-        sim_results = client.get_simulation_results(simulation_dataset_id)
+        sim_results = client.get_simulation_results(simulation_dataset_id, ['id', 'activity_type_name'])
         ids_to_add = []
         for act in sim_results:
             if len(fnmatch.filter([act['activity_type_name']], match_str)):
@@ -312,8 +315,11 @@ def create_sequence(
         ids_to_add = []
 
     if len(ids_to_add):
-        client.link_activities_to_sequence(
-            seq_id, simulation_dataset_id, ids_to_add)
+        with Progress(transient=True) as progress:
+            task = progress.add_task("Linking activities...", total=len(ids_to_add))
+            client.link_activities_to_sequence(
+                seq_id, simulation_dataset_id, ids_to_add,
+                progress=lambda n: progress.advance(task, n))
 
         Console().print(f"Added activities to {seq_id}", style='green')
     else:
@@ -369,6 +375,68 @@ def download_sequence(
     with open(output_fn, 'w') as fid:
         json.dump(seq_dict, fid, indent=2)
 
+
+@sequences_app.command('download-all')
+def download_all_sequences(
+    simulation_dataset_id: str = typer.Option(
+        ..., '--sim-id', '-s', prompt='Simulation Dataset ID',
+        help='Simulation Dataset ID'
+    ),
+    output_dir: str = typer.Option(
+        ..., '--output-dir', '-o', prompt='Output Directory',
+        help='Directory to write one SeqJson file per sequence'
+    ),
+    gzip_output: bool = typer.Option(
+        False, '--gzip', help='Write gzip-compressed files (.json.gz)'
+    )
+):
+    """
+    Download SeqJson files for all sequences of a simulation dataset
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    client = CommandContext.get_client()
+    seq_ids = client.list_sequences(int(simulation_dataset_id))
+
+    # Sequence IDs may contain slashes, so check that no two map to the same file before writing concurrently.
+    # Names are compared case-insensitively for case-insensitive filesystems.
+    file_names = {
+        seq_id: seq_id.replace('/', '_') + ('.json.gz' if gzip_output else '.json') for seq_id in seq_ids
+    }
+    seq_ids_by_file_name = {}
+    for seq_id, file_name in file_names.items():
+        seq_ids_by_file_name.setdefault(file_name.lower(), []).append(seq_id)
+    collisions = [ids for ids in seq_ids_by_file_name.values() if len(ids) > 1]
+    if len(collisions):
+        for ids in collisions:
+            Console().print(f"Sequences {', '.join(ids)} would be written to the same file", style='red')
+        raise typer.Exit(1)
+
+    with Progress(transient=True) as progress:
+        task = progress.add_task("Downloading sequences...", total=len(seq_ids))
+
+        # Fetch concurrently, writing each file as soon as its sequence arrives
+        def download(seq_id: str) -> None:
+            seq_dict = client.get_expanded_sequence(seq_id, int(simulation_dataset_id))
+            file_name = file_names[seq_id]
+            if gzip_output:
+                with gzip.open(output_dir.joinpath(file_name), 'wt') as fid:
+                    json.dump(seq_dict, fid, indent=2)
+            else:
+                with open(output_dir.joinpath(file_name), 'w') as fid:
+                    json.dump(seq_dict, fid, indent=2)
+            progress.advance(task)
+
+        try:
+            client.map_concurrently(download, seq_ids, fail_fast=False)
+        except ConcurrentTaskError as e:
+            for seq_id, error in e.errors:
+                Console().print(f"Failed to download sequence {seq_id}: {error}", style='red')
+            raise typer.Exit(1)
+
+    Console().print(f"Downloaded {len(seq_ids)} sequences to {output_dir}", style='green')
+
 # === Commands for expansion sets ===
 
 
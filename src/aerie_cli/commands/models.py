@@ -6,6 +6,7 @@ from rich.console import Console
 from rich.table import Table
 
 from aerie_cli.commands.command_context import CommandContext
+from aerie_cli.utils.concurrency import ConcurrentTaskError
 
 app = typer.Typer()
 
@@ -86,8 +87,12 @@ def clean():
     client = CommandContext.get_client()
 
     resp = client.get_mission_models()
-    for api_mission_model in resp:
-        client.delete_mission_model(api_mission_model.id)
+    try:
+        client.map_concurrently(client.delete_mission_model, [m.id for m in resp], fail_fast=False)
+    except ConcurrentTaskError as e:
+        for model_id, error in e.errors:
+            typer.echo(f"Failed to delete mission model with ID {model_id}: {error}", err=True)
+        raise typer.Exit(1)
 
     typer.echo(f"All mission models have been deleted")
 
@@ -1,21 +1,48 @@
 import json
+from enum import Enum
+from pathlib import Path
+from typing import List
 from typing import Union
 
 import arrow
-import pandas as pd
 import typer
 from rich.console import Console
+from rich.live import Live
 from rich.table import Table
 
+from aerie_cli.aerie_client import SIMULATED_ACTIVITY_FIELDS
+from aerie_cli.aerie_client import SIMULATION_BATCH_CONCURRENCY
+from aerie_cli.aerie_client import SimulationFailedError
+from aerie_cli.aerie_client import SimulationTimeoutError
 from aerie_cli.commands.command_context import CommandContext
+from aerie_cli.utils.concurrency import ConcurrentTaskError
 from aerie_cli.schemas.client import ActivityPlanCreate
+from aerie_cli.schemas.client import SimulationRun
 from aerie_cli.utils.prompts import select_from_list
+from aerie_cli.utils.resource_samples import write_resource_timelines_csv
+from aerie_cli.utils.json_stream import write_json_array
+from aerie_cli.utils.json_stream import write_ndjson
+from aerie_cli.utils import columnar
 
 plans_app = typer.Typer()
 collaborators_app = typer.Typer()
 plans_app.add_typer(collaborators_app, name="collaborators")
 
 
+class SimulationFileFormat(str, Enum):
+    JSON = "json"
+    NDJSON = "ndjson"
+    PARQUET = "parquet"
+    FEATHER = "feather"
+
+
+class ResourcesFileFormat(str, Enum):
+    JSON = "json"
+    CSV = "csv"
+    PARQUET = "parquet"
+    FEATHER = "feather"
+
+
 @plans_app.command()
 def download(
     id: int = typer.Option(..., "--plan-id", "--id", "-p", help="Plan ID", prompt=True),
@@ -28,7 +55,7 @@ def download(
     """Download a plan and save it locally as a JSON file."""
     plan = CommandContext.get_client().get_activity_plan_by_id(id, full_args)
     with open(output, "w") as out_file:
-        out_file.write(plan.to_json(indent=2))
+        json.dump(plan.to_dict(), out_file, indent=2)
     typer.echo(f"Wrote activity plan to {output}")
 
 
@@ -39,16 +66,41 @@ def download_simulation(
         help="Simulation Dataset ID", prompt=True),
     output: str = typer.Option(
         ..., '--output', '-o',
-        help="The output file destination", prompt=True)
+        help="The output file destination", prompt=True),
+    file_format: SimulationFileFormat = typer.Option(
+        SimulationFileFormat.JSON, "--format", help="Output file format. Parquet and Feather require pyarrow."
+    ),
+    page_size: int = typer.Option(
+        None, "--page-size", min=1,
+        help="Download activities in pages of this size, ordered by activity ID [defaults to all at once, ordered by start offset]"
+    ),
+    no_attributes: bool = typer.Option(
+        False, "--no-attributes", help="Omit activity attributes (arguments and computed attributes)"
+    )
 ):
     """
-    Download simulated activity instances and save to a JSON file
+    Download simulated activity instances and save to a JSON, NDJSON, Parquet, or Feather file
+
+    NDJSON files have one simulated activity per line. With --page-size, JSON and NDJSON activities are written as each
+    page arrives.
     """
     client = CommandContext.get_client()
-    simulated_activities = client.get_simulation_results(sim_id)
-    with open(output, "w") as out_file:
-        out_file.write(json.dumps(simulated_activities, indent=2))
-        typer.echo(f"Wrote activity plan to {output}")
+
+    fields = [f for f in SIMULATED_ACTIVITY_FIELDS if f != "attributes"] if no_attributes else None
+    if page_size is None:
+        simulated_activities = client.get_simulation_results(sim_id, fields)
+    else:
+        simulated_activities = client.iter_simulation_results(sim_id, page_size, fields)
+
+    if file_format == SimulationFileFormat.JSON:
+        with open(output, "w") as out_file:
+            write_json_array(simulated_activities, out_file)
+    elif file_format == SimulationFileFormat.NDJSON:
+        with open(output, "w") as out_file:
+            write_ndjson(simulated_activities, out_file)
+    else:
+        columnar.write_simulated_activities(list(simulated_activities), output, file_format.value)
+    typer.echo(f"Wrote activity plan to {output}")
 
 
 @plans_app.command()
@@ -59,6 +111,9 @@ def download_resources(
     csv: bool = typer.Option(
         False, "--csv/--json", help="Specify file format. Defaults to JSON"
     ),
+    file_format: ResourcesFileFormat = typer.Option(
+        None, "--format", help="Output file format. Overrides --csv/--json. Parquet and Feather require pyarrow."
+    ),
     output: str = typer.Option(
         ..., '--output', '-o',
         help="The output file destination", prompt=True),
@@ -67,16 +122,23 @@ def download_resources(
     ),
     specific_states: str = typer.Option(
         None, help="The file with the specific states, one state per line [defaults to all]"
+    ),
+    page_size: int = typer.Option(
+        None, "--page-size", min=1, help="Download profile segments in pages of this size, for very large simulations [defaults to all at once]"
     )
 ):
     """
-    Download resource timelines from a simulation and save to either JSON or CSV.
+    Download resource timelines from a simulation and save to JSON, CSV, Parquet, or Feather.
 
     JSON resource timelines are formatted as lists of time-value pairs. Relative timestamps are milliseconds since 
     plan start time. Absolute timestamps are of the form YYYY-DDDTh:mm:ss.sss
 
     CSV resource timeline relative timestamps are seconds since plan start time. Absolute timestamps are formatted the 
     same as the JSON outputs.
+
+    Parquet and Feather resource timelines have one row per sample, with the resource name, time offset in
+    microseconds since plan start, and either a numeric value or a JSON-encoded discrete value. Absolute timestamps are
+    added as a UTC timestamp column.
     """
     client = CommandContext.get_client()
 
@@ -87,63 +149,42 @@ def download_resources(
             for line in in_file:
                 contents.append(line.strip("\n"))
 
-    # Get start time of plan
-    plan_id = client.get_plan_id_by_sim_id(sim_id)
-    start_time = client.get_activity_plan_by_id(plan_id, "").start_time
-    # get resource timelines
-    resources = client.get_resource_samples(sim_id, contents)
+    # get resource timelines and the plan start time
+    metadata, timelines = client.get_simulation_dataset_resources(sim_id, contents, page_size)
+    start_time = metadata.plan_start_time
 
-    if csv:
-        # the key is the time and the value is a list of tuples: (activity, state)
-        time_dictionary = {}
+    if file_format is None:
+        file_format = ResourcesFileFormat.CSV if csv else ResourcesFileFormat.JSON
 
-        # this stores the header names for the CSV
-        field_name = ["Time (s)"]
-        if absolute_time:
-            field_name = ["Time (YYYY-DDDThh:mm:ss.sss)"]
-
-        for activity in resources.get("resourceSamples"):
-            list = resources.get("resourceSamples").get(activity)
-            field_name.append(activity)
-            for i in list:
-                time_dictionary.setdefault(i.get("x"), []).append(
-                    (activity, i.get("y"))
-                )
-
-        # a list of dictionaries that will be fed into the DictWriter method
-        csv_dictionary = []
-
-        for time in time_dictionary:
-            seconds = 0
-            if time != 0:
-                seconds = time / 1000000
-            if absolute_time:
-                formatted = start_time.shift(seconds=seconds)
-                formatted = formatted.format("YYYY-DDDDTHH:mm:ss.SSS")
-                tempDict = {"Time (YYYY-DDDThh:mm:ss.sss)": formatted}
-            else:
-                tempDict = {"Time (s)": seconds}
-            for activity in time_dictionary.get(time):
-                tempDict[activity[0]] = activity[1]
-            csv_dictionary.append(tempDict)
+    if file_format in (ResourcesFileFormat.PARQUET, ResourcesFileFormat.FEATHER):
+        columnar.write_resource_timelines(
+            timelines, output, file_format.value, start_time if absolute_time else None
+        )
+        typer.echo(f"Wrote resource timelines to {output}")
 
-        # Sort the dictionary by time
+    elif file_format == ResourcesFileFormat.CSV:
         if absolute_time:
-            sorted_by_time = sorted(csv_dictionary, key=lambda d: d["Time (YYYY-DDDThh:mm:ss.sss)"])
+            time_header = "Time (YYYY-DDDThh:mm:ss.sss)"
+
+            def format_time(microseconds: int) -> str:
+                return start_time.shift(microseconds=microseconds).format("YYYY-DDDDTHH:mm:ss.SSS")
+
         else:
-            sorted_by_time = sorted(csv_dictionary, key=lambda d: d["Time (s)"])
+            time_header = "Time (s)"
 
-        # use panda to fill in missing data
-        df = pd.DataFrame(sorted_by_time)
-        # 'ffill' will fill each missing row with the value of the nearest one above it.
-        df.fillna(method="ffill", inplace=True)
+            def format_time(microseconds: int) -> float:
+                return microseconds / 1000000
 
-        # write to file
-        with open(output, "w") as out_file:
-            df.to_csv(out_file, index=False, header=field_name)
+        # write to file, streaming rows in time order
+        with open(output, "w", newline="") as out_file:
+            write_resource_timelines_csv(timelines, out_file, time_header, format_time)
             typer.echo(f"Wrote resource timelines to {output}")
 
     else:
+        resources = {
+            "resourceSamples": {name: timeline.to_points() for name, timeline in timelines.items()}
+        }
+
         if absolute_time:
             for activity in resources.get("resourceSamples"):
                 list = resources.get("resourceSamples").get(activity)
@@ -207,14 +248,26 @@ def simulate(
     ),
     poll_period: int = typer.Option(
         5,
-        help="The period (seconds) at which to poll for simulation completion",
+        help="The maximum period (seconds) at which to poll for simulation completion",
+    ),
+    timeout: Union[float, None] = typer.Option(
+        None, help="Maximum time (seconds) to wait for the simulation to complete"
+    ),
+    subscribe: bool = typer.Option(
+        True,
+        "--subscribe/--poll",
+        help="Wait for completion over a GraphQL subscription if websocket-client is installed, or always poll",
     ),
 ):
     """Simulate a plan and optionally download the results."""
     client = CommandContext.get_client()
 
     start_time = arrow.utcnow()
-    sim_dataset_id = client.simulate_plan(id, poll_period)
+    try:
+        sim_dataset_id = client.simulate_plan(id, poll_period, timeout, subscribe)
+    except (SimulationFailedError, SimulationTimeoutError) as e:
+        typer.echo(str(e), err=True)
+        raise typer.Exit(code=1)
     end_time = arrow.utcnow()
     res = client.get_simulation_results(sim_dataset_id)
     total_sim_time = end_time - start_time
@@ -227,11 +280,95 @@ def simulate(
 
 
 @plans_app.command()
-def list():
+def simulate_batch(
+    ids: List[int] = typer.Option(..., "--id", help="Plan ID. Repeat to simulate several plans."),
+    output_dir: Union[str, None] = typer.Option(
+        None, "--output-dir", "-o", help="Directory to write simulation results for each plan (if desired)"
+    ),
+    max_concurrent: int = typer.Option(
+        SIMULATION_BATCH_CONCURRENCY, "--max-concurrent", min=1,
+        help="Maximum number of simulations in progress at once",
+    ),
+    poll_period: int = typer.Option(
+        5,
+        help="The maximum period (seconds) at which to poll for simulation completion",
+    ),
+    timeout: Union[float, None] = typer.Option(
+        None, help="Maximum time (seconds) to wait for all simulations to complete"
+    ),
+):
+    """
+    Simulate many plans concurrently and optionally download the results
+
+    Results for each plan are written to PLAN-ID_SIMULATION-DATASET-ID.json as soon as its simulation succeeds.
+    """
+    client = CommandContext.get_client()
+
+    if output_dir is not None:
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+    def status_table(runs: List[SimulationRun]) -> Table:
+        table = Table(title="Simulations")
+        table.add_column("Plan ID", style="magenta")
+        table.add_column("Simulation Dataset ID", style="magenta")
+        table.add_column("Status")
+        table.add_column("Elapsed")
+        styles = {"success": "green", "failed": "red", "timed out": "red"}
+        for run in runs:
+            if run.start_time is None:
+                elapsed = ""
+            else:
+                elapsed = str((run.end_time or arrow.utcnow()) - run.start_time).split(".")[0]
+            table.add_row(
+                str(run.plan_id),
+                "" if run.sim_dataset_id is None else str(run.sim_dataset_id),
+                f"[{styles[run.status]}]{run.status}" if run.status in styles else run.status,
+                elapsed,
+            )
+        return table
+
+    def download(run: SimulationRun) -> None:
+        if output_dir is None or run.status != "success":
+            return
+        with open(output_dir.joinpath(f"{run.plan_id}_{run.sim_dataset_id}.json"), "w") as out_file:
+            write_json_array(client.get_simulation_results(run.sim_dataset_id), out_file)
+
+    with Live(status_table([]), refresh_per_second=4) as live:
+        runs = client.simulate_plans(
+            ids,
+            max_concurrent,
+            poll_period,
+            timeout,
+            on_update=lambda runs: live.update(status_table(runs)),
+            on_complete=download,
+        )
+
+    for run in runs:
+        if run.status != "success":
+            Console().print(f"Simulation of plan {run.plan_id} {run.status}: {run.reason}", style="red")
+    if any(run.status != "success" for run in runs):
+        raise typer.Exit(1)
+    if output_dir is not None:
+        Console().print(f"Wrote simulation results to {output_dir}", style="green")
+
+
+@plans_app.command()
+def list(
+    limit: int = typer.Option(
+        None, "--limit", min=1, help="Maximum number of plans to list [defaults to all]"
+    ),
+    offset: int = typer.Option(
+        None, "--offset", min=0, help="Number of plans to skip, in order of plan ID"
+    ),
+    name: str = typer.Option(
+        None, "--name", "-n", help="Only list plans whose names contain this text (case-insensitive)"
+    ),
+):
     """List uploaded plans."""
 
     client = CommandContext.get_client()
-    resp = client.list_all_activity_plans()
+    resp = client.list_activity_plans(limit, offset, name)
 
     # Create output table
     table = Table(title="Current Activity Plans")
@@ -241,19 +378,13 @@ def list():
     table.add_column("Plan End Time", no_wrap=True)
     table.add_column("Latest Sim. Dataset ID", no_wrap=True)
     table.add_column("Model ID", no_wrap=True)
-    for activity_plan in resp:
-        sim_ids = client.get_simulation_dataset_ids_by_plan_id(activity_plan.id)
-        if len(sim_ids):
-            simulation_dataset_id = str(max(sim_ids))
-        else:
-            simulation_dataset_id = ''
-            
+    for activity_plan, simulation_dataset_id in resp:
         table.add_row(
             str(activity_plan.id),
             activity_plan.name,
             activity_plan.start_time.format("YYYY-DDDDTHH:mm:ss.SSS"),
             activity_plan.end_time.format("YYYY-DDDDTHH:mm:ss.SSS"),
-            simulation_dataset_id,
+            '' if simulation_dataset_id is None else str(simulation_dataset_id),
             str(activity_plan.model_id)
         )
 
@@ -312,9 +443,14 @@ def clean():
     """Delete all activity plans."""
     client = CommandContext.get_client()
 
-    resp = client.get_all_activity_plans()
-    for activity_plan in resp:
-        client.delete_plan(activity_plan.id)
+    # Only plan IDs are needed, so skip downloading each plan's activities
+    resp = client.list_all_activity_plans()
+    try:
+        client.map_concurrently(client.delete_plan, [p.id for p in resp], fail_fast=False)
+    except ConcurrentTaskError as e:
+        for plan_id, error in e.errors:
+            typer.echo(f"Failed to delete plan with ID {plan_id}: {error}", err=True)
+        raise typer.Exit(1)
 
     typer.echo(f"All activity plans have been deleted")
 
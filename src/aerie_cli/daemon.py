@@ -0,0 +1,345 @@
+"""Local daemon which keeps authenticated Aerie sessions warm
+
+Each CLI invocation otherwise loads its session from disk and opens new HTTP connections. While an `AerieDaemon` is
+running, CLI commands send Aerie requests to it over a Unix socket instead; it holds each named session's `AerieHost`
+and connection pool across invocations.
+
+Requests and responses are single lines of JSON. The socket is only accessible by the current user.
+"""
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+from base64 import b64decode
+from base64 import b64encode
+from pathlib import Path
+from typing import Any
+from typing import BinaryIO
+from typing import Dict
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+from aerie_cli.aerie_host import AerieAuthenticationError
+from aerie_cli.aerie_host import AerieHost
+from aerie_cli.aerie_host import AerieHostVersionError
+from aerie_cli.persistent import CONFIGURATION_FILE_DIRECTORY
+from aerie_cli.persistent import NoActiveSessionError
+from aerie_cli.persistent import PersistentSessionManager
+
+DAEMON_SOCKET_PATH = CONFIGURATION_FILE_DIRECTORY.joinpath("daemon.sock")
+
+# Seconds without requests after which the daemon exits
+DAEMON_IDLE_TIMEOUT = 30 * 60
+
+# Seconds to wait for a newly-started daemon to accept requests
+DAEMON_START_TIMEOUT = 10.0
+
+# Exceptions re-raised by clients with their original type. Others are raised as RuntimeError.
+FORWARDED_EXCEPTIONS = {
+    e.__name__: e
+    for e in [RuntimeError, ValueError, AerieAuthenticationError, AerieHostVersionError, NoActiveSessionError]
+}
+
+
+class DaemonUnavailableError(RuntimeError):
+    """No daemon is accepting requests at the socket"""
+
+
+class AerieDaemon:
+    """Server holding authenticated Aerie sessions for CLI processes
+
+    Sessions are loaded from persistent storage on first use and re-loaded whenever their session file changes, e.g.
+    after `aerie-cli activate` or `aerie-cli role`.
+    """
+
+    def __init__(self, socket_path: Path = None, idle_timeout: float = DAEMON_IDLE_TIMEOUT) -> None:
+        """
+
+        Args:
+            socket_path (Path, optional): Unix socket to listen on. Defaults to DAEMON_SOCKET_PATH.
+            idle_timeout (float, optional): Seconds without requests after which to exit. Defaults to
+                DAEMON_IDLE_TIMEOUT.
+        """
+        self.socket_path = Path(socket_path) if socket_path else DAEMON_SOCKET_PATH
+        self.idle_timeout = idle_timeout
+        self._sessions: Dict[str, Tuple[AerieHost, Any]] = {}
+        self._lock = threading.Lock()
+        self._last_request = time.monotonic()
+        self._server: Optional[socketserver.UnixStreamServer] = None
+        self._stopped = threading.Event()
+
+    def get_session(self, name: str) -> AerieHost:
+        """Get the host for a named session, loading it if it's new or has changed on disk
+
+        Args:
+            name (str): Session name
+
+        Raises:
+            NoActiveSessionError: If the session isn't active
+
+        Returns:
+            AerieHost
+        """
+        with self._lock:
+            stamp = self._session_stamp(name)
+            cached = self._sessions.get(name)
+            if cached is None or cached[1] != stamp:
+                self._sessions.pop(name, None)
+                host = self._load_session(name)
+                self._sessions[name] = (host, self._session_stamp(name))
+            return self._sessions[name][0]
+
+    def _session_stamp(self, name: str) -> Any:
+        try:
+            return PersistentSessionManager.get_session_file(name).stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _load_session(self, name: str) -> AerieHost:
+        PersistentSessionManager.set_session_name(name)
+        return PersistentSessionManager.reload_active_session()
+
+    def dispatch(self, request: Dict) -> Dict:
+        """Handle one request
+
+        Args:
+            request (Dict): Request with a "method", the "session" name, and method arguments
+
+        Returns:
+            Dict: Response with either a "result" or an "error"
+        """
+        self._last_request = time.monotonic()
+        try:
+            method = request.get("method")
+            if method == "ping":
+                result = {"pid": os.getpid()}
+            elif method == "shutdown":
+                threading.Thread(target=self.shutdown).start()
+                result = None
+            else:
+                host = self.get_session(request["session"])
+                if method == "describe":
+                    result = host.to_dict()
+                elif method == "post_to_graphql_multiple":
+                    result = host.post_to_graphql_multiple(request["query"], **request["variables"])
+                elif method == "post_to_gateway_files":
+                    result = host.post_to_gateway_files(request["file_name"], b64decode(request["file_contents"]))
+                elif method == "check_auth":
+                    result = host.check_auth()
+                else:
+                    raise ValueError(f"Unknown daemon method: {method}")
+            return {"result": result}
+        except Exception as e:
+            return {"error": {"type": type(e).__name__, "message": str(e)}}
+
+    def serve_forever(self) -> None:
+        """Listen for requests until shut down or idle
+
+        Raises:
+            RuntimeError: If another daemon is already listening on the socket
+        """
+        if self.socket_path.exists():
+            if is_daemon_running(self.socket_path):
+                raise RuntimeError(f"Daemon already running at {self.socket_path}")
+            self.socket_path.unlink()
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Only the current user may connect, since requests are made with their credentials
+        old_umask = os.umask(0o177)
+        try:
+            self._server = socketserver.ThreadingUnixStreamServer(str(self.socket_path), _RequestHandler)
+        finally:
+            os.umask(old_umask)
+        self._server.daemon_threads = True
+        self._server.aerie_daemon = self
+
+        watchdog = threading.Thread(target=self._exit_when_idle, daemon=True)
+        watchdog.start()
+        try:
+            self._server.serve_forever()
+        finally:
+            self._stopped.set()
+            self._server.server_close()
+            try:
+                self.socket_path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def shutdown(self) -> None:
+        """Stop serving requests"""
+        if self._server is not None:
+            self._server.shutdown()
+
+    def _exit_when_idle(self) -> None:
+        while not self._stopped.wait(min(60.0, self.idle_timeout)):
+            if time.monotonic() - self._last_request > self.idle_timeout:
+                self.shutdown()
+                return
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        for line in self.rfile:
+            try:
+                response = self.server.aerie_daemon.dispatch(json.loads(line))
+            except json.JSONDecodeError as e:
+                response = {"error": {"type": "ValueError", "message": f"Invalid request: {e}"}}
+            self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+def call_daemon(request: Dict, socket_path: Path = None, timeout: float = None) -> Any:
+    """Send a request to a running daemon
+
+    Args:
+        request (Dict): Request with a "method" and its arguments
+        socket_path (Path, optional): Daemon socket. Defaults to DAEMON_SOCKET_PATH.
+        timeout (float, optional): Socket timeout in seconds. Defaults to None (no timeout).
+
+    Raises:
+        DaemonUnavailableError: If no daemon is accepting requests
+        RuntimeError: Or the original exception type, for errors raised by the daemon
+
+    Returns:
+        Any: Result of the request
+    """
+    socket_path = Path(socket_path) if socket_path else DAEMON_SOCKET_PATH
+    if not hasattr(socket, "AF_UNIX"):
+        raise DaemonUnavailableError("Unix sockets are not supported on this platform")
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.settimeout(timeout)
+            s.connect(str(socket_path))
+            s.sendall(json.dumps(request).encode("utf-8") + b"\n")
+            with s.makefile("rb") as fid:
+                line = fid.readline()
+    except (FileNotFoundError, ConnectionRefusedError) as e:
+        raise DaemonUnavailableError(f"No daemon running at {socket_path}: {e}")
+
+    if not line:
+        raise DaemonUnavailableError(f"Daemon at {socket_path} closed the connection")
+    response = json.loads(line)
+
+    if "error" in response:
+        error = response["error"]
+        raise FORWARDED_EXCEPTIONS.get(error["type"], RuntimeError)(error["message"])
+    return response["result"]
+
+
+def is_daemon_running(socket_path: Path = None) -> bool:
+    """Check whether a daemon is accepting requests
+
+    Args:
+        socket_path (Path, optional): Daemon socket. Defaults to DAEMON_SOCKET_PATH.
+
+    Returns:
+        bool
+    """
+    try:
+        call_daemon({"method": "ping"}, socket_path, timeout=5.0)
+    except (DaemonUnavailableError, OSError):
+        return False
+    return True
+
+
+def start_daemon_process(socket_path: Path = None, idle_timeout: float = DAEMON_IDLE_TIMEOUT) -> None:
+    """Start a daemon in a background process and wait for it to accept requests
+
+    Args:
+        socket_path (Path, optional): Daemon socket. Defaults to DAEMON_SOCKET_PATH.
+        idle_timeout (float, optional): Seconds without requests after which the daemon exits. Defaults to
+            DAEMON_IDLE_TIMEOUT.
+
+    Raises:
+        RuntimeError: If the daemon doesn't start
+    """
+    socket_path = Path(socket_path) if socket_path else DAEMON_SOCKET_PATH
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "aerie_cli.daemon",
+            "--socket", str(socket_path),
+            "--idle-timeout", str(idle_timeout),
+        ],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+    deadline = time.monotonic() + DAEMON_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if is_daemon_running(socket_path):
+            return
+        if process.poll() is not None:
+            raise RuntimeError(f"Daemon exited with code {process.returncode}")
+        time.sleep(0.05)
+    raise RuntimeError(f"Daemon did not start within {DAEMON_START_TIMEOUT} seconds")
+
+
+class DaemonAerieHost(AerieHost):
+    """Aerie host whose requests are made by a running daemon
+
+    URLs, role, and credentials are copied from the daemon's session so that callers can inspect them as usual.
+    """
+
+    session_name: str = None
+    daemon_socket: Path = None
+
+    @classmethod
+    def connect(cls, session_name: str, socket_path: Path = None) -> "DaemonAerieHost":
+        """Connect to a named session held by a running daemon
+
+        Args:
+            session_name (str): Session name
+            socket_path (Path, optional): Daemon socket. Defaults to DAEMON_SOCKET_PATH.
+
+        Raises:
+            DaemonUnavailableError: If no daemon is running
+            NoActiveSessionError: If the session isn't active
+
+        Returns:
+            DaemonAerieHost
+        """
+        state = call_daemon({"method": "describe", "session": session_name}, socket_path)
+        host = cls.from_dict(state)
+        host.session_name = session_name
+        host.daemon_socket = socket_path
+        return host
+
+    def _call(self, method: str, **kwargs) -> Any:
+        return call_daemon({"method": method, "session": self.session_name, **kwargs}, self.daemon_socket)
+
+    def _post_to_graphql_multiple(self, query: str, **kwargs) -> Dict[str, Dict]:
+        return self._call("post_to_graphql_multiple", query=query, variables=kwargs)
+
+    def post_to_gateway_files(self, file_name: str, file_contents: Union[bytes, BinaryIO]) -> Dict:
+        if hasattr(file_contents, "read"):
+            file_contents = file_contents.read()
+        return self._call(
+            "post_to_gateway_files", file_name=file_name, file_contents=b64encode(file_contents).decode("ascii")
+        )
+
+    def check_auth(self) -> bool:
+        return self._call("check_auth")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the aerie-cli daemon in the foreground")
+    parser.add_argument("--socket", type=Path, default=DAEMON_SOCKET_PATH, help="Unix socket to listen on")
+    parser.add_argument(
+        "--idle-timeout", type=float, default=DAEMON_IDLE_TIMEOUT, help="Seconds without requests before exiting"
+    )
+    args = parser.parse_args()
+    AerieDaemon(args.socket, args.idle_timeout).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
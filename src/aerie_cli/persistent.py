@@ -3,17 +3,31 @@
 Manage persistent storage of Aerie host configurations and active sessions
 """
 
+from contextlib import contextmanager
 from copy import deepcopy
 from pathlib import Path
-from typing import List
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import hashlib
 import json
+import os
+import re
 import shutil
-import pickle
+import sqlite3
+import tempfile
+import threading
+import time
 from datetime import datetime, timedelta, timezone
 
+try:
+    import fcntl
+except ImportError:
+    # File locking is unavailable on Windows
+    fcntl = None
+
 from appdirs import AppDirs
 
 from aerie_cli.aerie_host import AerieHost, AerieHostConfiguration
+from aerie_cli.utils.query_cache import QueryCachePolicy, mutation_mentions
 
 # TODO add app version s.t. changes to configuration formats can be managed
 APP_DIRS = AppDirs('aerie_cli')
@@ -22,8 +36,20 @@ CONFIGURATION_FILE_DIRECTORY = Path(
 CONFIGURATION_FILE_PATH = CONFIGURATION_FILE_DIRECTORY.joinpath('config.json')
 
 SESSION_FILE_DIRECTORY = Path(APP_DIRS.user_config_dir).resolve().absolute()
-SESSION_TIMESTAMP_FSTRING = r'%Y-%jT%H-%M-%S.%f'
+SESSION_FILE_SUFFIX = '.session.json'
+SESSION_FORMAT_VERSION = 1
 SESSION_TIMEOUT = timedelta(hours=12)
+SESSION_NAME_ENV_VAR = 'AERIE_CLI_SESSION'
+DEFAULT_SESSION_NAME = 'default'
+SESSION_NAME_REGEX = re.compile(r'^[A-Za-z0-9_-][A-Za-z0-9_.-]*$')
+
+# Sessions verified within this window are used without re-checking authentication with the gateway
+SESSION_TRUST_WINDOW = timedelta(minutes=5)
+
+EFFECTIVE_ARGUMENTS_CACHE_PATH = CONFIGURATION_FILE_DIRECTORY.joinpath('effective_arguments_cache.sqlite')
+EFFECTIVE_ARGUMENTS_CACHE_SIZE = 100000
+
+QUERY_CACHE_PATH = CONFIGURATION_FILE_DIRECTORY.joinpath('query_cache.sqlite')
 
 
 def delete_all_persistent_files():
@@ -109,54 +135,89 @@ class PersistentConfigurationManager:
 
 
 class PersistentSessionManager:
-    _active_session = None
+    """Pseudo-singleton for the active session, stored as versioned JSON
+
+    Each named session is stored in its own file under SESSION_FILE_DIRECTORY/sessions. Files are replaced atomically
+    and writes are serialized by a file lock, so concurrent CLI processes don't corrupt or delete each other's sessions.
+    The session name defaults to the AERIE_CLI_SESSION environment variable, or "default".
+    """
+
+    _active_session: AerieHost = None
+    session_name: str = os.environ.get(SESSION_NAME_ENV_VAR, DEFAULT_SESSION_NAME)
 
     def __init__(self) -> None:
         """Pseudo-singleton"""
         raise NotImplementedError
 
     @classmethod
-    def _load_active_session(cls) -> None:
+    def set_session_name(cls, name: str) -> None:
+        """Select the named session used by this process
 
-        if cls._active_session is not None:
-            return
+        Args:
+            name (str): Session name. Letters, digits, "_", "-", and "." (except first) only.
+        """
+        _session_path(name)
+        if name != cls.session_name:
+            cls._active_session = None
+        cls.session_name = name
 
-        # Get any/all open sessions. List in chronological order, newest first
-        session_files: List[Path] = [
-            f for f in SESSION_FILE_DIRECTORY.glob('*.aerie_cli.session')]
-        session_files.sort(reverse=True)
+    @classmethod
+    def list_sessions(cls) -> List[str]:
+        """List names of stored sessions, including any which have expired
 
-        if not len(session_files):
-            raise NoActiveSessionError
+        Returns:
+            List[str]: Session names
+        """
+        directory = _session_directory()
+        if not directory.is_dir():
+            return []
+        names = [f.name[:-len(SESSION_FILE_SUFFIX)] for f in directory.glob("*" + SESSION_FILE_SUFFIX)]
+        return sorted(n for n in names if SESSION_NAME_REGEX.match(n))
+
+    @classmethod
+    def _load_active_session(cls) -> None:
 
-        # Delete any sessions older than the newest
-        for session_file in session_files[1:]:
-            session_file.unlink()
+        if cls._active_session is not None:
+            return
 
-        # Get timestamp of newest session
-        session_file = session_files[0]
+        session_file = _session_path(cls.session_name)
         try:
-            t = datetime.strptime(
-                session_file.name[:-(len('.aerie_cli.session'))], SESSION_TIMESTAMP_FSTRING)
-        except Exception:
-            raise RuntimeError(f"Cannot parse session timestamp: {session_file.name}. Try deactivating your session.")
+            with open(session_file, 'r') as fid:
+                contents = json.load(fid)
+        except FileNotFoundError:
+            raise NoActiveSessionError
+        except (OSError, json.JSONDecodeError):
+            _remove_session_file(session_file)
+            raise NoActiveSessionError
 
-        # If session hasn't been used since timeout, mark as inactive
-        if (datetime.now(timezone.utc).replace(tzinfo=None) - t) > SESSION_TIMEOUT:
-            session_file.unlink()
+        version = contents.get("version") if isinstance(contents, dict) else None
+        if not isinstance(version, int):
+            _remove_session_file(session_file)
             raise NoActiveSessionError
+        if version > SESSION_FORMAT_VERSION:
+            raise RuntimeError(
+                f"Session {cls.session_name} was saved by a newer version of aerie-cli. Upgrade aerie-cli or deactivate the session."
+            )
 
-        # Un-pickle the session
+        # If session hasn't been used since timeout, mark as inactive
         try:
-            with open(session_file, 'rb') as fid:
-                session: AerieHost = pickle.load(fid)
-        except Exception:
-            session_file.unlink()
+            updated_at = datetime.fromtimestamp(contents["updated_at"], timezone.utc)
+            session = AerieHost.from_dict(contents["session"])
+        except (KeyError, TypeError, ValueError, OverflowError):
+            _remove_session_file(session_file, contents)
+            raise NoActiveSessionError
+        if datetime.now(timezone.utc) - updated_at > SESSION_TIMEOUT:
+            _remove_session_file(session_file, contents)
             raise NoActiveSessionError
 
+        # Trust a recently-verified session. If the host rejects it, it's re-verified on the first failed request.
+        if session.is_recently_verified(SESSION_TRUST_WINDOW):
+            cls._active_session = session
+            return
+
         # If gateway ping fails, mark session as inactive
         if not cls.set_active_session(session):
-            session_file.unlink()
+            _remove_session_file(session_file, contents)
             raise NoActiveSessionError
 
     @classmethod
@@ -164,24 +225,60 @@ class PersistentSessionManager:
         cls._load_active_session()
         return cls._active_session
 
+    @classmethod
+    def reload_active_session(cls) -> AerieHost:
+        """Re-read the active session from its file, e.g. after another process activated a session
+
+        Returns:
+            AerieHost: Active session
+        """
+        cls._active_session = None
+        return cls.get_active_session()
+
+    @classmethod
+    def get_session_file(cls, name: str = None) -> Path:
+        """Get the file storing a named session
+
+        Args:
+            name (str, optional): Session name. Defaults to the selected session.
+
+        Returns:
+            Path: Session file, which exists only if the session is active
+        """
+        return _session_path(cls.session_name if name is None else name)
+
     @classmethod
     def set_active_session(cls, session: AerieHost) -> bool:
 
         if not session.check_auth():
             return False
 
-        session_files: List[Path] = [
-            f for f in SESSION_FILE_DIRECTORY.glob('*.aerie_cli.session')]
-        for session_file in session_files:
-            session_file.unlink()
-
         cls._active_session = session
 
-        session_file = datetime.now(timezone.utc).strftime(SESSION_TIMESTAMP_FSTRING) + '.aerie_cli.session'
-        session_file = SESSION_FILE_DIRECTORY.joinpath(session_file)
-
-        with open(session_file, 'wb') as fid:
-            pickle.dump(session, fid)
+        contents = {
+            "version": SESSION_FORMAT_VERSION,
+            "updated_at": datetime.now(timezone.utc).timestamp(),
+            "session": session.to_dict(),
+        }
+
+        directory = _session_directory()
+        directory.mkdir(exist_ok=True, parents=True)
+        with _session_lock():
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=SESSION_FILE_SUFFIX)
+            try:
+                # mkstemp creates the file readable by the owner only, which protects credentials
+                with os.fdopen(fd, 'w') as fid:
+                    json.dump(contents, fid)
+                    fid.flush()
+                    os.fsync(fid.fileno())
+                os.replace(tmp_path, _session_path(cls.session_name))
+            except BaseException:
+                _unlink(Path(tmp_path))
+                raise
+
+            # Remove sessions stored by earlier versions of aerie-cli
+            for legacy_file in SESSION_FILE_DIRECTORY.glob('*.aerie_cli.session'):
+                _unlink(legacy_file)
 
         return True
 
@@ -198,10 +295,7 @@ class PersistentSessionManager:
         except NoActiveSessionError:
             return None
 
-        fs: List[Path] = [
-            f for f in SESSION_FILE_DIRECTORY.glob('*.aerie_cli.session')]
-        for fn in fs:
-            fn.unlink()
+        _remove_session_file(_session_path(cls.session_name))
 
         name = deepcopy(cls._active_session.configuration_name)
         cls._active_session = None
@@ -211,15 +305,385 @@ class PersistentSessionManager:
     def reset(cls) -> None:
         cls._active_session = None
 
-        # Get any/all open sessions. List in chronological order, newest first
-        fs: List[Path] = [
-            f for f in SESSION_FILE_DIRECTORY.glob('*.aerie_cli.session')]
-        if not len(fs):
-            return
         # Delete all session files
-        for fn in fs:
-            fn.unlink()
+        directory = _session_directory()
+        if not directory.is_dir():
+            return
+        with _session_lock():
+            for fn in directory.glob("*" + SESSION_FILE_SUFFIX):
+                _unlink(fn)
+
+
+def _session_directory() -> Path:
+    return SESSION_FILE_DIRECTORY.joinpath('sessions')
+
+
+def _session_path(name: str) -> Path:
+    if not SESSION_NAME_REGEX.match(name):
+        raise ValueError(f"Invalid session name: {name}")
+    return _session_directory().joinpath(name + SESSION_FILE_SUFFIX)
+
+
+def _unlink(path: Path) -> None:
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+
+
+@contextmanager
+def _session_lock() -> Iterator[None]:
+    """Hold an exclusive lock on the session directory, where supported"""
+    directory = _session_directory()
+    directory.mkdir(exist_ok=True, parents=True)
+    with open(directory.joinpath('.lock'), 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def _remove_session_file(session_file: Path, expected_contents: Dict = None) -> None:
+    """Delete a session file
+
+    Args:
+        session_file (Path): Session file
+        expected_contents (Dict, optional): Only delete the file if it still has these contents, so that a session
+            saved by another process in the meantime is kept. Defaults to None, which deletes unconditionally.
+    """
+    with _session_lock():
+        if expected_contents is not None:
+            try:
+                with open(session_file, 'r') as fid:
+                    if json.load(fid) != expected_contents:
+                        return
+            except FileNotFoundError:
+                return
+            except (OSError, json.JSONDecodeError):
+                pass
+        _unlink(session_file)
 
 
 class NoActiveSessionError(Exception):
     pass
+
+
+def hash_activity_arguments(arguments: Dict) -> str:
+    """Hash activity arguments, independent of key order
+
+    Args:
+        arguments (Dict): Activity arguments
+
+    Returns:
+        str: SHA-256 hex digest of the arguments' canonical JSON
+    """
+    canonical = json.dumps(arguments, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+
+def _connect_cache_database(
+    path: Path, create_tables: Callable[[sqlite3.Connection], None]
+) -> sqlite3.Connection:
+    """Open a cache database shared between threads, starting over if the file is unreadable
+
+    Args:
+        path (Path): SQLite database file
+        create_tables (Callable[[sqlite3.Connection], None]): Creates the cache's tables, if they don't exist
+
+    Returns:
+        sqlite3.Connection
+    """
+    path.parent.mkdir(exist_ok=True, parents=True)
+    connection = sqlite3.connect(str(path), check_same_thread=False)
+    try:
+        create_tables(connection)
+    except sqlite3.DatabaseError:
+        # Unreadable cache file, so start over
+        connection.close()
+        path.unlink()
+        connection = sqlite3.connect(str(path), check_same_thread=False)
+        create_tables(connection)
+    return connection
+
+
+class EffectiveArgumentsCache:
+    """Persistent least-recently-used cache of effective activity arguments
+
+    Entries are keyed by Aerie host (GraphQL URL), mission model ID, model JAR ID, activity type, and a hash of the
+    activity's arguments, since model and JAR IDs are only unique within a host. Looking up entries for a model evicts
+    any cached for a different JAR of the same model on the same host, so updating a model's JAR invalidates its
+    entries. Once there are more than `max_entries` entries, the least recently used are evicted.
+    """
+
+    def __init__(self, path: Path = None, max_entries: int = None) -> None:
+        """
+
+        Args:
+            path (Path, optional): SQLite database file. Defaults to EFFECTIVE_ARGUMENTS_CACHE_PATH.
+            max_entries (int, optional): Size cap. Defaults to EFFECTIVE_ARGUMENTS_CACHE_SIZE.
+        """
+        self.path = Path(path) if path is not None else EFFECTIVE_ARGUMENTS_CACHE_PATH
+        self.max_entries = max_entries if max_entries is not None else EFFECTIVE_ARGUMENTS_CACHE_SIZE
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = _connect_cache_database(self.path, self._create_table)
+        return self._connection
+
+    def _next_use(self, connection: sqlite3.Connection) -> int:
+        # Uses are numbered in sequence rather than timestamped, so recency is exact regardless of clock resolution
+        return connection.execute("SELECT COALESCE(MAX(last_used), 0) + 1 FROM effective_arguments").fetchone()[0]
+
+    def _create_table(self, connection: sqlite3.Connection) -> None:
+        with connection:
+            columns = [row[1] for row in connection.execute("PRAGMA table_info(effective_arguments)")]
+            if len(columns) and "host" not in columns:
+                # Entries cached before they were keyed by host can't be attributed to one
+                connection.execute("DROP TABLE effective_arguments")
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS effective_arguments (
+                    host TEXT NOT NULL,
+                    model_id INTEGER NOT NULL,
+                    jar_id INTEGER NOT NULL,
+                    activity_type TEXT NOT NULL,
+                    arguments_hash TEXT NOT NULL,
+                    effective_arguments TEXT NOT NULL,
+                    last_used INTEGER NOT NULL,
+                    PRIMARY KEY (host, model_id, jar_id, activity_type, arguments_hash)
+                )
+                """
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS effective_arguments_last_used ON effective_arguments (last_used)"
+            )
+
+    def get_many(
+        self, host: str, model_id: int, jar_id: int, activities: List[Tuple[str, Dict]]
+    ) -> List[Optional[Dict]]:
+        """Look up cached effective arguments
+
+        Args:
+            host (str): GraphQL URL of the Aerie host
+            model_id (int): Mission model ID
+            jar_id (int): ID of the mission model's current JAR
+            activities (List[Tuple[str, Dict]]): Activity type and arguments of each activity to look up
+
+        Returns:
+            List[Optional[Dict]]: Effective arguments for each activity, or None if not cached
+        """
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute(
+                    "DELETE FROM effective_arguments WHERE host = ? AND model_id = ? AND jar_id != ?",
+                    (host, model_id, jar_id),
+                )
+                use = self._next_use(connection)
+
+                retval = []
+                for activity_type, arguments in activities:
+                    key = (host, model_id, jar_id, activity_type, hash_activity_arguments(arguments))
+                    row = connection.execute(
+                        "SELECT effective_arguments FROM effective_arguments "
+                        "WHERE host = ? AND model_id = ? AND jar_id = ? AND activity_type = ? AND arguments_hash = ?",
+                        key,
+                    ).fetchone()
+                    if row is None:
+                        retval.append(None)
+                    else:
+                        connection.execute(
+                            "UPDATE effective_arguments SET last_used = ? "
+                            "WHERE host = ? AND model_id = ? AND jar_id = ? AND activity_type = ? "
+                            "AND arguments_hash = ?",
+                            (use,) + key,
+                        )
+                        retval.append(json.loads(row[0]))
+            return retval
+
+    def put_many(self, host: str, model_id: int, jar_id: int, activities: List[Tuple[str, Dict, Dict]]) -> None:
+        """Add effective arguments to the cache, then evict the least recently used entries over the size cap
+
+        Args:
+            host (str): GraphQL URL of the Aerie host
+            model_id (int): Mission model ID
+            jar_id (int): ID of the mission model's current JAR
+            activities (List[Tuple[str, Dict, Dict]]): Activity type, arguments, and effective arguments of each
+                activity
+        """
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                use = self._next_use(connection)
+                connection.executemany(
+                    "INSERT OR REPLACE INTO effective_arguments VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (host, model_id, jar_id, activity_type, hash_activity_arguments(arguments),
+                         json.dumps(effective_arguments), use)
+                        for activity_type, arguments, effective_arguments in activities
+                    ],
+                )
+                connection.execute(
+                    "DELETE FROM effective_arguments WHERE rowid IN ("
+                    "SELECT rowid FROM effective_arguments ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+
+    def clear(self) -> None:
+        """Delete all cached entries"""
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute("DELETE FROM effective_arguments")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+class QueryCache:
+    """In-memory and persistent cache of read-only GraphQL query results
+
+    Entries are keyed by `query_cache_key` and expire after their query's `QueryCachePolicy.ttl`. Mutations which
+    mention an entry's tables remove it, both from memory and from the database shared by other CLI invocations, for
+    the host the mutation was sent to. Failures to read or write the database are ignored, so that a locked or
+    unwritable file only costs the requests it would have saved.
+    """
+
+    def __init__(self, path: Path = None, refresh: bool = False) -> None:
+        """
+
+        Args:
+            path (Path, optional): SQLite database file. Defaults to QUERY_CACHE_PATH.
+            refresh (bool, optional): Ignore cached results, but cache fresh ones. Defaults to False.
+        """
+        self.path = Path(path) if path is not None else QUERY_CACHE_PATH
+        self.refresh = refresh
+        self._memory: Dict[str, Tuple[str, float, List[str], str]] = {}
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = _connect_cache_database(self.path, self._create_table)
+        return self._connection
+
+    def _create_table(self, connection: sqlite3.Connection) -> None:
+        with connection:
+            columns = [row[1] for row in connection.execute("PRAGMA table_info(query_results)")]
+            if len(columns) and "host" not in columns:
+                # Results cached before they were keyed by host can't be invalidated by host
+                connection.execute("DROP TABLE query_results")
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS query_results (
+                    key TEXT PRIMARY KEY,
+                    host TEXT NOT NULL,
+                    tables TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    data TEXT NOT NULL
+                )
+                """
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS query_results_host ON query_results (host)")
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Look up a cached query result
+
+        Args:
+            key (str): Query key
+
+        Returns:
+            Optional[Dict]: Query response data, or None if not cached or expired
+        """
+        if self.refresh:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                try:
+                    row = self._connect().execute(
+                        "SELECT host, expires_at, tables, data FROM query_results WHERE key = ?", (key,)
+                    ).fetchone()
+                except (sqlite3.Error, OSError):
+                    row = None
+                if row is not None:
+                    entry = (row[0], row[1], json.loads(row[2]), row[3])
+                    self._memory[key] = entry
+            if entry is None or entry[1] <= now:
+                return None
+            # Parse on every lookup so that callers can't modify the cached data
+            return json.loads(entry[3])
+
+    def put(self, host: str, key: str, policy: QueryCachePolicy, data: Dict) -> None:
+        """Cache a query result, and remove any expired results
+
+        Args:
+            host (str): GraphQL URL of the Aerie host
+            key (str): Query key
+            policy (QueryCachePolicy): Caching rules for the query
+            data (Dict): Query response data
+        """
+        now = time.time()
+        entry = (host, now + policy.ttl.total_seconds(), list(policy.tables), json.dumps(data))
+        with self._lock:
+            self._memory[key] = entry
+            try:
+                connection = self._connect()
+                with connection:
+                    connection.execute("DELETE FROM query_results WHERE expires_at <= ?", (now,))
+                    connection.execute(
+                        "INSERT OR REPLACE INTO query_results VALUES (?, ?, ?, ?, ?)",
+                        (key, host, json.dumps(entry[2]), entry[1], entry[3]),
+                    )
+            except (sqlite3.Error, OSError):
+                pass
+
+    def invalidate(self, host: str, mutation: str) -> None:
+        """Remove cached results which a mutation may have changed
+
+        Args:
+            host (str): GraphQL URL of the Aerie host the mutation was sent to
+            mutation (str): GraphQL mutation text
+        """
+        with self._lock:
+            for key in [
+                k for k, entry in self._memory.items() if entry[0] == host and mutation_mentions(mutation, entry[2])
+            ]:
+                del self._memory[key]
+            try:
+                connection = self._connect()
+                with connection:
+                    stale = [
+                        (key,)
+                        for key, tables in connection.execute(
+                            "SELECT key, tables FROM query_results WHERE host = ?", (host,)
+                        )
+                        if mutation_mentions(mutation, json.loads(tables))
+                    ]
+                    connection.executemany("DELETE FROM query_results WHERE key = ?", stale)
+            except (sqlite3.Error, OSError):
+                pass
+
+    def clear(self) -> None:
+        """Delete all cached results"""
+        with self._lock:
+            self._memory.clear()
+            connection = self._connect()
+            with connection:
+                connection.execute("DELETE FROM query_results")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
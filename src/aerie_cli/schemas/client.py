@@ -28,6 +28,7 @@ from aerie_cli.schemas.api import ApiResourceSampleResults
 from aerie_cli.schemas.api import ApiSimulatedResourceSample
 from aerie_cli.schemas.api import ApiSimulationResults
 from aerie_cli.schemas.api import ActivityBase
+from aerie_cli.schemas.api import convert_to_time_delta
 from aerie_cli.schemas.api import ApiParcelRead
 from aerie_cli.schemas.api import ApiParcelCreate
 
@@ -333,6 +334,40 @@ class SimulationResults(ClientSerialize):
         )
 
 
+@define
+class SimulationDatasetMetadata(ClientSerialize):
+    """Simulation dataset and its parent plan's time bounds
+
+    Fetched alongside simulation results so that commands don't need separate requests for plan information.
+    """
+
+    id: int
+    plan_id: int
+    plan_start_time: Arrow = field(converter=arrow.get)
+    plan_duration: timedelta = field(converter=convert_to_time_delta)
+
+
+@define
+class SimulationRun:
+    """Progress of one plan's simulation in a batch
+
+    status is "queued" until the simulation is submitted, then the Aerie simulation dataset status ("pending",
+    "incomplete", "success", or "failed"), or "timed out" if the batch timeout elapsed first. Simulations whose results
+    were already available, which the simulate action reports as "complete", are "success".
+    """
+
+    plan_id: int
+    status: str = field(default="queued")
+    sim_dataset_id: Optional[int] = field(default=None)
+    reason: Any = field(default=None)
+    start_time: Optional[Arrow] = field(default=None)
+    end_time: Optional[Arrow] = field(default=None)
+
+    @property
+    def done(self) -> bool:
+        return self.status in ["success", "failed", "timed out"]
+
+
 @define
 class ActivityInstanceCommand(ClientSerialize):
     activity_instance_id: int
@@ -0,0 +1,110 @@
+"""Activity directive anchor resolution
+
+Directives may be anchored to other directives, so the anchor must exist in Aerie before any directive anchored to it
+can be created. Anchors form a dependency graph which is resolved here into upload layers with Kahn's algorithm.
+"""
+
+from collections import deque
+from typing import Dict
+from typing import List
+
+from aerie_cli.schemas.client import Activity
+
+
+class AnchorResolutionError(RuntimeError):
+    """Raised if some directives can't be ordered such that their anchors are created first
+
+    Attributes:
+        missing_anchors (List[Activity]): Directives anchored to a directive which isn't in the plan, or anchored
+            (directly or indirectly) to one of those directives
+        cyclic_anchors (List[Activity]): Directives on an anchor cycle, or anchored (directly or indirectly) to one
+    """
+
+    def __init__(self, missing_anchors: List[Activity], cyclic_anchors: List[Activity]) -> None:
+        self.missing_anchors = missing_anchors
+        self.cyclic_anchors = cyclic_anchors
+
+        messages = []
+        if len(missing_anchors):
+            messages.append(f"missing anchors: {', '.join([a.name for a in missing_anchors])}")
+        if len(cyclic_anchors):
+            messages.append(f"anchor cycles: {', '.join([a.name for a in cyclic_anchors])}")
+        super().__init__(f"Failed to anchor activities ({'; '.join(messages)})")
+
+
+def resolve_anchor_layers(activities: List[Activity]) -> List[List[Activity]]:
+    """Group activity directives into layers in anchor-dependency order
+
+    Every directive in a layer is either unanchored or anchored to a directive in an earlier layer. Within a layer,
+    directives keep their order from `activities`. Runs in linear time in the number of directives.
+
+    Args:
+        activities (List[Activity]): Directives to resolve. Anchor IDs must refer to the `id` of other directives.
+
+    Raises:
+        ValueError: If a directive is anchored to an ID shared by multiple directives
+        AnchorResolutionError: If any anchor can't be resolved
+
+    Returns:
+        List[List[Activity]]: Layers of directives, in the order they may be created
+    """
+
+    # Index of each directive by ID
+    index_by_id: Dict[int, int] = {}
+    duplicate_ids = set()
+    for i, act in enumerate(activities):
+        if act.id is None:
+            continue
+        if act.id in index_by_id.keys():
+            duplicate_ids.add(act.id)
+        index_by_id[act.id] = i
+
+    # Adjacency list from each anchor to the directives anchored to it
+    children: List[List[int]] = [[] for _ in activities]
+    roots = []
+    missing = []
+    for i, act in enumerate(activities):
+        if not act.anchor_id:
+            roots.append(i)
+        elif act.anchor_id in duplicate_ids:
+            raise ValueError(f"Activity {act.name} is anchored to ambiguous directive ID {act.anchor_id}")
+        elif act.anchor_id in index_by_id.keys():
+            children[index_by_id[act.anchor_id]].append(i)
+        else:
+            missing.append(i)
+
+    # Each directive has at most one anchor, so Kahn's algorithm is a breadth-first traversal from the roots
+    depth: List[int] = [None] * len(activities)
+    queue = deque(roots)
+    for i in roots:
+        depth[i] = 0
+    while len(queue):
+        i = queue.popleft()
+        for child in children[i]:
+            depth[child] = depth[i] + 1
+            queue.append(child)
+
+    if any(d is None for d in depth):
+        # Anything downstream of a missing anchor is unresolvable for that reason. Anything else left over is on or
+        # downstream of a cycle.
+        missing_anchor = [False] * len(activities)
+        queue = deque(missing)
+        for i in missing:
+            missing_anchor[i] = True
+        while len(queue):
+            i = queue.popleft()
+            for child in children[i]:
+                if not missing_anchor[child]:
+                    missing_anchor[child] = True
+                    queue.append(child)
+
+        raise AnchorResolutionError(
+            [act for i, act in enumerate(activities) if missing_anchor[i]],
+            [act for i, act in enumerate(activities) if depth[i] is None and not missing_anchor[i]],
+        )
+
+    layers: List[List[Activity]] = [[] for _ in range(max(depth, default=-1) + 1)]
+    for i, act in enumerate(activities):
+        layers[depth[i]].append(act)
+
+    return layers
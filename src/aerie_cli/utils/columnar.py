@@ -0,0 +1,180 @@
+"""Columnar (Parquet and Arrow IPC/Feather) output for simulation results
+
+Requires the optional `pyarrow` dependency, which is imported only when these formats are used.
+"""
+
+import json
+from enum import Enum
+from typing import Dict
+from typing import List
+
+import arrow
+import numpy as np
+from arrow import Arrow
+
+from aerie_cli.utils.resource_samples import ResourceTimeline
+from aerie_cli.utils.resource_samples import postgres_intervals_to_microseconds
+
+
+class ColumnarFormat(str, Enum):
+    PARQUET = "parquet"
+    FEATHER = "feather"
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.feather
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError(
+            "Parquet and Feather output require pyarrow. Install aerie-cli with the `columnar` extra or `pip install pyarrow`."
+        )
+    return pyarrow
+
+
+def _write_tables(pa, tables: list, schema, output: str, file_format: ColumnarFormat) -> None:
+    # Parquet gets one row group per table. Feather (Arrow IPC) needs a single dictionary per column.
+    if file_format == ColumnarFormat.PARQUET:
+        with pa.parquet.ParquetWriter(output, schema) as writer:
+            for table in tables:
+                writer.write_table(table)
+    else:
+        table = pa.concat_tables(tables) if len(tables) else schema.empty_table()
+        pa.feather.write_feather(table.unify_dictionaries(), output)
+
+
+def _resource_schema(pa, absolute_time: bool):
+    fields = [
+        pa.field("resource", pa.dictionary(pa.int32(), pa.string())),
+        pa.field("offset", pa.int64()),
+    ]
+    if absolute_time:
+        fields.append(pa.field("time", pa.timestamp("us", tz="UTC")))
+    fields += [
+        pa.field("value", pa.float64()),
+        pa.field("discrete_value", pa.dictionary(pa.int32(), pa.string())),
+    ]
+    return pa.schema(fields)
+
+
+def _resource_table(pa, schema, timeline: ResourceTimeline, start_time: Arrow = None):
+    n = len(timeline.x)
+
+    columns = {
+        "resource": pa.DictionaryArray.from_arrays(
+            pa.array(np.zeros(n, dtype=np.int32)), pa.array([timeline.name], type=pa.string())
+        ),
+        "offset": pa.array(timeline.x, type=pa.int64()),
+    }
+
+    if start_time is not None:
+        start_us = int(start_time.timestamp()) * 1000000 + start_time.microsecond
+        columns["time"] = pa.array(timeline.x + start_us, type=pa.int64()).cast(pa.timestamp("us", tz="UTC"))
+
+    if timeline.profile_type == "real":
+        columns["value"] = pa.array(timeline.y, type=pa.float64())
+        columns["discrete_value"] = pa.nulls(n, type=pa.string()).dictionary_encode()
+    else:
+        columns["value"] = pa.nulls(n, type=pa.float64())
+        columns["discrete_value"] = pa.array(
+            [json.dumps(y) for y in timeline.y.tolist()], type=pa.string()
+        ).dictionary_encode()
+
+    return pa.table(columns, schema=schema)
+
+
+def write_resource_timelines(
+    timelines: Dict[str, ResourceTimeline], output: str, file_format: ColumnarFormat, start_time: Arrow = None
+) -> None:
+    """Write resource timelines to a Parquet or Feather file in long format
+
+    Columns:
+        resource: Resource name (dictionary-encoded)
+        offset: Sample time in microseconds from plan start (int64)
+        time: Absolute sample time, only if `start_time` is given (timestamp[us, UTC])
+        value: Value of real-valued resources (float64, null for discrete resources)
+        discrete_value: JSON-encoded value of discrete resources (dictionary-encoded, null for real resources)
+
+    Rows are grouped by resource. In Parquet, each resource is written as its own row group so readers can select
+    resources without scanning the whole file.
+
+    Args:
+        timelines (Dict[str, ResourceTimeline]): Resource timelines keyed by resource name
+        output (str): Output file path
+        file_format (ColumnarFormat): Output format
+        start_time (Arrow, optional): Plan start time, to include absolute sample times. Defaults to None.
+    """
+    pa = _import_pyarrow()
+
+    schema = _resource_schema(pa, start_time is not None)
+    tables = [_resource_table(pa, schema, timeline, start_time) for timeline in timelines.values()]
+    _write_tables(pa, tables, schema, output, ColumnarFormat(file_format))
+
+
+def _timestamps_to_microseconds(timestamps: List[str]) -> List[int]:
+    retval = []
+    for t in timestamps:
+        if t is None:
+            retval.append(None)
+        else:
+            t = arrow.get(t)
+            retval.append(int(t.timestamp()) * 1000000 + t.microsecond)
+    return retval
+
+
+def _intervals_to_microseconds(intervals: List[str]) -> List[int]:
+    present = [i for i in intervals if i is not None]
+    parsed = iter(postgres_intervals_to_microseconds(present).tolist())
+    return [None if i is None else next(parsed) for i in intervals]
+
+
+def write_simulated_activities(simulated_activities: List[Dict], output: str, file_format: ColumnarFormat) -> None:
+    """Write simulated activities to a Parquet or Feather file
+
+    Takes simulated activities as returned by `AerieClient.get_simulation_results`. Offsets and durations are written
+    as int64 microseconds, times as UTC timestamps, activity types as a dictionary-encoded column, and the
+    `attributes` object as a JSON string.
+
+    Args:
+        simulated_activities (List[Dict]): Simulated activities
+        output (str): Output file path
+        file_format (ColumnarFormat): Output format
+    """
+    pa = _import_pyarrow()
+
+    timestamp = pa.timestamp("us", tz="UTC")
+    schema = pa.schema([
+        pa.field("id", pa.int64()),
+        pa.field("simulation_dataset_id", pa.int64()),
+        pa.field("directive_id", pa.int64()),
+        pa.field("parent_id", pa.int64()),
+        pa.field("activity_type_name", pa.dictionary(pa.int32(), pa.string())),
+        pa.field("start_offset", pa.int64()),
+        pa.field("duration", pa.int64()),
+        pa.field("start_time", timestamp),
+        pa.field("end_time", timestamp),
+        pa.field("attributes", pa.string()),
+    ])
+
+    def column(key: str) -> list:
+        return [a.get(key) for a in simulated_activities]
+
+    table = pa.table(
+        {
+            "id": pa.array(column("id"), type=pa.int64()),
+            "simulation_dataset_id": pa.array(column("simulation_dataset_id"), type=pa.int64()),
+            "directive_id": pa.array(column("directive_id"), type=pa.int64()),
+            "parent_id": pa.array(column("parent_id"), type=pa.int64()),
+            "activity_type_name": pa.array(column("activity_type_name"), type=pa.string()).dictionary_encode(),
+            "start_offset": pa.array(_intervals_to_microseconds(column("start_offset")), type=pa.int64()),
+            "duration": pa.array(_intervals_to_microseconds(column("duration")), type=pa.int64()),
+            "start_time": pa.array(_timestamps_to_microseconds(column("start_time")), type=pa.int64()).cast(timestamp),
+            "end_time": pa.array(_timestamps_to_microseconds(column("end_time")), type=pa.int64()).cast(timestamp),
+            "attributes": pa.array(
+                [None if a is None else json.dumps(a) for a in column("attributes")], type=pa.string()
+            ),
+        },
+        schema=schema,
+    )
+    _write_tables(pa, [table], schema, output, ColumnarFormat(file_format))
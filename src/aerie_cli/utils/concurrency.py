@@ -0,0 +1,97 @@
+"""Bounded-concurrency execution of independent Aerie requests
+
+Requests to Aerie are dominated by round-trip latency, so independent requests (e.g., fetching or deleting many plans)
+are issued from a small thread pool sharing the host's `requests.Session`.
+"""
+
+from concurrent.futures import FIRST_EXCEPTION
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+from typing import Any
+from typing import Callable
+from typing import Iterable
+from typing import List
+from typing import Tuple
+from typing import TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+DEFAULT_MAX_WORKERS = 8
+
+
+class ConcurrentTaskError(RuntimeError):
+    """Raised when tasks fail in collect-errors mode
+
+    Attributes:
+        errors (List[Tuple[Any, Exception]]): Each failed item and the exception it raised, in input order
+        results (List[Any]): Result for each item in input order, or None where the task failed
+    """
+
+    def __init__(self, errors: List[Tuple[Any, Exception]], results: List[Any]) -> None:
+        self.errors = errors
+        self.results = results
+        super().__init__(
+            f"{len(errors)} of {len(results)} tasks failed: " + "; ".join([f"{item}: {e}" for item, e in errors])
+        )
+
+
+def map_concurrently(
+    fn: Callable[[T], R], items: Iterable[T], max_workers: int = DEFAULT_MAX_WORKERS, fail_fast: bool = True
+) -> List[R]:
+    """Apply a function to each item using a bounded thread pool
+
+    Args:
+        fn (Callable[[T], R]): Function to apply
+        items (Iterable[T]): Items to apply the function to
+        max_workers (int, optional): Maximum number of concurrent calls. With 1, items are processed serially in the
+            calling thread. Defaults to DEFAULT_MAX_WORKERS.
+        fail_fast (bool, optional): If True, stop at the first failure, cancel any tasks not yet started, and re-raise
+            the exception. If False, run every task and raise a ConcurrentTaskError if any failed. Defaults to True.
+
+    Raises:
+        ValueError: If `max_workers` isn't positive
+        ConcurrentTaskError: If any task failed and `fail_fast` is False
+
+    Returns:
+        List[R]: Result for each item, in input order
+    """
+    if max_workers < 1:
+        raise ValueError(f"max_workers must be positive: {max_workers}")
+
+    items = list(items)
+    results: List[R] = [None] * len(items)
+    errors: List[Tuple[T, Exception]] = []
+
+    if max_workers == 1 or len(items) < 2:
+        for i, item in enumerate(items):
+            try:
+                results[i] = fn(item)
+            except Exception as e:
+                if fail_fast:
+                    raise
+                errors.append((item, e))
+
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+            futures = [executor.submit(fn, item) for item in items]
+
+            if fail_fast:
+                done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+                failed = [f for f in futures if f in done and f.exception() is not None]
+                if len(failed):
+                    for f in futures:
+                        f.cancel()
+                    raise failed[0].exception()
+
+            for i, future in enumerate(futures):
+                e = future.exception()
+                if e is None:
+                    results[i] = future.result()
+                else:
+                    errors.append((items[i], e))
+
+    if len(errors):
+        raise ConcurrentTaskError(errors, results)
+
+    return results
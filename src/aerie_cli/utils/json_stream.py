@@ -0,0 +1,52 @@
+"""Incremental JSON output for large record sets
+
+Records are encoded and written one at a time, so output never requires the whole document as a single string.
+"""
+
+import json
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import TextIO
+
+
+def write_json_array(records: Iterable[Dict[str, Any]], fid: TextIO, indent: int = 2) -> int:
+    """Write records as a JSON array, one record at a time
+
+    Output is identical to `json.dump(list(records), fid, indent=indent)`.
+
+    Args:
+        records (Iterable[Dict[str, Any]]): Records to write. May be a generator.
+        fid (TextIO): Open file to write
+        indent (int, optional): Indentation. Defaults to 2.
+
+    Returns:
+        int: Number of records written
+    """
+    prefix = " " * indent
+    count = 0
+    for record in records:
+        fid.write(",\n" if count else "[\n")
+        encoded = json.dumps(record, indent=indent)
+        fid.write("\n".join(prefix + line for line in encoded.split("\n")))
+        count += 1
+    fid.write("\n]" if count else "[]")
+    return count
+
+
+def write_ndjson(records: Iterable[Dict[str, Any]], fid: TextIO) -> int:
+    """Write records as newline-delimited JSON, one compact record per line
+
+    Args:
+        records (Iterable[Dict[str, Any]]): Records to write. May be a generator.
+        fid (TextIO): Open file to write
+
+    Returns:
+        int: Number of records written
+    """
+    count = 0
+    for record in records:
+        fid.write(json.dumps(record, separators=(",", ":")))
+        fid.write("\n")
+        count += 1
+    return count
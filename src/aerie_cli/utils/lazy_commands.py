@@ -0,0 +1,47 @@
+"""Lazily-loaded Typer sub-applications
+
+Each sub-command module imports its own dependencies (e.g., numpy for resource downloads), so importing them all when
+the CLI starts slows down every invocation. A `LazyTyperGroup` imports a sub-application only when it's invoked.
+"""
+
+import importlib
+from typing import Dict
+from typing import List
+from typing import Optional
+
+import click
+import typer
+from typer.core import TyperGroup
+
+
+class LazyTyperGroup(TyperGroup):
+    """Typer group which imports sub-applications on first use
+
+    Subclass and set `lazy_subcommands`, then pass the subclass to `typer.Typer(cls=...)`.
+
+    lazy_subcommands (Dict[str, str]): Maps each sub-command name to the "module:attribute" path of its `typer.Typer`
+    """
+
+    lazy_subcommands: Dict[str, str] = {}
+
+    def list_commands(self, ctx: click.Context) -> List[str]:
+        return sorted(set(super().list_commands(ctx)) | set(self.lazy_subcommands))
+
+    def get_command(self, ctx: click.Context, cmd_name: str) -> Optional[click.Command]:
+        if cmd_name not in self.commands and cmd_name in self.lazy_subcommands:
+            self.add_command(load_typer_group(self.lazy_subcommands[cmd_name]), cmd_name)
+        return super().get_command(ctx, cmd_name)
+
+
+def load_typer_group(import_path: str) -> click.Group:
+    """Import a Typer application and build its command group
+
+    Args:
+        import_path (str): "module:attribute" path of a `typer.Typer`
+
+    Returns:
+        click.Group: Command group for the application
+    """
+    module_name, attribute = import_path.split(":")
+    typer_app: typer.Typer = getattr(importlib.import_module(module_name), attribute)
+    return typer.main.get_group(typer_app)
@@ -0,0 +1,107 @@
+"""Caching of read-only GraphQL query results
+
+Queries opt in to caching by passing a `QueryCachePolicy` to `AerieHost.post_to_graphql`. Results are cached per
+host, user, role, query, and variables for the policy's TTL. Mutations which mention any of a policy's tables
+invalidate its cached results.
+"""
+
+import hashlib
+import json
+import re
+from datetime import timedelta
+from typing import Dict
+from typing import Iterable
+from typing import List
+
+from attrs import define, field
+
+# GraphQL tokens: block strings, strings, comments, names and numbers, and punctuators. Commas are insignificant.
+GRAPHQL_TOKEN = re.compile(r'"""[\s\S]*?"""|"(?:\\.|[^"\\\n])*"|#[^\n]*|[_A-Za-z0-9.+-]+|[^\s,]')
+
+
+@define
+class QueryCachePolicy:
+    """Rules for caching the results of a class of queries
+
+    name (str): Name of the class of queries, for reference
+    ttl (timedelta): Duration for which results are reused
+    tables (List[str]): Tables, or other names, whose mention in a mutation invalidates cached results
+    cache_empty (bool): Whether to cache results where every root field is empty or null
+    """
+
+    name: str
+    ttl: timedelta
+    tables: List[str] = field(factory=list)
+    cache_empty: bool = True
+
+    def is_invalidated_by(self, mutation: str) -> bool:
+        """Check whether a mutation may change the results of this policy's queries
+
+        Args:
+            mutation (str): GraphQL mutation text
+
+        Returns:
+            bool
+        """
+        return mutation_mentions(mutation, self.tables)
+
+    def should_cache(self, data: Dict) -> bool:
+        """Check whether to cache a query result
+
+        Args:
+            data (Dict): Query response data
+
+        Returns:
+            bool
+        """
+        return self.cache_empty or any(data.values())
+
+
+def mutation_mentions(mutation: str, tables: Iterable[str]) -> bool:
+    """Check whether a mutation mentions any of the given tables
+
+    Matching is by case-insensitive substring, so that e.g. `insert_mission_model_one` mentions `mission_model`. This
+    errs towards invalidating too much rather than too little.
+
+    Args:
+        mutation (str): GraphQL mutation text
+        tables (Iterable[str]): Table names
+
+    Returns:
+        bool
+    """
+    mutation = mutation.lower()
+    return any(table.lower() in mutation for table in tables)
+
+
+def normalize_query(query: str) -> str:
+    """Normalize GraphQL query text, so that queries differing only in whitespace, commas, or comments are equal
+
+    Args:
+        query (str): GraphQL query text
+
+    Returns:
+        str: Query tokens separated by single spaces
+    """
+    return " ".join(t for t in GRAPHQL_TOKEN.findall(query) if not t.startswith("#"))
+
+
+def query_cache_key(host: str, user: str, role: str, query: str, variables: Dict) -> str:
+    """Key for the results of a query
+
+    Args:
+        host (str): GraphQL URL of the Aerie host
+        user (str): Username, if authenticated
+        role (str): Active role, if any
+        query (str): GraphQL query text
+        variables (Dict): Query variables
+
+    Returns:
+        str: SHA-256 hex digest identifying the query
+    """
+    canonical = json.dumps(
+        {"host": host, "user": user, "role": role, "query": normalize_query(query), "variables": variables},
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
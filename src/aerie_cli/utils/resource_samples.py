@@ -0,0 +1,288 @@
+"""Columnar processing of simulated resource profiles
+
+Resource profiles are downloaded from Aerie as lists of segments, each with a start offset and dynamics. This module
+converts them to resource timelines stored as NumPy arrays, with one vectorized pass per resource rather than one
+Python object per sample.
+"""
+
+import csv
+import heapq
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import TextIO
+from typing import Tuple
+
+import numpy as np
+from attrs import define
+
+from aerie_cli.utils.serialization import postgres_interval_to_microseconds
+
+
+@define(eq=False)
+class ResourceTimeline:
+    """Sample series for a single resource
+
+    Samples are processed such that a linear interpolation between samples always returns a correct value. Two samples
+    at the same time indicate a discontinuity.
+
+    name (str): Resource name
+    profile_type (str): Aerie profile type, either "discrete" or "real"
+    x (np.ndarray): int64 sample times, in microseconds from plan start
+    y (np.ndarray): Sample values. float64 for real profiles, otherwise an object array of dynamics values
+    """
+
+    name: str
+    profile_type: str
+    x: np.ndarray
+    y: np.ndarray
+
+    def to_points(self) -> List[Dict[str, Any]]:
+        """Convert to a list of points {x: <time>, y: <value>}"""
+        return [{"x": x, "y": y} for x, y in zip(self.x.tolist(), self.y.tolist())]
+
+
+def postgres_intervals_to_microseconds(intervals: List[str]) -> np.ndarray:
+    """Convert many postgres interval strings to microseconds at once
+
+    Each distinct interval string is only parsed once, which is a large saving for profile segments since resources
+    tend to change at the same times.
+
+    Args:
+        intervals (List[str]): Postgres interval strings
+
+    Returns:
+        np.ndarray: int64 microseconds for each interval
+    """
+    if not len(intervals):
+        return np.zeros(0, dtype=np.int64)
+
+    unique_intervals, inverse = np.unique(np.asarray(intervals, dtype=str), return_inverse=True)
+    unique_microseconds = np.fromiter(
+        (postgres_interval_to_microseconds(i) for i in unique_intervals),
+        dtype=np.int64,
+        count=len(unique_intervals),
+    )
+    return unique_microseconds[inverse]
+
+
+def _object_array(values: List[Any]) -> np.ndarray:
+    # Assign elementwise so that list/dict values aren't expanded into extra dimensions
+    arr = np.empty(len(values), dtype=object)
+    arr[:] = values
+    return arr
+
+
+def _discrete_timeline(start: np.ndarray, end: np.ndarray, dynamics: List[Any]):
+    values = _object_array(dynamics)
+
+    # Merge runs of consecutive segments with the same value into a single pair of start/end samples
+    changed = np.ones(len(values), dtype=bool)
+    changed[1:] = ~np.asarray(values[1:] == values[:-1], dtype=bool)
+    run_starts = np.flatnonzero(changed)
+    run_ends = np.append(run_starts[1:], len(values)) - 1
+
+    x = np.column_stack((start[run_starts], end[run_ends])).ravel()
+    y = np.repeat(values[run_starts], 2)
+    return x, y
+
+
+def _real_timeline(start: np.ndarray, end: np.ndarray, dynamics: List[Dict[str, float]]):
+    initial = np.fromiter((d["initial"] for d in dynamics), dtype=np.float64, count=len(dynamics))
+    rate = np.fromiter((d["rate"] for d in dynamics), dtype=np.float64, count=len(dynamics))
+    final = initial + rate * ((end - start) / 1e6)
+
+    # Omit a segment's start sample if it's identical to the previous segment's end sample
+    keep = np.ones((len(dynamics), 2), dtype=bool)
+    keep[1:, 0] = final[:-1] != initial[1:]
+    keep = keep.ravel()
+
+    x = np.column_stack((start, end)).ravel()[keep]
+    y = np.column_stack((initial, final)).ravel()[keep]
+    return x, y
+
+
+def build_resource_timeline(
+    name: str, profile_type: str, start_offsets: np.ndarray, dynamics: List[Any], duration: int
+) -> ResourceTimeline:
+    """Build a single resource timeline from its profile segments
+
+    Args:
+        name (str): Resource name
+        profile_type (str): Aerie profile type, either "discrete" or "real"
+        start_offsets (np.ndarray): int64 segment start offsets in microseconds, in ascending order
+        dynamics (List[Any]): Segment dynamics
+        duration (int): Plan duration in microseconds, which is the end of the last segment
+
+    Raises:
+        ValueError: If the profile type isn't supported
+
+    Returns:
+        ResourceTimeline
+    """
+
+    # Each segment ends where the next begins, and the last segment ends at the end of the plan
+    start = start_offsets
+    end = np.append(start[1:], np.int64(duration))
+
+    if not len(dynamics):
+        x, y = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=object)
+    elif profile_type == "discrete":
+        x, y = _discrete_timeline(start, end, dynamics)
+    elif profile_type == "real":
+        x, y = _real_timeline(start, end, dynamics)
+    else:
+        raise ValueError(f"Unknown resource profile type: {profile_type}")
+
+    return ResourceTimeline(name, profile_type, x, y)
+
+
+def build_resource_timelines(profiles: List[Dict], duration: int) -> Dict[str, ResourceTimeline]:
+    """Build resource timelines from Aerie profiles
+
+    Args:
+        profiles (List[Dict]): Profiles as returned by Aerie, each with a name, type, and segments ordered by start offset
+        duration (int): Plan duration in microseconds, which is the end of each profile's last segment
+
+    Raises:
+        ValueError: If a profile type isn't supported
+
+    Returns:
+        Dict[str, ResourceTimeline]: Resource timelines keyed by name, in alphabetical order
+    """
+    profiles = sorted(profiles, key=lambda _: _["name"])
+
+    # Parse every segment offset in a single batch
+    all_offsets = postgres_intervals_to_microseconds(
+        [segment["start_offset"] for profile in profiles for segment in profile["profile_segments"]]
+    )
+    bounds = np.cumsum([0] + [len(profile["profile_segments"]) for profile in profiles])
+
+    resources = {}
+    for i, profile in enumerate(profiles):
+        resources[profile["name"]] = build_resource_timeline(
+            profile["name"],
+            profile["type"]["type"],
+            all_offsets[bounds[i]:bounds[i + 1]],
+            [segment["dynamics"] for segment in profile["profile_segments"]],
+            duration,
+        )
+
+    return resources
+
+
+def build_resource_timelines_from_pages(
+    profiles: List[Dict], pages: Iterable[List[Dict]], duration: int
+) -> Dict[str, ResourceTimeline]:
+    """Build resource timelines incrementally from pages of profile segments
+
+    Segments must be ordered by profile ID, then start offset, so each profile's segments are contiguous. Each
+    profile's timeline is built as soon as its last segment is received, so only one profile's raw segments are held
+    in memory at a time.
+
+    Args:
+        profiles (List[Dict]): Profiles, each with an ID, name and type
+        pages (Iterable[List[Dict]]): Pages of segments, each with a profile ID, start offset and dynamics
+        duration (int): Plan duration in microseconds, which is the end of each profile's last segment
+
+    Raises:
+        ValueError: If a profile type isn't supported
+
+    Returns:
+        Dict[str, ResourceTimeline]: Resource timelines keyed by name, in alphabetical order
+    """
+    profiles_by_id = {p["id"]: p for p in profiles}
+    resources = {}
+
+    current_id = None
+    offsets = []
+    dynamics = []
+
+    def finish_profile():
+        profile = profiles_by_id[current_id]
+        resources[profile["name"]] = build_resource_timeline(
+            profile["name"],
+            profile["type"]["type"],
+            postgres_intervals_to_microseconds(offsets),
+            dynamics,
+            duration,
+        )
+
+    for page in pages:
+        for segment in page:
+            if segment["profile_id"] != current_id:
+                if current_id is not None:
+                    finish_profile()
+                current_id = segment["profile_id"]
+                offsets = []
+                dynamics = []
+            offsets.append(segment["start_offset"])
+            dynamics.append(segment["dynamics"])
+
+    if current_id is not None:
+        finish_profile()
+
+    # Profiles without any segments
+    for profile in profiles:
+        if profile["name"] not in resources.keys():
+            resources[profile["name"]] = build_resource_timeline(
+                profile["name"], profile["type"]["type"], np.zeros(0, dtype=np.int64), [], duration
+            )
+
+    return {name: resources[name] for name in sorted(resources.keys())}
+
+
+# Number of samples per resource converted from arrays to Python values at a time while merging
+MERGE_CHUNK_SIZE = 4096
+
+
+def _iter_samples(column: int, timeline: ResourceTimeline) -> Iterator[Tuple[int, int, Any]]:
+    for i in range(0, len(timeline.x), MERGE_CHUNK_SIZE):
+        xs = timeline.x[i:i + MERGE_CHUNK_SIZE].tolist()
+        ys = timeline.y[i:i + MERGE_CHUNK_SIZE].tolist()
+        for x, y in zip(xs, ys):
+            yield x, column, y
+
+
+def write_resource_timelines_csv(
+    timelines: Dict[str, ResourceTimeline],
+    fid: TextIO,
+    time_header: str = "Time (s)",
+    format_time: Callable[[int], Any] = lambda t: t / 1e6,
+) -> None:
+    """Write resource timelines to a CSV file with one column per resource
+
+    Timelines are merged in time order and rows are written as they're produced, so memory use scales with the number
+    of resources rather than the number of samples. Each row is a distinct sample time. Resources without a sample at
+    that time carry forward their last value, and are blank before their first sample. If a resource has multiple
+    samples at the same time, the last is used.
+
+    Args:
+        timelines (Dict[str, ResourceTimeline]): Resource timelines keyed by column name
+        fid (TextIO): Open file to write
+        time_header (str, optional): Header for the time column. Defaults to "Time (s)".
+        format_time (Callable[[int], Any], optional): Formats sample times (microseconds from plan start) for the time
+            column. Defaults to seconds from plan start.
+    """
+    writer = csv.writer(fid, lineterminator="\n")
+    writer.writerow([time_header] + list(timelines.keys()))
+
+    # Each timeline is already in time order, so a k-way merge yields all samples in time order
+    merged = heapq.merge(
+        *[_iter_samples(i, timeline) for i, timeline in enumerate(timelines.values())],
+        key=lambda sample: sample[0],
+    )
+
+    row = [""] * len(timelines)
+    row_time = None
+    for time, column, value in merged:
+        if row_time is not None and time != row_time:
+            writer.writerow([format_time(row_time)] + row)
+        row_time = time
+        row[column] = value
+
+    if row_time is not None:
+        writer.writerow([format_time(row_time)] + row)
@@ -0,0 +1,143 @@
+"""Retries for transient failures of requests to an Aerie host
+
+Transient failures are connection errors, timeouts, and responses with a retryable status (e.g., 502 from a gateway
+while a service restarts). Retries wait with capped exponential backoff and full jitter, unless the response gives a
+`Retry-After` header.
+"""
+
+import random
+import re
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable
+from typing import Optional
+
+import requests
+from attrs import define, field
+
+RETRYABLE_STATUS_CODES = frozenset([429, 502, 503, 504])
+
+# Leading comments and whitespace before a GraphQL operation type
+GRAPHQL_IGNORED_PREFIX = re.compile(r"^(\s|#[^\n]*\n?|,)*")
+
+
+@define
+class RetryEvent:
+    """Details of a retry, passed to `RetryPolicy.on_retry`
+
+    url (str): Request URL
+    attempt (int): Number of the attempt which failed, starting at 1
+    delay (float): Seconds until the next attempt
+    status_code (Optional[int]): Status of the failed response, or None if the request raised an exception
+    exception (Optional[Exception]): Exception raised by the failed request, if any
+    """
+
+    url: str
+    attempt: int
+    delay: float
+    status_code: Optional[int] = field(default=None)
+    exception: Optional[Exception] = field(default=None)
+
+
+@define
+class RetryPolicy:
+    """Policy for retrying transient request failures
+
+    max_attempts (int): Maximum number of attempts per request, including the first. 1 disables retries.
+    base_delay (float): Backoff before the first retry, in seconds. Doubles with each retry.
+    max_delay (float): Cap on backoff and on delays requested by `Retry-After` headers, in seconds
+    retry_mutations (bool): Also retry GraphQL mutations and Gateway file uploads, which may not be idempotent
+    retry_status_codes (frozenset): Response statuses to retry
+    on_retry (Callable[[RetryEvent], None]): Metrics hook called before each retry
+    sleep (Callable[[float], None]): Function used to wait between attempts
+    """
+
+    max_attempts: int = field(default=4)
+    base_delay: float = field(default=0.5)
+    max_delay: float = field(default=30.0)
+    retry_mutations: bool = field(default=False)
+    retry_status_codes: frozenset = field(default=RETRYABLE_STATUS_CODES, converter=frozenset)
+    on_retry: Optional[Callable[[RetryEvent], None]] = field(default=None)
+    sleep: Callable[[float], None] = field(default=time.sleep)
+
+    def backoff(self, attempt: int) -> float:
+        """Get a jittered backoff delay
+
+        Args:
+            attempt (int): Number of the attempt which failed, starting at 1
+
+        Returns:
+            float: Seconds to wait, uniformly distributed up to the capped exponential backoff
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def send(self, request: Callable[[], requests.Response], url: str, idempotent: bool = True) -> requests.Response:
+        """Send a request, retrying transient failures according to this policy
+
+        Args:
+            request (Callable[[], requests.Response]): Sends the request and returns the response
+            url (str): Request URL, for retry events
+            idempotent (bool, optional): Whether the request is safe to repeat. Non-idempotent requests are only
+                retried if `retry_mutations` is set. Defaults to True.
+
+        Returns:
+            requests.Response: Response to the last attempt. Its status may still be a retryable error.
+        """
+        max_attempts = self.max_attempts if (idempotent or self.retry_mutations) else 1
+
+        attempt = 1
+        while True:
+            try:
+                resp = request()
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if attempt >= max_attempts:
+                    raise
+                event = RetryEvent(url, attempt, self.backoff(attempt), exception=e)
+            else:
+                if attempt >= max_attempts or resp.status_code not in self.retry_status_codes:
+                    return resp
+                retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+                delay = self.backoff(attempt) if retry_after is None else min(retry_after, self.max_delay)
+                event = RetryEvent(url, attempt, delay, status_code=resp.status_code)
+
+            if self.on_retry is not None:
+                self.on_retry(event)
+            self.sleep(event.delay)
+            attempt += 1
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header
+
+    Args:
+        value (Optional[str]): Header value, either a number of seconds or an HTTP date
+
+    Returns:
+        Optional[float]: Seconds to wait, or None if missing or unparseable
+    """
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_time = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_time.tzinfo is None:
+        retry_time = retry_time.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_time - datetime.now(timezone.utc)).total_seconds())
+
+
+def is_graphql_mutation(query: str) -> bool:
+    """Check whether a GraphQL document is a mutation
+
+    Args:
+        query (str): GraphQL query text
+
+    Returns:
+        bool: True if the operation type is `mutation`
+    """
+    return GRAPHQL_IGNORED_PREFIX.sub("", query, count=1).startswith("mutation")
@@ -1,11 +1,13 @@
 import requests
 from typing import Dict
+from typing import Optional
 import typer
 from copy import deepcopy
 
 from aerie_cli.aerie_host import AerieHost, AerieHostConfiguration, ExternalAuthConfiguration, AerieJWT
 from aerie_cli.aerie_client import AerieClient
 from aerie_cli.persistent import PersistentSessionManager
+from aerie_cli.daemon import DaemonAerieHost, DaemonUnavailableError
 
 def get_active_session_client():
     """Instantiate AerieClient with the active host session
@@ -20,6 +22,22 @@ def get_active_session_client():
     return AerieClient(session)
 
 
+def get_daemon_session_client() -> Optional[AerieClient]:
+    """Instantiate AerieClient with the active host session held by a running daemon
+
+    Raises:
+        NoActiveSessionError: if there is no active session
+
+    Returns:
+        Optional[AerieClient]: Client which forwards requests to the daemon, or None if no daemon is running
+    """
+    try:
+        session = DaemonAerieHost.connect(PersistentSessionManager.session_name)
+    except DaemonUnavailableError:
+        return None
+    return AerieClient(session)
+
+
 def get_localhost_client() -> AerieClient:
     aerie_host = AerieHost("http://localhost:8080/v1/graphql", "http://localhost:9000")
     if not aerie_host.check_auth():
@@ -153,6 +171,7 @@ def start_session_from_configuration(
         configuration.gateway_url,
         session,
         configuration.name,
+        configuration.transport,
     )
 
     if username is None:
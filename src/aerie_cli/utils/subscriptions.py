@@ -0,0 +1,193 @@
+"""GraphQL subscriptions over a websocket
+
+Aerie's Hasura instance serves subscriptions at the GraphQL URL (with `ws`/`wss` in place of `http`/`https`) using the
+`graphql-transport-ws` protocol. Requires the optional `websocket-client` package:
+
+    pip install aerie-cli[subscriptions]
+"""
+
+import json
+import time
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Optional
+
+GRAPHQL_WS_PROTOCOL = "graphql-transport-ws"
+
+# Seconds allowed to open a websocket and complete the protocol handshake
+CONNECT_TIMEOUT = 10.0
+
+SUBSCRIPTION_ID = "1"
+
+
+class SubscriptionUnavailableError(RuntimeError):
+    """A subscription could not be established or was interrupted
+
+    Callers may fall back to polling.
+    """
+
+
+def websocket_url(graphql_url: str) -> str:
+    """Get the websocket URL for subscriptions to a GraphQL API
+
+    Args:
+        graphql_url (str): HTTP(S) route to the GraphQL API
+
+    Returns:
+        str: WS(S) route to the same API
+    """
+    if graphql_url.startswith("https://"):
+        return "wss://" + graphql_url[len("https://"):]
+    if graphql_url.startswith("http://"):
+        return "ws://" + graphql_url[len("http://"):]
+    return graphql_url
+
+
+class WebSocketConnection:
+    """Minimal websocket connection using `websocket-client`
+
+    Translates library exceptions so callers need not import `websocket`: receive timeouts raise `TimeoutError` and
+    all other connection failures raise `SubscriptionUnavailableError`.
+    """
+
+    def __init__(self, url: str, headers: Dict[str, str], timeout: float) -> None:
+        try:
+            import websocket
+        except ImportError:
+            raise SubscriptionUnavailableError(
+                "GraphQL subscriptions require websocket-client. Install with: pip install aerie-cli[subscriptions]"
+            )
+
+        self._websocket = websocket
+        try:
+            self._ws = websocket.create_connection(
+                url,
+                timeout=timeout,
+                subprotocols=[GRAPHQL_WS_PROTOCOL],
+                header=[f"{k}: {v}" for k, v in headers.items()],
+            )
+        except (websocket.WebSocketException, OSError) as e:
+            raise SubscriptionUnavailableError(f"Failed to connect to {url}: {e}")
+
+    def send(self, message: str) -> None:
+        try:
+            self._ws.send(message)
+        except (self._websocket.WebSocketException, OSError) as e:
+            raise SubscriptionUnavailableError(f"Websocket send failed: {e}")
+
+    def recv(self, timeout: Optional[float]) -> str:
+        self._ws.settimeout(timeout)
+        try:
+            return self._ws.recv()
+        except self._websocket.WebSocketTimeoutException:
+            raise TimeoutError("Timed out waiting for subscription data")
+        except (self._websocket.WebSocketException, OSError) as e:
+            raise SubscriptionUnavailableError(f"Websocket receive failed: {e}")
+
+    def close(self) -> None:
+        try:
+            self._ws.close()
+        except Exception:
+            pass
+
+
+def wait_for_subscription(
+    url: str,
+    query: str,
+    variables: Dict[str, Any],
+    predicate: Callable[[Dict], bool],
+    headers: Dict[str, str] = None,
+    timeout: float = None,
+    connect: Callable[[str, Dict[str, str], float], Any] = WebSocketConnection,
+) -> Dict:
+    """Subscribe to a GraphQL query and wait for data satisfying a predicate
+
+    Args:
+        url (str): Websocket route to the GraphQL API
+        query (str): GraphQL subscription text
+        variables (Dict[str, Any]): Named variables for the subscription
+        predicate (Callable[[Dict], bool]): Called with each data payload; return True to stop waiting
+        headers (Dict[str, str], optional): Headers for the connection, also sent in the connection payload for
+            authorization. Defaults to None.
+        timeout (float, optional): Maximum seconds to wait. Defaults to None, which waits indefinitely.
+        connect (Callable, optional): Opens a connection given a URL, headers, and connect timeout. The connection
+            must provide `send(str)`, `recv(timeout) -> str`, and `close()`. Defaults to `WebSocketConnection`.
+
+    Raises:
+        SubscriptionUnavailableError: If the connection or subscription fails, including any failure (e.g. a timeout or
+            GraphQL error) before the first data payload is received
+        TimeoutError: If no payload satisfies the predicate before the timeout
+        RuntimeError: If the server reports a GraphQL error after the subscription started
+
+    Returns:
+        Dict: The first data payload satisfying the predicate
+    """
+    headers = headers if headers else {}
+    deadline = None if timeout is None else time.monotonic() + timeout
+
+    def remaining() -> Optional[float]:
+        if deadline is None:
+            return None
+        left = deadline - time.monotonic()
+        if left <= 0:
+            raise TimeoutError("Timed out waiting for subscription data")
+        return left
+
+    def recv_message(limit: Optional[float]) -> Dict:
+        try:
+            return json.loads(conn.recv(limit))
+        except json.decoder.JSONDecodeError as e:
+            raise SubscriptionUnavailableError(f"Invalid subscription message: {e}")
+
+    # Until the first payload arrives, failures mean the subscription couldn't be established, so callers can fall back
+    started = False
+
+    def graphql_error(errors: Any) -> RuntimeError:
+        message = f"GraphQL Error: {json.dumps(errors)}"
+        return RuntimeError(message) if started else SubscriptionUnavailableError(message)
+
+    connect_timeout = CONNECT_TIMEOUT if timeout is None else min(CONNECT_TIMEOUT, timeout)
+    conn = connect(url, headers, connect_timeout)
+    try:
+        conn.send(json.dumps({"type": "connection_init", "payload": {"headers": headers}}))
+        handshake_timeout = remaining()
+        ack = recv_message(connect_timeout if handshake_timeout is None else min(connect_timeout, handshake_timeout))
+        if ack.get("type") != "connection_ack":
+            raise SubscriptionUnavailableError(f"Subscription connection rejected: {ack}")
+
+        conn.send(
+            json.dumps(
+                {
+                    "id": SUBSCRIPTION_ID,
+                    "type": "subscribe",
+                    "payload": {"query": query, "variables": variables},
+                }
+            )
+        )
+
+        while True:
+            message = recv_message(remaining())
+            message_type = message.get("type")
+
+            if message_type == "ping":
+                conn.send(json.dumps({"type": "pong"}))
+            elif message_type == "next":
+                payload = message.get("payload", {})
+                if "errors" in payload:
+                    raise graphql_error(payload["errors"])
+                started = True
+                data = payload.get("data")
+                if data is not None and predicate(data):
+                    conn.send(json.dumps({"id": SUBSCRIPTION_ID, "type": "complete"}))
+                    return data
+            elif message_type == "error":
+                raise graphql_error(message.get("payload"))
+            elif message_type == "complete":
+                raise SubscriptionUnavailableError("Subscription completed before the expected data was received")
+    except TimeoutError as e:
+        if not started:
+            raise SubscriptionUnavailableError(f"Subscription not established: {e}")
+        raise
+    finally:
+        conn.close()
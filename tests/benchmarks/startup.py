@@ -0,0 +1,89 @@
+"""Benchmark import time of aerie-cli entry points
+
+Each entry point is imported in a fresh interpreter with `-X importtime`, and the median cumulative import time over
+several runs is reported. Run from the repository root:
+
+    python3 tests/benchmarks/startup.py
+    python3 tests/benchmarks/startup.py --json > startup.json
+"""
+
+import argparse
+import json
+import re
+import statistics
+import subprocess
+import sys
+from typing import Dict
+from typing import List
+
+ENTRY_POINTS = [
+    "aerie_cli.__main__",
+    "aerie_cli.app",
+    "aerie_cli.aerie_client",
+    "aerie_cli.async_aerie_client",
+    "aerie_cli.commands.configurations",
+    "aerie_cli.commands.constraints",
+    "aerie_cli.commands.expansion",
+    "aerie_cli.commands.metadata",
+    "aerie_cli.commands.models",
+    "aerie_cli.commands.plans",
+    "aerie_cli.commands.scheduling",
+]
+
+IMPORT_TIME_REGEX = re.compile(r"^import time:\s+\d+ \|\s+(\d+) \|\s*(\S+)$")
+
+
+def measure_import_time(module: str) -> float:
+    """Import a module in a fresh interpreter
+
+    Args:
+        module (str): Module to import
+
+    Returns:
+        float: Cumulative import time in milliseconds, including the module's dependencies
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_REGEX.match(line)
+        if match and match.group(2) == module:
+            return int(match.group(1)) / 1000
+    raise RuntimeError(f"No import time reported for {module}")
+
+
+def benchmark(modules: List[str], runs: int) -> Dict[str, float]:
+    """Measure the median import time of each module
+
+    Args:
+        modules (List[str]): Modules to import
+        runs (int): Number of runs per module
+
+    Returns:
+        Dict[str, float]: Median import time in milliseconds for each module
+    """
+    return {m: statistics.median(measure_import_time(m) for _ in range(runs)) for m in modules}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="Runs per entry point")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    parser.add_argument("modules", nargs="*", default=ENTRY_POINTS, help="Modules to import")
+    args = parser.parse_args()
+
+    results = benchmark(args.modules, args.runs)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        width = max(len(m) for m in results)
+        for module, ms in results.items():
+            print(f"{module:<{width}}  {ms:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
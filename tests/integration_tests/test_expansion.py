@@ -1,3 +1,5 @@
+import gzip
+import json
 import os
 import pytest
 import arrow
@@ -122,6 +124,52 @@ def test_expansion_sequence_download():
     assert path_to_sequence.exists()
     path_to_sequence.unlink()
 
+def test_expansion_sequence_download_all():
+    output_dir = EXPANSION_ARTIFACTS_PATH.joinpath("sequences")
+    result = RUNNER.invoke(
+        app,
+        ["expansion", "sequences", "download-all", "-s", str(sim_id), "-o", str(output_dir)],
+        catch_exceptions=False,)
+    assert result.exit_code == 0,\
+        f"{result.stdout}"\
+        f"{result.stderr}"
+    assert "Downloaded 1 sequences" in result.stdout
+    with open(output_dir.joinpath(f"{expansion_sequence_id}.json"), "r") as fid:
+        assert json.load(fid)["id"] == str(expansion_sequence_id)
+
+def test_expansion_sequence_download_all_gzip():
+    output_dir = EXPANSION_ARTIFACTS_PATH.joinpath("sequences_gzip")
+    result = RUNNER.invoke(
+        app,
+        ["expansion", "sequences", "download-all", "-s", str(sim_id), "-o", str(output_dir), "--gzip"],
+        catch_exceptions=False,)
+    assert result.exit_code == 0,\
+        f"{result.stdout}"\
+        f"{result.stderr}"
+    with gzip.open(output_dir.joinpath(f"{expansion_sequence_id}.json.gz"), "rt") as fid:
+        assert json.load(fid)["id"] == str(expansion_sequence_id)
+
+def test_expansion_sequence_download_all_collision():
+    # Slashes are replaced in file names, so these sequences would overwrite each other
+    colliding_ids = ["collision/seq", "collision_seq"]
+    for seq_id in colliding_ids:
+        client.create_sequence(seq_id, sim_id)
+
+    output_dir = EXPANSION_ARTIFACTS_PATH.joinpath("sequences_collision")
+    try:
+        result = RUNNER.invoke(
+            app,
+            ["expansion", "sequences", "download-all", "-s", str(sim_id), "-o", str(output_dir)],
+            catch_exceptions=False,)
+    finally:
+        for seq_id in colliding_ids:
+            client.delete_sequence(seq_id, sim_id)
+
+    assert result.exit_code == 1
+    assert "would be written to the same file" in result.stdout
+    assert all(seq_id in result.stdout for seq_id in colliding_ids)
+    assert not len(list(output_dir.iterdir()))
+
 def test_expansion_sequence_delete():
     result = RUNNER.invoke(
         app,
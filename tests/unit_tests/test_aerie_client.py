@@ -3,15 +3,21 @@ from typing import Dict, List
 import json
 import re
 
+import numpy as np
 import pytest
+from typer.testing import CliRunner
 
 from aerie_cli.aerie_client import AerieClient
+from aerie_cli.aerie_client import SimulationFailedError
+from aerie_cli.aerie_client import SimulationTimeoutError
 from aerie_cli.aerie_host import AerieHost
+from aerie_cli.persistent import EffectiveArgumentsCache
 from aerie_cli.schemas.client import Activity
 from aerie_cli.schemas.api import ApiActivityPlanRead
 from aerie_cli.schemas.client import ActivityPlanRead
 from aerie_cli.schemas.client import ActivityPlanCreate
 from aerie_cli.schemas.client import ResourceType
+from aerie_cli.utils.subscriptions import SubscriptionUnavailableError
 
 BLANK_LINE_REGEX = r"^\s*$"
 EXPECTED_RESULTS_DIRECTORY = Path(__file__).parent.joinpath("files", "expected_results")
@@ -56,8 +62,9 @@ class MockAerieHost(AerieHost):
             f"{mock_query_name}.json")
         with open(mock_query_fn, 'r') as fid:
             self.mock_data: List = json.load(fid)
+        self.graphql_url = "http://localhost:8080/v1/graphql"
 
-    def post_to_graphql(self, query: str, **kwargs) -> Dict:
+    def post_to_graphql(self, query: str, cache_policy=None, **kwargs) -> Dict:
 
         # Get the next transaction being mocked
         mock_transaction = self.mock_data.pop(0)
@@ -71,6 +78,14 @@ class MockAerieHost(AerieHost):
 
         return mock_transaction["response"]
 
+    def post_to_graphql_multiple(self, query: str, cache_policy=None, **kwargs) -> Dict:
+        # Mocked responses for queries with multiple root fields contain every field
+        return self.post_to_graphql(query, **kwargs)
+
+    def wait_for_subscription(self, query: str, predicate, timeout: float = None, **kwargs) -> Dict:
+        # Mocked hosts have no websocket, so clients must fall back to polling
+        raise SubscriptionUnavailableError("Subscriptions are not mocked")
+
 
 def test_list_all_activity_plans():
     aerie_host = MockAerieHost('list_all_activity_plans')
@@ -158,6 +173,18 @@ def test_update_activity():
     assert res == 15
 
 
+def test_list_activity_plans():
+    aerie_host = MockAerieHost('list_activity_plans')
+    client = AerieClient(aerie_host)
+
+    res = client.list_activity_plans(limit=2, offset=1, name_filter="plan_")
+
+    assert [(plan.id, plan.name, plan.sim_id, dataset_id) for plan, dataset_id in res] == [
+        (1, "plan_1", 1, 7),
+        (2, "plan_2", 2, None),
+    ]
+
+
 def test_get_resource_samples():
 
     # CASE 1: Get all states
@@ -181,6 +208,126 @@ def test_get_resource_samples():
     assert res == expected
 
 
+def test_get_resource_sample_arrays():
+    aerie_host = MockAerieHost('get_resource_samples_1')
+    client = AerieClient(aerie_host)
+
+    with open(EXPECTED_RESULTS_DIRECTORY.joinpath('get_resource_samples_1.json'), 'r') as fid:
+        expected = json.load(fid)["resourceSamples"]
+
+    res = client.get_resource_sample_arrays(1)
+    assert list(res.keys()) == list(expected.keys())
+    for name, timeline in res.items():
+        assert timeline.x.dtype == np.int64
+        assert timeline.x.tolist() == [p["x"] for p in expected[name]]
+        assert timeline.y.tolist() == [p["y"] for p in expected[name]]
+
+
+def test_get_simulation_dataset_resources_paginated():
+    aerie_host = MockAerieHost('get_resource_samples_paginated')
+    client = AerieClient(aerie_host)
+
+    with open(EXPECTED_RESULTS_DIRECTORY.joinpath('get_resource_samples_1.json'), 'r') as fid:
+        expected = json.load(fid)["resourceSamples"]
+
+    metadata, res = client.get_simulation_dataset_resources(1, page_size=4)
+    assert metadata.plan_id == 2
+    assert {name: t.to_points() for name, t in res.items()} == expected
+    assert list(res.keys()) == list(expected.keys())
+    assert not len(aerie_host.mock_data)
+
+
+def test_iter_simulation_results():
+    aerie_host = MockAerieHost("iter_simulation_results")
+    client = AerieClient(aerie_host)
+
+    res = client.iter_simulation_results(1, page_size=2, fields=["activity_type_name", "start_offset", "duration"])
+
+    assert [a["id"] for a in res] == [3, 5, 9]
+    assert not len(aerie_host.mock_data)
+
+    with pytest.raises(ValueError):
+        client.get_simulation_results(1, ["not_a_field"])
+
+
+def test_simulate_plan(monkeypatch):
+    aerie_host = MockAerieHost("simulate_plan")
+    client = AerieClient(aerie_host)
+    sleeps = []
+    monkeypatch.setattr("aerie_cli.aerie_client.time.sleep", sleeps.append)
+
+    assert client.simulate_plan(1, poll_period=0.4) == 7
+    assert sleeps == [0.25, 0.375, 0.4]
+    assert not len(aerie_host.mock_data)
+
+
+def test_simulate_plan_failed(monkeypatch):
+    aerie_host = MockAerieHost("simulate_plan_failed")
+    client = AerieClient(aerie_host)
+    monkeypatch.setattr("aerie_cli.aerie_client.time.sleep", lambda _: None)
+
+    with pytest.raises(SimulationFailedError) as e:
+        client.simulate_plan(1)
+
+    assert e.value.response["reason"] == {"type": "SIMULATION_EXCEPTION"}
+    assert not len(aerie_host.mock_data)
+
+
+def test_simulate_plan_timeout(monkeypatch):
+    aerie_host = MockAerieHost("simulate_plan")
+    client = AerieClient(aerie_host)
+    clock = [0.0]
+    monkeypatch.setattr("aerie_cli.aerie_client.time.monotonic", lambda: clock[0])
+    monkeypatch.setattr("aerie_cli.aerie_client.time.sleep", lambda t: clock.__setitem__(0, clock[0] + t))
+
+    with pytest.raises(SimulationTimeoutError) as e:
+        client.simulate_plan(1, timeout=0.5)
+
+    assert e.value.sim_dataset_id == 7
+    assert clock[0] == 0.5
+
+
+def test_simulate_plans(monkeypatch):
+    aerie_host = MockAerieHost("simulate_plans")
+    client = AerieClient(aerie_host)
+    sleeps = []
+    monkeypatch.setattr("aerie_cli.aerie_client.time.sleep", sleeps.append)
+    completed = []
+
+    runs = client.simulate_plans([1, 2, 3, 2], max_concurrent=2, on_complete=lambda r: completed.append(r.plan_id))
+
+    assert [(r.plan_id, r.sim_dataset_id, r.status) for r in runs] == [
+        (1, 11, "success"),
+        (2, 12, "success"),
+        (3, 13, "failed"),
+    ]
+    assert runs[2].reason == {"type": "SIMULATION_EXCEPTION"}
+    assert all(r.done and r.end_time >= r.start_time for r in runs)
+    assert completed == [2, 1, 3]
+    assert sleeps == [0.25, 0.375]
+    assert not len(aerie_host.mock_data)
+
+
+
+def test_simulate_batch_command(monkeypatch):
+    from aerie_cli.__main__ import app
+    from aerie_cli.commands.command_context import CommandContext
+
+    aerie_host = MockAerieHost("simulate_plans")
+    monkeypatch.setattr(CommandContext, "get_client", lambda: AerieClient(aerie_host))
+    monkeypatch.setattr("aerie_cli.aerie_client.time.sleep", lambda delay: None)
+
+    result = CliRunner().invoke(
+        app, ["plans", "simulate-batch", "--id", "1", "--id", "2", "--id", "3"], catch_exceptions=False
+    )
+
+    # Plan 2's results were already available ("complete"), so only plan 3 is reported as failing
+    assert result.exit_code == 1
+    assert "Simulation of plan 3 failed" in result.stdout
+    assert "Simulation of plan 1 " not in result.stdout
+    assert "Simulation of plan 2 " not in result.stdout
+    assert not len(aerie_host.mock_data)
+
 def test_get_activity_plan_by_id():
     aerie_host = MockAerieHost("get_activity_plan_by_id")
     client = AerieClient(aerie_host)
@@ -194,6 +341,60 @@ def test_get_activity_plan_by_id():
     assert res == expected
 
 
+def test_get_activity_plan_by_id_full_args():
+    # Five activities with three distinct (type, arguments) pairs, requested in batches of two
+    aerie_host = MockAerieHost("get_activity_plan_by_id_full_args")
+    client = AerieClient(aerie_host, max_workers=1, effective_arguments_batch_size=2)
+
+    res = client.get_activity_plan_by_id(1, "true")
+
+    assert [a.arguments for a in res.activities] == [
+        {"b": "default"},
+        {"a": 1, "c": True},
+        {"b": "default"},
+        {"a": 1, "c": True},
+        {"a": 2, "c": True},
+    ]
+    assert not len(aerie_host.mock_data)
+
+
+def test_get_all_activity_plans_full_args():
+    # List a single plan, then expand its arguments as in test_get_activity_plan_by_id_full_args
+    aerie_host = MockAerieHost("list_all_activity_plans")
+    aerie_host.mock_data[0]["response"] = aerie_host.mock_data[0]["response"][:1]
+    aerie_host.mock_data += MockAerieHost("get_activity_plan_by_id_full_args").mock_data
+    client = AerieClient(aerie_host, max_workers=1, effective_arguments_batch_size=2)
+
+    res = client.get_all_activity_plans("true")
+
+    assert [a.arguments for a in res[0].activities][-1] == {"a": 2, "c": True}
+    assert not len(aerie_host.mock_data)
+
+
+def test_get_activity_plan_by_id_cached_args(tmp_path: Path):
+    aerie_host = MockAerieHost("get_activity_plan_by_id_cached_args")
+    cache = EffectiveArgumentsCache(tmp_path.joinpath("cache.sqlite"))
+    client = AerieClient(
+        aerie_host, max_workers=1, effective_arguments_batch_size=2, effective_arguments_cache=cache
+    )
+    expected = [
+        {"b": "default"},
+        {"a": 1, "c": True},
+        {"b": "default"},
+        {"a": 1, "c": True},
+        {"a": 2, "c": True},
+    ]
+
+    # First download requests all arguments, the second is served from the cache, and the third requests them again
+    # because the model's JAR changed
+    for _ in range(3):
+        res = client.get_activity_plan_by_id(1, "true")
+        assert [a.arguments for a in res.activities] == expected
+
+    assert not len(aerie_host.mock_data)
+    cache.close()
+
+
 @pytest.mark.parametrize(["case_name"], [("create_activity_plan_1",), ("create_activity_plan_2",)])
 def test_create_activity_plan(case_name: str):
     aerie_host = MockAerieHost(case_name)
@@ -208,6 +409,28 @@ def test_create_activity_plan(case_name: str):
     assert res == 456
 
 
+def test_link_activities_to_sequence():
+    aerie_host = MockAerieHost("link_activities_to_sequence")
+    client = AerieClient(aerie_host)
+
+    linked = []
+    # Activity 11 is already linked to the sequence, so it isn't linked again
+    client.link_activities_to_sequence("seq-1", 5, [11, 12, 13], chunk_size=2, progress=linked.append)
+
+    assert linked == [2, 1]
+    assert not len(aerie_host.mock_data)
+
+
+def test_link_activities_to_sequence_conflict():
+    aerie_host = MockAerieHost("link_activities_to_sequence_conflict")
+    client = AerieClient(aerie_host)
+
+    # Activity 12 is linked to another sequence
+    with pytest.raises(RuntimeError, match=r"\[12\]"):
+        client.link_activities_to_sequence("seq-1", 5, [11, 12, 13], chunk_size=2)
+    assert not len(aerie_host.mock_data)
+
+
 def test_get_resource_types():
     aerie_host = MockAerieHost("get_resource_types")
     client = AerieClient(aerie_host)
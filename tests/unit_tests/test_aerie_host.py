@@ -2,7 +2,17 @@ from typing import Dict
 import pytest
 import requests
 
-from aerie_cli.aerie_host import AerieHost, COMPATIBLE_AERIE_VERSIONS, AerieJWT
+import gzip
+import json
+from base64 import b64encode
+from io import BytesIO
+from datetime import datetime, timedelta, timezone
+
+from aerie_cli.aerie_host import AerieHost, COMPATIBLE_AERIE_VERSIONS, AerieJWT, AerieAuthenticationError
+from aerie_cli.aerie_host import AerieHostConfiguration, TransportConfiguration
+from aerie_cli.persistent import QueryCache
+from aerie_cli.utils.query_cache import QueryCachePolicy
+from aerie_cli.utils.retry import RetryPolicy
 
 
 class MockJWT:
@@ -10,16 +20,21 @@ class MockJWT:
         self.default_role = 'viewer'
 
 class MockResponse:
-    def __init__(self, json: Dict, text: str = None, ok: bool = True) -> None:
+    def __init__(self, json: Dict, text: str = None, ok: bool = True, status_code: int = None, headers: Dict = None) -> None:
         self.json_data = json
         self.text = text
         self.ok = ok
+        self.status_code = status_code if status_code is not None else (200 if ok else 500)
+        self.headers = headers if headers is not None else {}
 
     def json(self) -> Dict:
         if self.json_data is None:
             raise requests.exceptions.JSONDecodeError("", "", 0)
         return self.json_data
 
+    def raise_for_status(self) -> None:
+        pass
+
 
 class MockSession:
 
@@ -104,3 +119,251 @@ def test_version_broken_gateway():
         aerie_host.check_aerie_version()
 
     assert "Bad response from Aerie Gateway" in str(e.value)
+
+
+class RecordingSession(MockSession):
+    """Mock session which records the arguments of each post"""
+
+    def __init__(self, mock_response: MockResponse) -> None:
+        super().__init__(mock_response)
+        self.posts = []
+        self.adapters = {}
+
+    def mount(self, prefix: str, adapter) -> None:
+        self.adapters[prefix] = adapter
+
+    def post(self, *args, **kwargs) -> MockResponse:
+        self.posts.append(kwargs)
+        return self.mock_response
+
+
+def test_transport_compression():
+    session = RecordingSession(MockResponse({"data": {"plan": []}}))
+    transport = TransportConfiguration(pool_maxsize=32, accept_encoding="gzip", compress_requests=True, compress_min_bytes=100)
+    aerie_host = AerieHost("", "", session, transport=transport)
+
+    assert session.adapters["https://"]._pool_maxsize == 32
+
+    # Small requests aren't compressed
+    aerie_host.post_to_graphql("query { plan { id } }")
+    assert session.posts[0]["headers"]["Accept-Encoding"] == "gzip"
+    assert "Content-Encoding" not in session.posts[0]["headers"]
+    assert json.loads(session.posts[0]["data"]) == {"query": "query { plan { id } }", "variables": {}}
+
+    aerie_host.post_to_graphql("query { plan { id } }", padding="x" * 100)
+    assert session.posts[1]["headers"]["Content-Encoding"] == "gzip"
+    assert json.loads(gzip.decompress(session.posts[1]["data"]))["variables"] == {"padding": "x" * 100}
+
+
+def test_transport_configuration_from_dict():
+    config = {
+        "name": "a",
+        "graphql_url": "http://a.com",
+        "gateway_url": "http://a.com",
+        "transport": {"pool_maxsize": 32, "compress_requests": True},
+    }
+    configuration = AerieHostConfiguration.from_dict(config)
+
+    assert configuration.transport.pool_maxsize == 32
+    assert configuration.transport.compress_requests
+    assert AerieHostConfiguration.from_dict(configuration.to_dict()) == configuration
+
+    with pytest.raises(ValueError):
+        TransportConfiguration.from_dict({"pool_maxsize": 0})
+    with pytest.raises(ValueError):
+        TransportConfiguration.from_dict({"not_a_field": 1})
+
+
+class FlakySession(RecordingSession):
+    """Mock session which responds to each post with the next of a list of responses"""
+
+    def __init__(self, responses) -> None:
+        super().__init__(None)
+        self.responses = responses
+
+    def post(self, *args, **kwargs) -> MockResponse:
+        self.posts.append(kwargs)
+        return self.responses.pop(0)
+
+
+def test_post_to_graphql_retry():
+    events = []
+    delays = []
+    retry_policy = RetryPolicy(on_retry=events.append, sleep=delays.append)
+
+    session = FlakySession([
+        MockResponse(None, ok=False, status_code=502),
+        MockResponse(None, ok=False, status_code=503, headers={"Retry-After": "7"}),
+        MockResponse({"data": {"plan": []}}),
+    ])
+    aerie_host = AerieHost("", "", session, retry_policy=retry_policy)
+
+    assert aerie_host.post_to_graphql("query { plan { id } }") == []
+    assert [(e.attempt, e.status_code) for e in events] == [(1, 502), (2, 503)]
+    assert delays[0] <= retry_policy.base_delay
+    assert delays[1] == 7
+
+    # Mutations aren't retried by default
+    session = FlakySession([MockResponse(None, ok=False, status_code=502, text="")])
+    aerie_host = AerieHost("", "", session, retry_policy=retry_policy)
+    with pytest.raises(Exception):
+        aerie_host.post_to_graphql("mutation { delete_plan(where: {}) { affected_rows } }")
+    assert len(session.posts) == 1
+
+
+
+def test_post_to_gateway_files_retry():
+    retry_policy = RetryPolicy(retry_mutations=True, sleep=lambda delay: None)
+    session = FlakySession([MockResponse(None, ok=False, status_code=502), MockResponse({"id": 1})])
+    aerie_host = AerieHost("", "", session, retry_policy=retry_policy)
+
+    # File objects are read once, so the retried upload sends the whole file again
+    assert aerie_host.post_to_gateway_files("model.jar", BytesIO(b"model")) == {"id": 1}
+    assert [post["files"]["file"] for post in session.posts] == [("model.jar", b"model")] * 2
+
+def make_encoded_jwt(exp: datetime = None) -> str:
+    payload = {
+        "https://hasura.io/jwt/claims": {"x-hasura-allowed-roles": ["viewer"], "x-hasura-default-role": "viewer"},
+        "username": "user",
+    }
+    if exp is not None:
+        payload["exp"] = int(exp.timestamp())
+    return "header." + b64encode(json.dumps(payload).encode()).decode().rstrip("=") + ".signature"
+
+
+def test_jwt_expiration():
+    assert AerieJWT(make_encoded_jwt()).expiration is None
+    assert not AerieJWT(make_encoded_jwt()).expires_within(timedelta(days=365))
+
+    jwt = AerieJWT(make_encoded_jwt(datetime.now(timezone.utc) + timedelta(minutes=10)))
+    assert not jwt.expires_within(timedelta(minutes=5))
+    assert jwt.expires_within(timedelta(minutes=15))
+
+
+def test_is_recently_verified():
+    aerie_host = get_mock_aerie_host(json={"success": True})
+    window = timedelta(minutes=5)
+    assert not aerie_host.is_recently_verified(window)
+
+    aerie_host.aerie_jwt = AerieJWT(make_encoded_jwt(datetime.now(timezone.utc) + timedelta(hours=1)))
+    assert aerie_host.check_auth()
+    assert aerie_host.is_recently_verified(window)
+
+    aerie_host.last_verified -= window
+    assert not aerie_host.is_recently_verified(window)
+
+    # Expiring tokens aren't trusted
+    aerie_host.check_auth()
+    aerie_host.aerie_jwt = AerieJWT(make_encoded_jwt(datetime.now(timezone.utc) + timedelta(minutes=1)))
+    assert not aerie_host.is_recently_verified(window)
+
+
+def test_post_to_graphql_unauthorized():
+    jwt_error = {"errors": [{"extensions": {"code": "invalid-jwt"}, "message": "Could not verify JWT: JWTExpired"}]}
+
+    # Session fails re-verification
+    session = FlakySession([MockResponse(jwt_error)])
+    aerie_host = AerieHost("", "", session)
+    aerie_host.aerie_jwt = AerieJWT(make_encoded_jwt())
+    aerie_host.last_verified = datetime.now(timezone.utc)
+    with pytest.raises(AerieAuthenticationError):
+        aerie_host.post_to_graphql("query { plan { id } }")
+    assert aerie_host.last_verified is None
+
+    # Session passes re-verification, so the request is retried once
+    session = FlakySession([
+        MockResponse(None, ok=False, status_code=401, text=""),
+        MockResponse({"data": {"plan": [{"id": 1}]}}),
+    ])
+    session.mock_response = MockResponse({"success": True})
+    aerie_host = AerieHost("", "", session)
+    aerie_host.aerie_jwt = AerieJWT(make_encoded_jwt())
+    assert aerie_host.post_to_graphql("query { plan { id } }") == [{"id": 1}]
+    assert len(session.posts) == 2
+    assert aerie_host.last_verified is not None
+
+    # A second rejection isn't retried again
+    session = FlakySession([
+        MockResponse(None, ok=False, status_code=401, text=""),
+        MockResponse(None, ok=False, status_code=401, text=""),
+    ])
+    session.mock_response = MockResponse({"success": True})
+    aerie_host = AerieHost("", "", session)
+    aerie_host.aerie_jwt = AerieJWT(make_encoded_jwt())
+    with pytest.raises(Exception) as e:
+        aerie_host.post_to_graphql("query { plan { id } }")
+    assert not isinstance(e.value, AerieAuthenticationError)
+    assert len(session.posts) == 2
+
+
+def test_post_to_gateway_files_unauthorized():
+    session = FlakySession([
+        MockResponse(None, ok=False, status_code=401, text=""),
+        MockResponse({"id": 1}),
+    ])
+    session.mock_response = MockResponse({"success": True})
+    aerie_host = AerieHost("", "", session)
+    aerie_host.aerie_jwt = AerieJWT(make_encoded_jwt())
+    # The retried upload sends the whole file again, not what's left of a file object
+    assert aerie_host.post_to_gateway_files("model.jar", BytesIO(b"model")) == {"id": 1}
+    assert [post["files"]["file"] for post in session.posts] == [("model.jar", b"model")] * 2
+
+
+def test_post_to_graphql_cache(tmp_path):
+    policy = QueryCachePolicy("models", timedelta(minutes=1), ["mission_model"])
+    session = FlakySession([
+        MockResponse({"data": {"mission_model": [{"id": 1}]}}),
+        MockResponse({"data": {"mission_model": [{"id": 2}]}}),
+        MockResponse({"data": {"delete_mission_model_by_pk": {"id": 1}}}),
+        MockResponse({"data": {"mission_model": [{"id": 2}]}}),
+        MockResponse({"data": {"mission_model": [{"id": 2}]}}),
+    ])
+    aerie_host = AerieHost("", "", session)
+    aerie_host.query_cache = QueryCache(tmp_path.joinpath("cache.sqlite"))
+    query = "query Models($id: Int!) { mission_model(where: {id: {_gte: $id}}) { id } }"
+
+    # Repeated queries are served from the cache, and differing variables or roles aren't
+    assert aerie_host.post_to_graphql(query, cache_policy=policy, id=1) == [{"id": 1}]
+    assert aerie_host.post_to_graphql(query, cache_policy=policy, id=1) == [{"id": 1}]
+    assert aerie_host.post_to_graphql(query, cache_policy=policy, id=2) == [{"id": 2}]
+    assert len(session.posts) == 2
+
+    # Mutations on the cached table invalidate the cache
+    aerie_host.post_to_graphql("mutation { delete_mission_model_by_pk(id: 1) { id } }")
+    assert aerie_host.post_to_graphql(query, cache_policy=policy, id=1) == [{"id": 2}]
+    assert len(session.posts) == 4
+
+    aerie_host.active_role = "viewer"
+    aerie_host.post_to_graphql(query, cache_policy=policy, id=1)
+    assert len(session.posts) == 5
+    aerie_host.query_cache.close()
+
+
+def test_post_to_graphql_cache_empty(tmp_path):
+    policy = QueryCachePolicy("types", timedelta(minutes=1), ["activity_type"], cache_empty=False)
+    session = FlakySession([
+        MockResponse({"data": {"activity_type": []}}),
+        MockResponse({"data": {"activity_type": [{"name": "A"}]}}),
+    ])
+    aerie_host = AerieHost("", "", session)
+    aerie_host.query_cache = QueryCache(tmp_path.joinpath("cache.sqlite"))
+    query = "query { activity_type { name } }"
+
+    # Empty results aren't cached, e.g. before Aerie has extracted a new model's types
+    assert aerie_host.post_to_graphql(query, cache_policy=policy) == []
+    assert aerie_host.post_to_graphql(query, cache_policy=policy) == [{"name": "A"}]
+    assert aerie_host.post_to_graphql(query, cache_policy=policy) == [{"name": "A"}]
+    assert len(session.posts) == 2
+    aerie_host.query_cache.close()
+
+
+def test_post_to_graphql_null_field():
+    aerie_host = get_mock_aerie_host(json={"data": {"a0": {"id": 1}, "a1": None}})
+
+    # Nullable fields, e.g. lookups by primary key, are returned as None from queries with many fields
+    assert aerie_host.post_to_graphql_multiple("query { a0: plan_by_pk(id: 1) { id } a1: plan_by_pk(id: 2) { id } }") \
+        == {"a0": {"id": 1}, "a1": None}
+
+    aerie_host = get_mock_aerie_host(json={"data": {"plan_by_pk": None}})
+    with pytest.raises(RuntimeError):
+        aerie_host.post_to_graphql("query { plan_by_pk(id: 2) { id } }")
@@ -0,0 +1,117 @@
+import asyncio
+import inspect
+import json
+import threading
+import time
+
+from aerie_cli.aerie_client import AerieClient
+from aerie_cli.aerie_host import AerieHost
+from aerie_cli.aerie_host import TransportConfiguration
+from aerie_cli.async_aerie_client import AsyncAerieClient
+from aerie_cli.async_aerie_client import AsyncAerieHost
+
+from .test_aerie_client import EXPECTED_RESULTS_DIRECTORY
+from .test_aerie_client import MockAerieHost
+
+
+class SlowAerieHost(MockAerieHost):
+    """Mock host which records how many requests are in flight at once"""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def post_to_graphql(self, query: str, **kwargs):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.02)
+        with self.lock:
+            self.in_flight -= 1
+        return kwargs["value"]
+
+
+def run(coroutine):
+    # asyncio.run doesn't exist in Python 3.6
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_async_client_mirrors_client():
+    for name, method in inspect.getmembers(AerieClient, inspect.isfunction):
+        if name.startswith("_") or name == "map_concurrently":
+            continue
+        assert inspect.iscoroutinefunction(getattr(AsyncAerieClient, name))
+        assert inspect.signature(getattr(AsyncAerieClient, name)) == inspect.signature(method)
+
+
+def test_async_get_resource_samples():
+    with open(EXPECTED_RESULTS_DIRECTORY.joinpath('get_resource_samples_1.json'), 'r') as fid:
+        expected_1 = json.load(fid)
+    with open(EXPECTED_RESULTS_DIRECTORY.joinpath('get_resource_samples_2.json'), 'r') as fid:
+        expected_2 = json.load(fid)
+
+    async def get_samples():
+        async with AsyncAerieClient(MockAerieHost('get_resource_samples_1')) as client_1, \
+                AsyncAerieClient(MockAerieHost('get_resource_samples_2')) as client_2:
+            return await asyncio.gather(
+                client_1.get_resource_samples(1),
+                client_2.get_resource_samples(1, ["hardwareState"]),
+            )
+
+    assert run(get_samples()) == [expected_1, expected_2]
+
+
+def test_async_host_connection_limit():
+    aerie_host = SlowAerieHost()
+
+    async def post_all():
+        async with AsyncAerieHost(aerie_host, max_connections=3) as async_host:
+            return await asyncio.gather(*[async_host.post_to_graphql("", value=i) for i in range(12)])
+
+    assert run(post_all()) == list(range(12))
+    assert 1 < aerie_host.max_in_flight <= 3
+
+
+def test_async_host_keeps_transport_configuration():
+    aerie_host = AerieHost("http://localhost:8080/v1/graphql", "http://localhost:9000")
+    aerie_host.configure_transport(TransportConfiguration(pool_connections=3, pool_maxsize=4))
+    configured_adapter = aerie_host.session.get_adapter("http://localhost:8080")
+
+    # Pools already large enough are kept
+    AsyncAerieHost(aerie_host, max_connections=4).close()
+    assert aerie_host.session.get_adapter("http://localhost:8080") is configured_adapter
+
+    # Larger pools keep the configured number of pools
+    AsyncAerieHost(aerie_host, max_connections=16).close()
+    adapter = aerie_host.session.get_adapter("http://localhost:8080")
+    assert adapter._pool_connections == 3
+    assert adapter._pool_maxsize == 16
+
+
+def test_async_client_limits_requests_not_calls():
+    aerie_host = SlowAerieHost()
+
+    async def run_all():
+        async with AsyncAerieClient(aerie_host, max_connections=2) as client:
+            # Requests made concurrently within a method share the connection limit
+            client.client.max_workers = 12
+            values = await client.aerie_host.run(
+                client.client.map_concurrently,
+                lambda i: client.client.aerie_host.post_to_graphql("", value=i),
+                range(12),
+            )
+
+            # Calls which mostly wait, e.g. polling for simulations, don't hold connections
+            start = time.monotonic()
+            await asyncio.gather(*[client.aerie_host.run(time.sleep, 0.1) for _ in range(8)])
+            return values, time.monotonic() - start
+
+    values, wait_duration = run(run_all())
+    assert values == list(range(12))
+    assert 1 < aerie_host.max_in_flight <= 2
+    assert wait_duration < 0.4
@@ -0,0 +1,111 @@
+import threading
+from pathlib import Path
+from typing import Dict
+
+import pytest
+
+from aerie_cli.aerie_host import AerieAuthenticationError
+from aerie_cli.aerie_host import AerieHost
+from aerie_cli.daemon import AerieDaemon
+from aerie_cli.daemon import DaemonAerieHost
+from aerie_cli.daemon import DaemonUnavailableError
+from aerie_cli.daemon import call_daemon
+from aerie_cli.daemon import is_daemon_running
+from aerie_cli.persistent import NoActiveSessionError
+
+
+class EchoAerieHost(AerieHost):
+    """Mock host which echoes requests back"""
+
+    def __init__(self, name: str) -> None:
+        super().__init__("http://localhost/v1/graphql", "http://localhost:9000", configuration_name=name)
+        self.active_role = "viewer"
+
+    def post_to_graphql_multiple(self, query: str, **kwargs) -> Dict:
+        if query == "unauthorized":
+            raise AerieAuthenticationError("Session is no longer authenticated")
+        return {"echo": {"query": query, "variables": kwargs}}
+
+    def post_to_gateway_files(self, file_name: str, file_contents: bytes) -> Dict:
+        return {"name": file_name, "size": len(file_contents)}
+
+    def check_auth(self) -> bool:
+        return True
+
+
+class MockDaemon(AerieDaemon):
+    """Daemon with in-memory sessions, where each session's stamp changes when it's re-activated"""
+
+    def __init__(self, socket_path: Path) -> None:
+        super().__init__(socket_path)
+        self.stamps = {"default": 1}
+        self.loads = []
+
+    def _session_stamp(self, name: str):
+        return self.stamps.get(name)
+
+    def _load_session(self, name: str) -> AerieHost:
+        if name not in self.stamps:
+            raise NoActiveSessionError
+        self.loads.append(name)
+        return EchoAerieHost(f"{name}-{self.stamps[name]}")
+
+
+@pytest.fixture
+def daemon(tmp_path: Path):
+    daemon = MockDaemon(tmp_path.joinpath("d.sock"))
+    thread = threading.Thread(target=daemon.serve_forever)
+    thread.start()
+    for _ in range(200):
+        if is_daemon_running(daemon.socket_path):
+            break
+        threading.Event().wait(0.01)
+    yield daemon
+    daemon.shutdown()
+    thread.join()
+
+
+def test_daemon_forwards_requests(daemon: MockDaemon):
+    host = DaemonAerieHost.connect("default", daemon.socket_path)
+
+    assert host.configuration_name == "default-1"
+    assert host.active_role == "viewer"
+    assert host.post_to_graphql("query { x }", a=1) == {"query": "query { x }", "variables": {"a": 1}}
+    assert host.post_to_gateway_files("f.jar", b"\x00\x01\x02") == {"name": "f.jar", "size": 3}
+    assert host.check_auth()
+
+    with pytest.raises(AerieAuthenticationError):
+        host.post_to_graphql("unauthorized")
+
+    # Sessions are loaded once and reused
+    assert daemon.loads == ["default"]
+
+
+def test_daemon_forwards_file_uploads(daemon: MockDaemon, tmp_path: Path):
+    host = DaemonAerieHost.connect("default", daemon.socket_path)
+    path = tmp_path.joinpath("model.jar")
+    path.write_bytes(b"\x00\x01\x02\x03")
+
+    # Uploads from AerieClient pass an open file
+    with open(path, "rb") as fid:
+        assert host.post_to_gateway_files("model.jar", fid) == {"name": "model.jar", "size": 4}
+
+
+def test_daemon_reloads_changed_sessions(daemon: MockDaemon):
+    assert DaemonAerieHost.connect("default", daemon.socket_path).configuration_name == "default-1"
+    daemon.stamps["default"] = 2
+    assert DaemonAerieHost.connect("default", daemon.socket_path).configuration_name == "default-2"
+
+    with pytest.raises(NoActiveSessionError):
+        DaemonAerieHost.connect("other", daemon.socket_path)
+
+    with pytest.raises(ValueError):
+        call_daemon({"method": "unknown", "session": "default"}, daemon.socket_path)
+
+
+def test_daemon_unavailable(tmp_path: Path):
+    socket_path = tmp_path.joinpath("missing.sock")
+
+    assert not is_daemon_running(socket_path)
+    with pytest.raises(DaemonUnavailableError):
+        DaemonAerieHost.connect("default", socket_path)
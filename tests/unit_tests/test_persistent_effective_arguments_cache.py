@@ -0,0 +1,94 @@
+import sqlite3
+from pathlib import Path
+
+from aerie_cli.persistent import EffectiveArgumentsCache
+from aerie_cli.persistent import hash_activity_arguments
+
+HOST = "http://localhost:8080/v1/graphql"
+OTHER_HOST = "http://other:8080/v1/graphql"
+
+
+def test_hash_activity_arguments():
+    assert hash_activity_arguments({"a": 1, "b": [1, 2]}) == hash_activity_arguments({"b": [1, 2], "a": 1})
+    assert hash_activity_arguments({"a": 1}) != hash_activity_arguments({"a": 2})
+
+
+def test_effective_arguments_cache(tmp_path: Path):
+    path = tmp_path.joinpath("cache.sqlite")
+    cache = EffectiveArgumentsCache(path)
+
+    assert cache.get_many(HOST, 1, 10, [("A", {"x": 1})]) == [None]
+
+    cache.put_many(HOST, 1, 10, [("A", {"x": 1}, {"x": 1, "y": 0}), ("B", {}, {"z": "default"})])
+    assert cache.get_many(HOST, 1, 10, [("A", {"x": 1}), ("A", {"x": 2}), ("B", {})]) == [
+        {"x": 1, "y": 0},
+        None,
+        {"z": "default"},
+    ]
+
+    # Entries persist across instances
+    cache.close()
+    cache = EffectiveArgumentsCache(path)
+    assert cache.get_many(HOST, 1, 10, [("B", {})]) == [{"z": "default"}]
+
+    # A new JAR for the model invalidates its entries
+    assert cache.get_many(HOST, 1, 11, [("B", {})]) == [None]
+    assert cache.get_many(HOST, 1, 10, [("B", {})]) == [None]
+    cache.close()
+
+
+def test_effective_arguments_cache_hosts(tmp_path: Path):
+    cache = EffectiveArgumentsCache(tmp_path.joinpath("cache.sqlite"))
+
+    # Model and JAR IDs from different hosts don't collide, and a JAR update on one host doesn't evict the other's
+    cache.put_many(HOST, 1, 10, [("A", {}, {"a": 0})])
+    cache.put_many(OTHER_HOST, 1, 11, [("A", {}, {"a": 1})])
+    assert cache.get_many(HOST, 1, 10, [("A", {})]) == [{"a": 0}]
+    assert cache.get_many(OTHER_HOST, 1, 11, [("A", {})]) == [{"a": 1}]
+    assert cache.get_many(HOST, 1, 10, [("A", {})]) == [{"a": 0}]
+    cache.close()
+
+
+def test_effective_arguments_cache_eviction(tmp_path: Path):
+    cache = EffectiveArgumentsCache(tmp_path.joinpath("cache.sqlite"), max_entries=2)
+
+    cache.put_many(HOST, 1, 10, [("A", {}, {"a": 0})])
+    cache.put_many(HOST, 1, 10, [("B", {}, {"b": 0})])
+
+    # Use A so that B is the least recently used
+    cache.get_many(HOST, 1, 10, [("A", {})])
+    cache.put_many(HOST, 1, 10, [("C", {}, {"c": 0})])
+
+    assert cache.get_many(HOST, 1, 10, [("A", {}), ("B", {}), ("C", {})]) == [{"a": 0}, None, {"c": 0}]
+    cache.close()
+
+
+def test_effective_arguments_cache_corrupt_file(tmp_path: Path):
+    path = tmp_path.joinpath("cache.sqlite")
+    with open(path, "w") as fid:
+        fid.write("not a database")
+
+    cache = EffectiveArgumentsCache(path)
+    assert cache.get_many(HOST, 1, 10, [("A", {})]) == [None]
+    cache.close()
+
+
+def test_effective_arguments_cache_without_hosts(tmp_path: Path):
+    # Entries cached by earlier versions aren't keyed by host, so they're discarded
+    path = tmp_path.joinpath("cache.sqlite")
+    connection = sqlite3.connect(str(path))
+    with connection:
+        connection.execute(
+            "CREATE TABLE effective_arguments (model_id INTEGER, jar_id INTEGER, activity_type TEXT, "
+            "arguments_hash TEXT, effective_arguments TEXT, last_used INTEGER)"
+        )
+        connection.execute(
+            "INSERT INTO effective_arguments VALUES (1, 10, 'A', ?, '{}', 1)", (hash_activity_arguments({}),)
+        )
+    connection.close()
+
+    cache = EffectiveArgumentsCache(path)
+    assert cache.get_many(HOST, 1, 10, [("A", {})]) == [None]
+    cache.put_many(HOST, 1, 10, [("A", {}, {"a": 0})])
+    assert cache.get_many(HOST, 1, 10, [("A", {})]) == [{"a": 0}]
+    cache.close()
@@ -0,0 +1,129 @@
+import sqlite3
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from aerie_cli.persistent import QueryCache
+from aerie_cli.utils.query_cache import QueryCachePolicy
+
+MODELS = QueryCachePolicy("models", timedelta(minutes=1), ["mission_model"])
+RULES = QueryCachePolicy("rules", timedelta(minutes=1), ["expansion_rule"])
+HOST = "http://localhost:8080/v1/graphql"
+
+
+def test_query_cache(tmp_path: Path):
+    path = tmp_path.joinpath("cache.sqlite")
+    cache = QueryCache(path)
+
+    assert cache.get("models") is None
+
+    cache.put(HOST, "models", MODELS, {"mission_model": [{"id": 1}]})
+    cache.put(HOST, "rules", RULES, {"expansion_rule": []})
+    assert cache.get("models") == {"mission_model": [{"id": 1}]}
+
+    # Cached data can't be modified through results
+    cache.get("models")["mission_model"].append({"id": 2})
+    assert cache.get("models") == {"mission_model": [{"id": 1}]}
+
+    # Entries persist across instances
+    cache.close()
+    cache = QueryCache(path)
+    assert cache.get("models") == {"mission_model": [{"id": 1}]}
+
+    # Refreshing caches new results without using old ones
+    refreshing_cache = QueryCache(path, refresh=True)
+    assert refreshing_cache.get("models") is None
+    refreshing_cache.put(HOST, "models", MODELS, {"mission_model": []})
+    refreshing_cache.close()
+    assert QueryCache(path).get("models") == {"mission_model": []}
+    cache.close()
+
+
+def test_query_cache_invalidation(tmp_path: Path):
+    path = tmp_path.joinpath("cache.sqlite")
+    cache = QueryCache(path)
+    other_cache = QueryCache(path)
+
+    cache.put(HOST, "models", MODELS, {"mission_model": []})
+    cache.put(HOST, "rules", RULES, {"expansion_rule": []})
+    assert other_cache.get("models") == {"mission_model": []}
+
+    # Invalidation applies to every instance's persistent entries
+    other_cache.invalidate(HOST, "mutation D { delete_mission_model_by_pk(id: 1) { id } }")
+    assert other_cache.get("models") is None
+    assert QueryCache(path).get("models") is None
+    assert cache.get("rules") == {"expansion_rule": []}
+
+    cache.clear()
+    assert cache.get("rules") is None
+    cache.close()
+    other_cache.close()
+
+
+def test_query_cache_expiration(tmp_path: Path):
+    cache = QueryCache(tmp_path.joinpath("cache.sqlite"))
+
+    policy = QueryCachePolicy("models", timedelta(seconds=0.05), ["mission_model"])
+    cache.put(HOST, "models", policy, {"mission_model": []})
+    assert cache.get("models") == {"mission_model": []}
+
+    time.sleep(0.1)
+    assert cache.get("models") is None
+    cache.close()
+
+
+def test_query_cache_corrupt_file(tmp_path: Path):
+    path = tmp_path.joinpath("cache.sqlite")
+    with open(path, "w") as fid:
+        fid.write("not a database")
+
+    cache = QueryCache(path)
+    assert cache.get("models") is None
+    cache.close()
+
+
+
+def test_query_cache_invalidation_by_host(tmp_path: Path):
+    path = tmp_path.joinpath("cache.sqlite")
+    cache = QueryCache(path)
+    other_host = "http://other:8080/v1/graphql"
+
+    cache.put(HOST, "models", MODELS, {"mission_model": []})
+    cache.put(other_host, "other_models", MODELS, {"mission_model": []})
+
+    # Mutations only invalidate results from the host they were sent to
+    cache.invalidate(HOST, "mutation D { delete_mission_model_by_pk(id: 1) { id } }")
+    assert cache.get("models") is None
+    assert cache.get("other_models") == {"mission_model": []}
+    assert QueryCache(path).get("other_models") == {"mission_model": []}
+    cache.close()
+
+
+def test_query_cache_legacy_table(tmp_path: Path):
+    path = tmp_path.joinpath("cache.sqlite")
+    connection = sqlite3.connect(str(path))
+    with connection:
+        connection.execute("CREATE TABLE query_results (key TEXT PRIMARY KEY, tables TEXT, expires_at REAL, data TEXT)")
+        connection.execute("INSERT INTO query_results VALUES ('models', '[]', 1e12, '{}')")
+    connection.close()
+
+    # Results cached before they were keyed by host are discarded
+    cache = QueryCache(path)
+    assert cache.get("models") is None
+    cache.put(HOST, "models", MODELS, {"mission_model": []})
+    assert cache.get("models") == {"mission_model": []}
+    cache.close()
+
+
+def test_query_cache_database_errors(tmp_path: Path):
+    cache = QueryCache(tmp_path.joinpath("cache.sqlite"))
+    cache.put(HOST, "models", MODELS, {"mission_model": []})
+
+    # Database failures fall back to the in-memory entries
+    cache._connection.close()
+    assert cache.get("models") == {"mission_model": []}
+    assert cache.get("rules") is None
+    cache.put(HOST, "rules", RULES, {"expansion_rule": []})
+    assert cache.get("rules") == {"expansion_rule": []}
+    cache.invalidate(HOST, "mutation D { delete_expansion_rule_by_pk(id: 1) { id } }")
+    assert cache.get("rules") is None
@@ -1,6 +1,7 @@
 import pytest
-import pickle
+import json
 import datetime
+import multiprocessing
 from pathlib import Path
 
 from aerie_cli import persistent
@@ -15,24 +16,50 @@ class MockAerieHost(AerieHost):
     """
 
     def __init__(self, ping_success: bool = True, name: str = "Test") -> None:
+        super().__init__("Test", "Test", configuration_name=name)
         self.ping_success = ping_success
-        self.configuration_name = name
-        self.graphql_url = "Test"
-        self.gateway_url = "Test"
 
     def check_auth(self) -> bool:
         return self.ping_success
 
+
 @pytest.fixture
-def persistent_path(tmp_path: Path):
+def persistent_path(tmp_path: Path, monkeypatch):
 
     # Set the path the session manager uses
-    persistent.SESSION_FILE_DIRECTORY = tmp_path
+    monkeypatch.setattr(persistent, "SESSION_FILE_DIRECTORY", tmp_path)
 
     # Set session manager to initial state
-    PersistentSessionManager._active_session = None
+    monkeypatch.setattr(PersistentSessionManager, "_active_session", None)
+    monkeypatch.setattr(PersistentSessionManager, "session_name", persistent.DEFAULT_SESSION_NAME)
+
+    # Loaded sessions pass the ping test unless a test says otherwise
+    monkeypatch.setattr(AerieHost, "check_auth", lambda self: True)
+
+    return tmp_path.joinpath("sessions")
 
-    return tmp_path
+
+def write_session(
+    persistent_path: Path,
+    name: str = persistent.DEFAULT_SESSION_NAME,
+    age: datetime.timedelta = datetime.timedelta(0),
+    configuration_name: str = "Test",
+    version: int = persistent.SESSION_FORMAT_VERSION,
+) -> Path:
+    """
+    Write a session file as if saved by another process
+    """
+    persistent_path.mkdir(parents=True, exist_ok=True)
+    updated_at = datetime.datetime.now(datetime.timezone.utc) - age
+    contents = {
+        "version": version,
+        "updated_at": updated_at.timestamp(),
+        "session": MockAerieHost(name=configuration_name).to_dict(),
+    }
+    session_file = persistent_path.joinpath(name + persistent.SESSION_FILE_SUFFIX)
+    with open(session_file, 'w') as fid:
+        json.dump(contents, fid)
+    return session_file
 
 
 def test_get_session_empty(persistent_path: Path):
@@ -49,105 +76,119 @@ def test_get_session_expired(persistent_path: Path):
     Test loading a persistent session with an expired timestamp
     """
 
-    # Create a mock old session with an "expired" session
-    old_session = MockAerieHost()
-    old_time = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None) - persistent.SESSION_TIMEOUT - \
-        datetime.timedelta(seconds=1)
-    old_fn = old_time.strftime(
-        persistent.SESSION_TIMESTAMP_FSTRING) + '.aerie_cli.session'
-    with open(persistent_path.joinpath(old_fn), 'wb') as fid:
-        pickle.dump(old_session, fid)
+    session_file = write_session(persistent_path, age=persistent.SESSION_TIMEOUT + datetime.timedelta(seconds=1))
 
     # Expect this to fail
     with pytest.raises(persistent.NoActiveSessionError):
         PersistentSessionManager.get_active_session()
+    assert not session_file.exists()
 
 
-def test_get_session_broken(persistent_path: Path):
+def test_get_session_broken(persistent_path: Path, monkeypatch):
     """
     Test loading a persistent session which fails to ping the gateway
     """
 
-    # Create a mock old session which fails the ping test
-    old_session = MockAerieHost(False)
-    old_time = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
-    old_fn = old_time.strftime(
-        persistent.SESSION_TIMESTAMP_FSTRING) + '.aerie_cli.session'
-    with open(persistent_path.joinpath(old_fn), 'wb') as fid:
-        pickle.dump(old_session, fid)
+    session_file = write_session(persistent_path)
+    monkeypatch.setattr(AerieHost, "check_auth", lambda self: False)
 
     # Expect this to fail
     with pytest.raises(persistent.NoActiveSessionError):
         PersistentSessionManager.get_active_session()
+    assert not session_file.exists()
+
+
+def test_get_session_corrupt(persistent_path: Path):
+    """
+    Test loading a persistent session file which isn't valid
+    """
+
+    persistent_path.mkdir(parents=True)
+    session_file = persistent_path.joinpath(persistent.DEFAULT_SESSION_NAME + persistent.SESSION_FILE_SUFFIX)
+    session_file.write_text('{"version": 1, "session"')
+
+    with pytest.raises(persistent.NoActiveSessionError):
+        PersistentSessionManager.get_active_session()
+    assert not session_file.exists()
+
+
+def test_get_session_newer_version(persistent_path: Path):
+    """
+    Test loading a session saved by a newer version of aerie-cli, which must be left intact
+    """
+
+    session_file = write_session(persistent_path, version=persistent.SESSION_FORMAT_VERSION + 1)
+
+    with pytest.raises(RuntimeError):
+        PersistentSessionManager.get_active_session()
+    assert session_file.exists()
 
 
 def test_get_session(persistent_path: Path):
     """
     Test loading a valid persistent session.
-    Only one file in the session directory.
     """
 
-    # Create a mock good session
-    old_session = MockAerieHost()
-    old_time = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
-    old_fn = old_time.strftime(
-        persistent.SESSION_TIMESTAMP_FSTRING) + '.aerie_cli.session'
-    with open(persistent_path.joinpath(old_fn), 'wb') as fid:
-        pickle.dump(old_session, fid)
+    write_session(persistent_path, configuration_name="Saved")
 
     # Expect this to pass
     s = PersistentSessionManager.get_active_session()
     assert isinstance(s, AerieHost)
+    assert s.configuration_name == "Saved"
+    assert s.graphql_url == "Test"
 
 
-def test_get_session_multiple(persistent_path: Path):
+def test_session_round_trip(persistent_path: Path):
     """
-    Test loading a valid persistent session.
-    Only one file in the session directory.
+    Test that credentials, role, and cookies survive saving and loading
     """
 
-    # Create a mock good session
-    for i in range(2):
-        old_session = MockAerieHost()
-        old_time = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None) - datetime.timedelta(minutes=i)
-        old_fn = old_time.strftime(
-            persistent.SESSION_TIMESTAMP_FSTRING) + '.aerie_cli.session'
-        with open(persistent_path.joinpath(old_fn), 'wb') as fid:
-            pickle.dump(old_session, fid)
+    session = MockAerieHost(name="Round Trip")
+    session.active_role = "viewer"
+    session.last_verified = datetime.datetime.now(datetime.timezone.utc)
+    session.session.cookies.set("token", "abc", domain="example.com", path="/")
+    assert PersistentSessionManager.set_active_session(session)
 
-    # Expect this to pass
+    PersistentSessionManager._active_session = None
     s = PersistentSessionManager.get_active_session()
-    assert isinstance(s, AerieHost)
 
-    # Check that the directory has been cleaned up
-    assert len(list(persistent_path.iterdir())) == 1
+    assert s.to_dict() == session.to_dict()
+    assert s.session.cookies.get("token", domain="example.com") == "abc"
 
 
-def test_set_session_broken(persistent_path: Path):
+def test_get_session_trusted(persistent_path: Path, monkeypatch):
     """
-    Test setting a single session that fails ping test
+    Test loading a recently-verified session, which is trusted without a gateway ping or re-writing the session file.
     """
-    session = MockAerieHost(False)
 
-    # Method should return false because it doesn't set the session
-    assert PersistentSessionManager.set_active_session(session) == False
+    session = MockAerieHost(name="Trusted")
+    session.last_verified = datetime.datetime.now(datetime.timezone.utc)
+    session.aerie_jwt = MockJWT()
+    monkeypatch.setattr(persistent.AerieHost, "from_dict", classmethod(lambda cls, state: session))
 
-    # Check that the directory is still empty
-    assert len(list(persistent_path.iterdir())) == 0
+    session_file = write_session(persistent_path)
+    contents = session_file.read_text()
 
+    def fail_ping(self):
+        raise AssertionError("Trusted sessions shouldn't be re-verified")
 
-def test_set_session(persistent_path: Path):
+    monkeypatch.setattr(AerieHost, "check_auth", fail_ping)
+
+    assert PersistentSessionManager.get_active_session() is session
+    assert session_file.read_text() == contents
+
+
+def test_set_session_broken(persistent_path: Path):
     """
-    Test setting a single session that passes the ping test. There isn't 
-    an active session.
+    Test setting a single session that fails ping test
     """
-    session = MockAerieHost()
+    session = MockAerieHost(False)
 
-    # Method should return true
-    assert PersistentSessionManager.set_active_session(session) == True
+    # Method should return false because it doesn't set the session
+    assert PersistentSessionManager.set_active_session(session) == False
 
-    # Check that the directory has a file in it
-    assert len(list(persistent_path.iterdir())) == 1
+    # Check that no session was saved
+    assert PersistentSessionManager.list_sessions() == []
 
 
 def test_set_session(persistent_path: Path):
@@ -163,8 +204,74 @@ def test_set_session(persistent_path: Path):
     # Method should return true
     assert PersistentSessionManager.set_active_session(session_2) == True
 
-    # Check that the directory still has only one file in it
-    assert len(list(persistent_path.iterdir())) == 1
+    # Check that the directory still has only one session in it, with no leftover temporary files
+    assert PersistentSessionManager.list_sessions() == [persistent.DEFAULT_SESSION_NAME]
+    assert sorted(f.name for f in persistent_path.iterdir()) == [
+        ".lock", persistent.DEFAULT_SESSION_NAME + persistent.SESSION_FILE_SUFFIX]
+
+
+def test_named_sessions(persistent_path: Path):
+    """
+    Test that named sessions are stored independently
+    """
+    PersistentSessionManager.set_session_name("job-1")
+    PersistentSessionManager.set_active_session(MockAerieHost(name="Host 1"))
+    PersistentSessionManager.set_session_name("job-2")
+    PersistentSessionManager.set_active_session(MockAerieHost(name="Host 2"))
+
+    assert PersistentSessionManager.list_sessions() == ["job-1", "job-2"]
+
+    PersistentSessionManager.set_session_name("job-1")
+    assert PersistentSessionManager.get_active_session().configuration_name == "Host 1"
+    assert PersistentSessionManager.unset_active_session() == "Host 1"
+
+    PersistentSessionManager.set_session_name("job-2")
+    assert PersistentSessionManager.get_active_session().configuration_name == "Host 2"
+    assert PersistentSessionManager.list_sessions() == ["job-2"]
+
+    with pytest.raises(ValueError):
+        PersistentSessionManager.set_session_name("../job")
+
+
+def _save_sessions(directory: str, name: str, count: int) -> None:
+    persistent.SESSION_FILE_DIRECTORY = Path(directory)
+    PersistentSessionManager.session_name = name
+    AerieHost.check_auth = lambda self: True
+    for i in range(count):
+        PersistentSessionManager.set_active_session(MockAerieHost(name=f"{name}-{i}"))
+
+
+def test_concurrent_processes(persistent_path: Path):
+    """
+    Test that processes saving sessions in parallel don't corrupt or delete each other's sessions
+    """
+    names = [f"job-{i}" for i in range(4)]
+    processes = [
+        multiprocessing.Process(target=_save_sessions, args=(str(persistent_path.parent), name, 20))
+        for name in names
+    ]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+        assert p.exitcode == 0
+
+    assert PersistentSessionManager.list_sessions() == names
+    for name in names:
+        PersistentSessionManager.set_session_name(name)
+        assert PersistentSessionManager.get_active_session().configuration_name == f"{name}-19"
+
+
+def test_legacy_sessions_removed(persistent_path: Path):
+    """
+    Test that pickled sessions from earlier versions are removed when a session is saved
+    """
+    legacy_file = persistent_path.parent.joinpath("2023-001T00-00-00.000000.aerie_cli.session")
+    legacy_file.write_bytes(b"")
+
+    PersistentSessionManager.set_active_session(MockAerieHost())
+
+    assert not legacy_file.exists()
 
 
 def test_unset_session_startup_clean(persistent_path: Path):
@@ -180,15 +287,10 @@ def test_unset_session_startup_persistent(persistent_path: Path):
     Test unsetting a session an a clean startup with a persistent session saved.
     """
 
-    # Create a mock good session
-    old_session = MockAerieHost(name="Old Session")
-    old_time = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
-    old_fn = old_time.strftime(
-        persistent.SESSION_TIMESTAMP_FSTRING) + '.aerie_cli.session'
-    with open(persistent_path.joinpath(old_fn), 'wb') as fid:
-        pickle.dump(old_session, fid)
+    session_file = write_session(persistent_path, configuration_name="Old Session")
 
     assert PersistentSessionManager.unset_active_session() == "Old Session"
+    assert not session_file.exists()
 
 
 def test_unset_session_active(persistent_path: Path):
@@ -199,3 +301,12 @@ def test_unset_session_active(persistent_path: Path):
     PersistentSessionManager.set_active_session(old_session)
 
     assert PersistentSessionManager.unset_active_session() == "Old Session"
+
+
+class MockJWT:
+    """JWT without an expiration"""
+
+    encoded_jwt = None
+
+    def expires_within(self, duration: datetime.timedelta) -> bool:
+        return False
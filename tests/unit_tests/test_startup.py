@@ -0,0 +1,41 @@
+import subprocess
+import sys
+
+import click
+import pytest
+
+from aerie_cli.app import AerieCliGroup
+from aerie_cli.utils.lazy_commands import load_typer_group
+
+# Heavy dependencies which shouldn't be imported until a sub-command needs them
+DEFERRED_MODULES = [
+    "numpy",
+    "arrow",
+    "requests",
+    "aerie_cli.aerie_client",
+    "aerie_cli.commands.plans",
+]
+
+
+def test_cli_startup_defers_imports():
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, aerie_cli.__main__; print(' '.join(sys.modules))",
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    loaded = set(result.stdout.split())
+    assert "aerie_cli.app" in loaded
+    assert not loaded & set(DEFERRED_MODULES)
+
+
+@pytest.mark.parametrize("name", sorted(AerieCliGroup.lazy_subcommands))
+def test_lazy_subcommands_resolve(name: str):
+    group = load_typer_group(AerieCliGroup.lazy_subcommands[name])
+    assert isinstance(group, click.Group)
+    assert group.list_commands(click.Context(group))
@@ -1,12 +1,35 @@
-from attrs import define, field
-from datetime import timedelta
+from attrs import define
+from io import StringIO
+import json
+import numpy as np
+from datetime import datetime, timedelta, timezone
 
 import pytest
+import requests
 
 from aerie_cli.utils.serialization import postgres_interval_to_microseconds
 from aerie_cli.utils.serialization import postgres_interval_to_timedelta
 from aerie_cli.utils.serialization import timedelta_to_postgres_interval
 from aerie_cli.utils.serialization import parse_timedelta_str
+from aerie_cli.utils.resource_samples import postgres_intervals_to_microseconds
+from aerie_cli.utils.resource_samples import ResourceTimeline
+from aerie_cli.utils.resource_samples import write_resource_timelines_csv
+from aerie_cli.utils.anchors import resolve_anchor_layers
+from aerie_cli.utils.anchors import AnchorResolutionError
+from aerie_cli.utils.concurrency import map_concurrently
+from aerie_cli.utils.concurrency import ConcurrentTaskError
+from aerie_cli.utils.json_stream import write_json_array
+from aerie_cli.utils.json_stream import write_ndjson
+from aerie_cli.utils.query_cache import QueryCachePolicy
+from aerie_cli.utils.query_cache import normalize_query
+from aerie_cli.utils.query_cache import query_cache_key
+from aerie_cli.utils.retry import RetryPolicy
+from aerie_cli.utils.retry import is_graphql_mutation
+from aerie_cli.utils.retry import parse_retry_after
+from aerie_cli.utils.subscriptions import SubscriptionUnavailableError
+from aerie_cli.utils.subscriptions import wait_for_subscription
+from aerie_cli.utils.subscriptions import websocket_url
+from aerie_cli.schemas.client import Activity
 
 
 @define
@@ -105,3 +128,320 @@ def test_parse_timedelta_str(example_duration: ExampleDuration):
         parse_timedelta_str(str(example_duration.as_timedelta))
         == example_duration.as_timedelta
     )
+
+
+def test_postgres_intervals_to_microseconds():
+    intervals = [c.as_postgres_output for c in TEST_CASES] * 2
+    expected = [c.as_microseconds for c in TEST_CASES] * 2
+
+    assert postgres_intervals_to_microseconds(intervals).tolist() == expected
+    assert postgres_intervals_to_microseconds([]).tolist() == []
+
+
+def test_write_resource_timelines_csv():
+    timelines = {
+        "a": ResourceTimeline("a", "real", np.array([0, 1000000, 1000000, 3000000]), np.array([0.0, 1.0, 2.0, 2.0])),
+        "b": ResourceTimeline("b", "discrete", np.array([500000, 3000000]), np.array(["ON", "ON"], dtype=object)),
+        "c": ResourceTimeline("c", "discrete", np.zeros(0, dtype=np.int64), np.zeros(0, dtype=object)),
+    }
+
+    fid = StringIO()
+    write_resource_timelines_csv(timelines, fid)
+
+    assert fid.getvalue() == "\n".join([
+        "Time (s),a,b,c",
+        "0.0,0.0,,",
+        "0.5,0.0,ON,",
+        "1.0,2.0,ON,",
+        "3.0,2.0,ON,",
+        "",
+    ])
+
+
+def test_write_resource_timelines_parquet(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    from aerie_cli.utils.columnar import write_resource_timelines
+
+    timelines = {
+        "a": ResourceTimeline("a", "real", np.array([0, 1000000]), np.array([0.0, 1.5])),
+        "b": ResourceTimeline("b", "discrete", np.array([0]), np.array([{"k": 1}], dtype=object)),
+    }
+    output = tmp_path.joinpath("resources.parquet")
+    write_resource_timelines(timelines, str(output), "parquet")
+
+    assert pq.ParquetFile(output).num_row_groups == 2
+    assert pq.read_table(output).to_pylist() == [
+        {"resource": "a", "offset": 0, "value": 0.0, "discrete_value": None},
+        {"resource": "a", "offset": 1000000, "value": 1.5, "discrete_value": None},
+        {"resource": "b", "offset": 0, "value": None, "discrete_value": '{"k": 1}'},
+    ]
+
+
+def test_write_simulated_activities_feather(tmp_path):
+    feather = pytest.importorskip("pyarrow.feather")
+    from aerie_cli.utils.columnar import write_simulated_activities
+
+    simulated_activities = [
+        {
+            "id": 1,
+            "simulation_dataset_id": 2,
+            "directive_id": 3,
+            "parent_id": None,
+            "activity_type_name": "NoOp",
+            "start_offset": "00:00:01.5",
+            "duration": "01:00:00",
+            "start_time": "2023-01-01T00:00:01.5+00:00",
+            "end_time": "2023-01-01T01:00:01.5+00:00",
+            "attributes": {"arguments": {}},
+        },
+        {
+            "id": 4,
+            "simulation_dataset_id": 2,
+            "directive_id": None,
+            "parent_id": 1,
+            "activity_type_name": "NoOp",
+            "start_offset": "00:00:02",
+            "duration": None,
+            "start_time": "2023-01-01T00:00:02+00:00",
+            "end_time": None,
+            "attributes": None,
+        },
+    ]
+    output = tmp_path.joinpath("activities.feather")
+    write_simulated_activities(simulated_activities, str(output), "feather")
+
+    table = feather.read_table(output)
+    assert table.schema.field("activity_type_name").type.value_type == "string"
+    rows = table.to_pylist()
+    assert [(r["id"], r["directive_id"], r["parent_id"]) for r in rows] == [(1, 3, None), (4, None, 1)]
+    assert [(r["start_offset"], r["duration"]) for r in rows] == [(1500000, 3600000000), (2000000, None)]
+    assert rows[0]["start_time"] == datetime(2023, 1, 1, 0, 0, 1, 500000, tzinfo=timezone.utc)
+    assert rows[1]["end_time"] is None
+    assert [r["attributes"] for r in rows] == ['{"arguments": {}}', None]
+
+
+def _directive(id: int, anchor_id: int = None) -> Activity:
+    return Activity(
+        type="NoOp",
+        start_offset=timedelta(0),
+        name=f"act{id}",
+        id=id,
+        anchor_id=anchor_id,
+        anchored_to_start=True,
+    )
+
+
+def test_resolve_anchor_layers():
+    activities = [
+        _directive(4, 3),
+        _directive(1),
+        _directive(3, 1),
+        _directive(2, 1),
+        _directive(5),
+    ]
+
+    layers = resolve_anchor_layers(activities)
+
+    assert [[a.id for a in layer] for layer in layers] == [[1, 5], [3, 2], [4]]
+    assert resolve_anchor_layers([]) == []
+
+
+def test_resolve_anchor_layers_unresolvable():
+    activities = [
+        _directive(1, 99),
+        _directive(2, 1),
+        _directive(3, 4),
+        _directive(4, 3),
+        _directive(5, 4),
+        _directive(6),
+    ]
+
+    with pytest.raises(AnchorResolutionError) as e:
+        resolve_anchor_layers(activities)
+
+    assert [a.id for a in e.value.missing_anchors] == [1, 2]
+    assert [a.id for a in e.value.cyclic_anchors] == [3, 4, 5]
+
+
+def _fail_on_odd(x: int) -> int:
+    if x % 2:
+        raise ValueError(f"odd: {x}")
+    return x * 10
+
+
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_map_concurrently(max_workers: int):
+    assert map_concurrently(lambda x: x * 10, range(20), max_workers) == [x * 10 for x in range(20)]
+    assert map_concurrently(lambda x: x, [], max_workers) == []
+
+    with pytest.raises(ValueError):
+        map_concurrently(_fail_on_odd, range(20), max_workers)
+
+    with pytest.raises(ConcurrentTaskError) as e:
+        map_concurrently(_fail_on_odd, range(6), max_workers, fail_fast=False)
+
+    assert [item for item, _ in e.value.errors] == [1, 3, 5]
+    assert all(isinstance(error, ValueError) for _, error in e.value.errors)
+    assert e.value.results == [0, None, 20, None, 40, None]
+
+
+@pytest.mark.parametrize("records", [[], [{}], [{"a": 1, "b": {"c": [1, 2]}}, {"a": None}]])
+def test_write_json_array(records):
+    fid = StringIO()
+    assert write_json_array(iter(records), fid) == len(records)
+    assert fid.getvalue() == json.dumps(records, indent=2)
+
+
+def test_write_ndjson():
+    records = [{"a": 1, "b": {"c": [1, 2]}}, {"a": "multi\nline"}]
+    fid = StringIO()
+    assert write_ndjson(iter(records), fid) == 2
+    lines = fid.getvalue().split("\n")
+    assert lines[-1] == ""
+    assert [json.loads(line) for line in lines[:-1]] == records
+
+
+def test_is_graphql_mutation():
+    assert is_graphql_mutation("mutation DeletePlan($id: Int!) { delete_plan_by_pk(id: $id) { id } }")
+    assert is_graphql_mutation("\n  # comment\n  mutation { x }")
+    assert not is_graphql_mutation("query { plan { id } }")
+    assert not is_graphql_mutation("{ plan { id } }")
+
+
+def test_normalize_query():
+    assert normalize_query("query Q($id: Int!) {\n  plan(id: $id) { id, name }\n}") == normalize_query(
+        "  # comment\nquery Q( $id : Int! ){plan(id:$id){id name}}"
+    )
+    assert normalize_query('{ tag(where: {name: {_eq: "a  b, #c"}}) { id } }') != normalize_query(
+        '{ tag(where: {name: {_eq: "a b #c"}}) { id } }'
+    )
+
+
+def test_query_cache_key():
+    key = query_cache_key("http://host", "user", "viewer", "{ plan { id } }", {"a": 1, "b": 2})
+    assert key == query_cache_key("http://host", "user", "viewer", "{plan{id}}", {"b": 2, "a": 1})
+    assert key != query_cache_key("http://host", "user", "aerie_admin", "{ plan { id } }", {"a": 1, "b": 2})
+    assert key != query_cache_key("http://other", "user", "viewer", "{ plan { id } }", {"a": 1, "b": 2})
+    assert key != query_cache_key("http://host", "user", "viewer", "{ plan { id } }", {"a": 1, "b": 3})
+
+
+def test_query_cache_policy_invalidation():
+    policy = QueryCachePolicy("models", timedelta(minutes=1), ["mission_model"])
+    assert policy.is_invalidated_by("mutation D($id: Int!) { delete_mission_model_by_pk(id: $id) { id } }")
+    assert not policy.is_invalidated_by("mutation { insert_tag_one(object: {}) { id } }")
+
+
+def test_parse_retry_after():
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("12") == 12
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0
+    assert parse_retry_after("soon") is None
+
+
+def test_retry_policy_connection_errors():
+    events = []
+    retry_policy = RetryPolicy(max_attempts=3, max_delay=0.1, on_retry=events.append, sleep=lambda _: None)
+
+    def request():
+        raise requests.exceptions.ConnectionError()
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        retry_policy.send(request, "url")
+    assert [e.attempt for e in events] == [1, 2]
+    assert all(0 <= e.delay <= 0.1 for e in events)
+
+    # Non-idempotent requests are attempted once unless mutations are retried
+    events.clear()
+    with pytest.raises(requests.exceptions.ConnectionError):
+        retry_policy.send(request, "url", idempotent=False)
+    assert events == []
+
+
+def test_retry_policy_retry_after_capped():
+    delays = []
+    retry_policy = RetryPolicy(max_attempts=2, max_delay=5.0, sleep=delays.append)
+
+    class Response:
+        status_code = 503
+        headers = {"Retry-After": "86400"}
+
+    retry_policy.send(lambda: Response(), "url")
+    assert delays == [5.0]
+
+
+class MockWebSocketConnection:
+    """Scripted graphql-transport-ws server"""
+
+    def __init__(self, messages) -> None:
+        self.messages = [json.dumps(m) for m in messages]
+        self.sent = []
+        self.closed = False
+
+    def send(self, message: str) -> None:
+        self.sent.append(json.loads(message))
+
+    def recv(self, timeout) -> str:
+        if not self.messages:
+            raise TimeoutError()
+        return self.messages.pop(0)
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def test_websocket_url():
+    assert websocket_url("https://host/v1/graphql") == "wss://host/v1/graphql"
+    assert websocket_url("http://localhost:8080/v1/graphql") == "ws://localhost:8080/v1/graphql"
+
+
+def test_wait_for_subscription():
+    conn = MockWebSocketConnection(
+        [
+            {"type": "connection_ack"},
+            {"type": "next", "id": "1", "payload": {"data": {"d": {"status": "pending"}}}},
+            {"type": "ping"},
+            {"type": "next", "id": "1", "payload": {"data": {"d": {"status": "success"}}}},
+        ]
+    )
+
+    data = wait_for_subscription(
+        "ws://host",
+        "subscription { d { status } }",
+        {"id": 1},
+        lambda d: d["d"]["status"] == "success",
+        headers={"Authorization": "Bearer x"},
+        connect=lambda url, headers, timeout: conn,
+    )
+
+    assert data == {"d": {"status": "success"}}
+    assert [m["type"] for m in conn.sent] == ["connection_init", "subscribe", "pong", "complete"]
+    assert conn.sent[0]["payload"] == {"headers": {"Authorization": "Bearer x"}}
+    assert conn.sent[1]["payload"] == {"query": "subscription { d { status } }", "variables": {"id": 1}}
+    assert conn.closed
+
+
+def test_wait_for_subscription_failures():
+    def wait(messages):
+        conn = MockWebSocketConnection(messages)
+        wait_for_subscription("ws://host", "", {}, lambda d: False, connect=lambda *_: conn)
+
+    with pytest.raises(SubscriptionUnavailableError):
+        wait([{"type": "connection_error"}])
+    with pytest.raises(SubscriptionUnavailableError):
+        wait([{"type": "connection_ack"}, {"type": "complete", "id": "1"}])
+
+    # Failures before the first payload mean the subscription is unavailable, so callers can fall back to polling
+    with pytest.raises(SubscriptionUnavailableError):
+        wait([])
+    with pytest.raises(SubscriptionUnavailableError):
+        wait([{"type": "connection_ack"}])
+    with pytest.raises(SubscriptionUnavailableError):
+        wait([{"type": "connection_ack"}, {"type": "error", "id": "1", "payload": [{"message": "bad"}]}])
+
+    # Once data has arrived, errors and timeouts are reported as such
+    next_message = {"type": "next", "id": "1", "payload": {"data": {"d": None}}}
+    with pytest.raises(RuntimeError) as e:
+        wait([{"type": "connection_ack"}, next_message, {"type": "error", "id": "1", "payload": [{"message": "bad"}]}])
+    assert not isinstance(e.value, SubscriptionUnavailableError)
+    with pytest.raises(TimeoutError):
+        wait([{"type": "connection_ack"}, next_message])